@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+# Full user rows loaded by ClaimsUser.instance, keyed by user id, least
+# recently used first
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def get_cached_user(user_id):
+    """
+    Return the CustomUser with the given id from a short-TTL local cache.
+    The TTL is read from STATELESS_USER_CACHE_TTL (seconds), and at most
+    STATELESS_USER_CACHE_SIZE users are kept.
+    """
+    ttl = getattr(settings, 'STATELESS_USER_CACHE_TTL', 60)
+    size = getattr(settings, 'STATELESS_USER_CACHE_SIZE', 1024)
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _user_cache.move_to_end(user_id)
+            return entry[1]
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        with _user_cache_lock:
+            _user_cache[user_id] = (now + ttl, user)
+            _user_cache.move_to_end(user_id)
+            if len(_user_cache) > size:
+                # Expired entries go first, then the least recently used
+                for key in [key for key, (expires, _) in _user_cache.items() if expires <= now]:
+                    del _user_cache[key]
+                while len(_user_cache) > size:
+                    _user_cache.popitem(last=False)
+    return user
+
+
+def clear_cached_user(user_id=None):
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+
+
+class ClaimsUser(TokenUser):
+    """
+    Lightweight user built from the claims of a verified access token:
+    id, username, group names and the linked lecturer id.
+    """
+
+    # TokenUser returns the raw claim, which simplejwt stores as a string
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def group_names(self):
+        return frozenset(self.token.get('groups') or [])
+
+    @cached_property
+    def lecturer_id(self):
+        return self.token.get('lecturer_id')
+
+    @cached_property
+    def instance(self):
+        # Full model for the few endpoints that need it
+        return get_cached_user(self.id)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Opt-in replacement for JWTAuthentication that trusts the token claims
+    instead of loading the CustomUser row on every request.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        return ClaimsUser(validated_token)
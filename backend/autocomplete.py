@@ -0,0 +1,115 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from backend.search import fold
+
+AutocompleteType = namedtuple('AutocompleteType', ['model', 'label', 'groups'])
+
+# kind -> AutocompleteType, filled by register_autocomplete in AppConfig.ready()
+autocomplete_types = {}
+
+
+class PrefixIndex:
+    """
+    Sorted array of (folded key, id) pairs with one key per word start of
+    each label, so 'van' finds 'Nguyễn Văn An'. A prefix is a bisect range.
+    """
+
+    def __init__(self, rows):
+        self.labels = {}
+        entries = []
+        for pk, label in rows:
+            label = str(label or '')
+            self.labels[pk] = label
+            words = fold(label).split()
+            for i in range(len(words)):
+                entries.append((' '.join(words[i:]), pk))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ids = [pk for _, pk in entries]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def lookup(self, prefix, limit=10):
+        """
+        Return up to limit (id, label) pairs with a word starting with prefix,
+        in order of the matched words.
+        """
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        found = {}
+        for i in range(bisect_left(self.keys, prefix), len(self.keys)):
+            if len(found) >= limit or not self.keys[i].startswith(prefix):
+                break
+            found.setdefault(self.ids[i], self.labels[self.ids[i]])
+        return list(found.items())
+
+
+class Autocomplete:
+    """
+    Per-process prefix indexes, rebuilt on the first lookup after a save or
+    delete marked them dirty. Signals only reach the worker that wrote, so
+    an index is also rebuilt once it is AUTOCOMPLETE_TTL seconds old.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.built_at = {}
+        self.dirty = set()
+        self.lock = threading.Lock()
+
+    def mark_dirty(self, kind):
+        with self.lock:
+            self.dirty.add(kind)
+
+    def get_index(self, kind):
+        ttl = getattr(settings, 'AUTOCOMPLETE_TTL', 300)
+        with self.lock:
+            index = self.indexes.get(kind)
+            fresh = (
+                index is not None
+                and kind not in self.dirty
+                and time.monotonic() - self.built_at[kind] < ttl
+            )
+            if fresh:
+                return index
+            # Cleared before reading so a write during the build marks it again
+            self.dirty.discard(kind)
+        autocomplete_type = autocomplete_types[kind]
+        rows = autocomplete_type.model._base_manager.values_list('pk', autocomplete_type.label)
+        index = PrefixIndex(rows.iterator())
+        with self.lock:
+            self.indexes[kind] = index
+            self.built_at[kind] = time.monotonic()
+        return index
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+            self.built_at.clear()
+            self.dirty.clear()
+
+
+autocomplete = Autocomplete()
+
+
+def register_autocomplete(kind, model, label, groups=None):
+    """
+    Offer the label field of model under kind. Only users in one of groups
+    may query it, everybody when groups is None.
+    """
+    if kind in autocomplete_types:
+        return
+    autocomplete_types[kind] = AutocompleteType(model, label, groups)
+
+    def mark_dirty(sender, **kwargs):
+        autocomplete.mark_dirty(kind)
+
+    uid = f'autocomplete:{kind}'
+    post_save.connect(mark_dirty, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(mark_dirty, sender=model, weak=False, dispatch_uid=uid)
@@ -0,0 +1,145 @@
+import functools
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.response import Response
+from backend.conditional import get_model_versions, watch_model_version
+from backend.roles import get_group_names
+
+DEFAULTS = {
+    'BACKEND': 'backend.caching.LRUBackend',
+    'OPTIONS': {},
+    # Seconds a cached response stays valid even without invalidation
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'response',
+}
+
+
+class LRUBackend:
+    """
+    In-process least recently used cache bounded by entry count and size.
+    Each worker keeps its own entries, so use a shared backend to fill the
+    cache once for all workers.
+    """
+
+    def __init__(self, MAX_ENTRIES=512, MAX_BYTES=16 * 1024 * 1024):
+        self.max_entries = MAX_ENTRIES
+        self.max_bytes = MAX_BYTES
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, blob = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+        return pickle.loads(blob)
+
+    def set(self, key, value, timeout):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (time.monotonic() + timeout, blob)
+            self.size += len(blob)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class DjangoCacheBackend:
+    """
+    Store responses in one of the CACHES aliases, e.g. a FileBasedCache or a
+    local Redis, so that every worker shares entries.
+    """
+
+    def __init__(self, ALIAS='default'):
+        self.cache = caches[ALIAS]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'RESPONSE_CACHE', {}))
+    return config
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = get_config()
+            _backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+        return _backend
+
+
+def reset_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def response_key(request, view, action, models):
+    versions = '.'.join(str(version) for version, _ in get_model_versions(models, request).values())
+    roles = ','.join(sorted(get_group_names(request))) if request.user.is_authenticated else ''
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+    return f"{get_config()['KEY_PREFIX']}:{type(view).__name__}.{action}:{versions}:{roles}:{query}"
+
+
+def cache_response(*models):
+    """
+    Cache the successful responses of a viewset method. Entries vary on the
+    query string and the caller's roles, and are invalidated when any of the
+    given models is saved, deleted or has its many-to-many relations changed,
+    which bumps their ModelVersion as for conditional_get.
+    """
+    for model in models:
+        watch_model_version(model)
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            backend = get_backend()
+            key = response_key(request, self, method.__name__, models)
+            data = backend.get(key)
+            if data is not None:
+                return Response(data)
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                backend.set(key, response.data, get_config()['TIMEOUT'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,176 @@
+import functools
+import hashlib
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+from lecturers.models import ModelVersion
+
+# Models whose changes already bump their ModelVersion row
+_watched = set()
+# Attribute used to memoize the versions read during a request
+MODEL_VERSIONS_ATTR = '_model_versions'
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def bump_model_version(model):
+    """
+    Bump the version of model once the current transaction commits, so that
+    the shared ModelVersion row is only locked by its own short update and
+    not for the rest of the write. Outside a transaction the version is
+    bumped right away.
+    """
+    transaction.on_commit(functools.partial(_bump, model_label(model)))
+
+
+def _bump(label):
+    updated = ModelVersion.objects.filter(label=label).update(
+        version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        try:
+            with transaction.atomic():
+                ModelVersion.objects.create(label=label, version=1)
+        except IntegrityError:
+            # Created concurrently by another writer
+            _bump(label)
+
+
+def watch_model_version(model):
+    """
+    Bump the version of model on save, delete and many-to-many changes.
+    """
+    if model in _watched:
+        return
+    _watched.add(model)
+
+    def bump(sender, **kwargs):
+        if kwargs.get('raw') or kwargs.get('action', 'post_').startswith('pre_'):
+            return
+        bump_model_version(model)
+
+    uid = f'model_version:{model_label(model)}'
+    post_save.connect(bump, sender=model, weak=False, dispatch_uid=f'{uid}:save')
+    post_delete.connect(bump, sender=model, weak=False, dispatch_uid=f'{uid}:delete')
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(bump, sender=field.remote_field.through,
+                            weak=False, dispatch_uid=f'{uid}:{field.name}')
+
+
+def get_model_versions(models, request=None):
+    """
+    Return {label: (version, updated_at)} for the given models in one query.
+    With a request, versions are read once per request and shared by the
+    ETag and the response cache.
+    """
+    labels = [model_label(model) for model in models]
+    known = {}
+    if request is not None:
+        http_request = getattr(request, '_request', request)
+        known = http_request.__dict__.setdefault(MODEL_VERSIONS_ATTR, {})
+    missing = [label for label in labels if label not in known]
+    if missing:
+        rows = ModelVersion.objects.filter(label__in=missing).values_list(
+            'label', 'version', 'updated_at')
+        versions = {label: (version, updated_at) for label, version, updated_at in rows}
+        known.update({label: versions.get(label, (0, None)) for label in missing})
+    return {label: known[label] for label in labels}
+
+
+def compute_etag(request, view, action, args, kwargs, versions):
+    parts = [
+        type(view).__name__,
+        action,
+        repr(args),
+        repr(sorted(kwargs.items())),
+        request.META.get('QUERY_STRING', ''),
+        str(getattr(request.user, 'pk', '')),
+        repr(sorted(versions.items())),
+    ]
+    return '"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+    return (
+        last_modified is not None
+        and if_modified_since is not None
+        and int(last_modified.timestamp()) <= if_modified_since
+    )
+
+
+def conditional_get(*models):
+    """
+    Add ETag / Last-Modified headers to GET responses of a viewset method and
+    answer 304 Not Modified, without running the method, when the client copy
+    is current. Validators change whenever any of the given models changes.
+    """
+    for model in models:
+        watch_model_version(model)
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(self, request, *args, **kwargs)
+
+            versions = get_model_versions(models, request)
+            etag = compute_etag(request, self, method.__name__, args, kwargs, versions)
+            timestamps = [updated_at for _, updated_at in versions.values()]
+            last_modified = None if None in timestamps else max(timestamps)
+
+            if is_not_modified(request, etag, last_modified):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            return response
+        return wrapper
+    return decorator
+
+
+def queryset_versions(queryset, models, field='updated_at'):
+    """
+    get_model_versions(models) plus the row count and latest field value of
+    queryset, which change with its rows only.
+    """
+    summary = queryset.order_by().aggregate(count=Count('pk'), latest=Max(field))
+    versions = get_model_versions(models)
+    versions['rows'] = (summary['count'], summary['latest'])
+    return versions
+
+
+def conditional_queryset(request, view, action, queryset, models, respond, field='updated_at', scope=None):
+    """
+    conditional_get for a response listing the rows of queryset, e.g. one
+    calendar window: the ETag changes with the rows' count and latest
+    field value and with the versions of models, not with writes to rows
+    outside queryset. scope holds what else selects the rows, e.g. a range
+    computed from the clock rather than the query string. Return respond()
+    or 304 Not Modified.
+    """
+    versions = queryset_versions(queryset, models, field)
+    versions['scope'] = repr(scope)
+    etag = compute_etag(request, view, action, (), {}, versions)
+    if is_not_modified(request, etag, None):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = respond()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    return response
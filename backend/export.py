@@ -0,0 +1,168 @@
+import csv
+import json
+import tempfile
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, time, timedelta
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from backend.fulltext import flatten
+
+ExportSpec = namedtuple('ExportSpec', ['model', 'columns', 'groups', 'date_field'])
+
+# kind -> ExportSpec, filled by register_export in AppConfig.ready()
+exports = {}
+
+CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def register_export(kind, model, columns, groups=None, date_field=None):
+    """
+    Offer model as /export/<kind>.<csv|ndjson|xlsx>. columns is a list of
+    (header, ORM path); a path through a many-to-many field exports the
+    related values joined by ', '. date_field is filtered by ?from= / ?to=.
+    """
+    exports[kind] = ExportSpec(model, columns, groups, date_field)
+
+
+def filter_dates(spec, queryset, start=None, end=None):
+    """
+    Keep rows whose date_field falls between the start and end days,
+    both included. Datetimes are compared as a range so the index is used.
+    """
+    field = spec.model._meta.get_field(spec.date_field)
+    if field.get_internal_type() == 'DateTimeField':
+        if start:
+            start = timezone.make_aware(datetime.combine(start, time.min))
+        if end:
+            end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        end_lookup = 'lt'
+    else:
+        end_lookup = 'lte'
+    if start:
+        queryset = queryset.filter(**{f'{spec.date_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{spec.date_field}__{end_lookup}': end})
+    return queryset
+
+
+def split_columns(spec):
+    """
+    Return ([(index, path)] of plain columns, {m2m field: [(index, rest)]}).
+    """
+    plain, many = [], defaultdict(list)
+    for index, (_, path) in enumerate(spec.columns):
+        name, _, rest = path.partition('__')
+        field = spec.model._meta.get_field(name)
+        if field.many_to_many:
+            many[field].append((index, rest or 'pk'))
+        else:
+            plain.append((index, path))
+    return plain, many
+
+
+def export_rows(spec, queryset, chunk_size=None):
+    """
+    Yield one list of values per row, reading chunk_size rows per query.
+    Chunks are walked by primary key instead of a server-side cursor, which
+    mysqlclient would buffer whole in memory. Many-to-many columns cost one
+    query per chunk.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    plain, many = split_columns(spec)
+    paths = [path for _, path in plain]
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk.values_list('pk', *paths)[:chunk_size])
+        if not chunk:
+            return
+        ids = [row[0] for row in chunk]
+        related = {}
+        for field, columns in many.items():
+            through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+            values = defaultdict(lambda: defaultdict(list))
+            rows = through.objects.filter(**{f'{source}__in': ids}).order_by('pk').values_list(
+                f'{source}_id', *[f'{target}__{rest}' for _, rest in columns])
+            for owner, *items in rows:
+                for (index, _), item in zip(columns, items):
+                    values[owner][index].append(str(item))
+            related[field] = values
+        for pk, *row_values in chunk:
+            row = [None] * len(spec.columns)
+            for (index, _), value in zip(plain, row_values):
+                row[index] = value
+            for field, columns in many.items():
+                for index, _ in columns:
+                    row[index] = ', '.join(related[field][pk][index])
+            yield row
+        last_pk = chunk[-1][0]
+
+
+def cell(value):
+    # JSON columns become '; ' separated text in tabular formats
+    if isinstance(value, (list, dict)):
+        return '; '.join(flatten(value))
+    return value
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(Echo())
+    # BOM so that spreadsheet programs read the Vietnamese text as UTF-8
+    yield '\ufeff' + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([cell(value) for value in row])
+
+
+def stream_ndjson(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=str) + '\n'
+
+
+def xlsx_file(headers, rows):
+    """
+    Write rows into a temporary XLSX file with openpyxl's write-only mode,
+    which keeps memory flat. The file is complete before it is sent.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([
+            # Excel has no time zones, write local wall-clock times
+            timezone.localtime(value).replace(tzinfo=None) if isinstance(value, datetime) else
+            value if isinstance(value, (int, float, date)) or value is None else str(cell(value))
+            for value in row
+        ])
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_response(kind, extension, queryset):
+    spec = exports[kind]
+    headers = [header for header, _ in spec.columns]
+    rows = export_rows(spec, queryset)
+    filename = f'{kind}.{extension}'
+    if extension == 'xlsx':
+        return FileResponse(xlsx_file(headers, rows), as_attachment=True,
+                            filename=filename, content_type=CONTENT_TYPES['xlsx'])
+    stream = stream_csv(headers, rows) if extension == 'csv' else stream_ndjson(headers, rows)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[extension])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,292 @@
+import re
+from collections import namedtuple
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.utils.html import escape
+from backend.search import field_value, fold
+
+# kind -> SearchType, filled by register_search_type in AppConfig.ready()
+search_types = {}
+
+SearchType = namedtuple('SearchType', ['model', 'title', 'fields', 'groups'])
+SearchHit = namedtuple('SearchHit', ['kind', 'object_id', 'title', 'snippet', 'score'])
+
+FTS_TABLE = 'lecturers_searchentry_fts'
+TITLE_WEIGHT = 10.0
+
+
+def flatten(value):
+    """
+    Yield the strings inside a field value, walking JSON lists and dicts.
+    """
+    if value is None or value == '':
+        return
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from flatten(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from flatten(item)
+    else:
+        yield str(value)
+
+
+def entry_text(search_type, instance):
+    title = str(field_value(instance, search_type.title) or '')
+    body = '\n'.join(
+        text for field in search_type.fields for text in flatten(field_value(instance, field)))
+    return title[:255], body
+
+
+def entry_fields(kind, instance):
+    title, body = entry_text(search_types[kind], instance)
+    return {
+        'title': title,
+        'body': body,
+        'title_folded': fold(title)[:255],
+        'body_folded': fold(body),
+    }
+
+
+def index_instance(kind, instance):
+    """
+    Create or refresh the search entry of instance.
+    """
+    from lecturers.models import SearchEntry
+    SearchEntry.objects.update_or_create(
+        kind=kind, object_id=instance.pk, defaults=entry_fields(kind, instance))
+
+
+def index_instances(kind, instances, batch_size=1000):
+    """
+    Create the search entries of new instances in bulk, for rows written by
+    bulk_create() which sends no post_save.
+    """
+    from lecturers.models import SearchEntry
+    if kind not in search_types:
+        return
+    SearchEntry.objects.bulk_create([
+        SearchEntry(kind=kind, object_id=instance.pk, **entry_fields(kind, instance))
+        for instance in instances
+    ], batch_size=batch_size)
+
+
+def register_search_type(kind, model, title, fields, groups=None):
+    """
+    Index model under kind: its title field and the text of fields, JSON
+    included, are flattened into a SearchEntry on every save. Only users in
+    one of groups see its hits, everybody when groups is None.
+    """
+    if kind in search_types:
+        return
+    search_types[kind] = SearchType(model, title, fields, groups)
+
+    def update_entry(sender, instance, raw=False, **kwargs):
+        if not raw:
+            index_instance(kind, instance)
+
+    def remove_entry(sender, instance, **kwargs):
+        from lecturers.models import SearchEntry
+        SearchEntry.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+    uid = f'fulltext:{kind}'
+    post_save.connect(update_entry, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(remove_entry, sender=model, weak=False, dispatch_uid=uid)
+
+
+def rebuild_index(kinds=None, batch_size=1000):
+    """
+    Drop and recreate the entries of kinds (all by default). Return the
+    number of entries written per kind.
+    """
+    from lecturers.models import SearchEntry
+    written = {}
+    for kind in kinds or search_types:
+        model = search_types[kind].model
+        SearchEntry.objects.filter(kind=kind).delete()
+        batch = []
+        for instance in model._base_manager.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(SearchEntry(kind=kind, object_id=instance.pk, **entry_fields(kind, instance)))
+            if len(batch) >= batch_size:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+        written[kind] = model._base_manager.count()
+    return written
+
+
+def search_terms(query):
+    return re.findall(r'\w+', fold(query))
+
+
+class SQLiteEngine:
+    # Every term must match as a word prefix
+    def match(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def hits(self, match, kinds, limit, offset):
+        placeholders = ', '.join(['%s'] * len(kinds))
+        sql = (
+            f"SELECT e.kind, e.object_id, e.title, e.body, "
+            f"-bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0) AS score "
+            f"FROM {FTS_TABLE} JOIN lecturers_searchentry e ON e.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND e.kind IN ({placeholders}) "
+            f"ORDER BY score DESC, e.id LIMIT %s OFFSET %s"
+        )
+        return sql, [match, *kinds, limit, offset]
+
+    def facets(self, match, kinds):
+        placeholders = ', '.join(['%s'] * len(kinds))
+        sql = (
+            f"SELECT e.kind, COUNT(*) "
+            f"FROM {FTS_TABLE} JOIN lecturers_searchentry e ON e.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND e.kind IN ({placeholders}) GROUP BY e.kind"
+        )
+        return sql, [match, *kinds]
+
+
+# InnoDB's default full-text stopwords, never indexed either
+INNODB_STOPWORDS = frozenset(
+    'a about an are as at be by com de en for from how i in is it la of on or that the this to '
+    'was what when where who will with und www'.split())
+
+
+class MySQLEngine:
+    """
+    InnoDB FULLTEXT search. Words shorter than innodb_ft_min_token_size (3
+    by default) and stopwords are not indexed, yet many folded Vietnamese
+    syllables have two letters (le, ho, vu, do, an, ha). Such terms are
+    matched as word prefixes with REGEXP instead, on the rows the indexed
+    terms select, or on every entry when there are none. Setting
+    innodb_ft_min_token_size=1 and innodb_ft_enable_stopword=OFF on the
+    server, then rebuilding the index, lets every term use it.
+    """
+
+    def __init__(self, min_token_size=None, stopwords=None):
+        self.min_token_size = min_token_size
+        self.stopwords = stopwords
+
+    def load_settings(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT @@innodb_ft_min_token_size, @@innodb_ft_enable_stopword')
+            size, enabled = cursor.fetchone()
+        self.min_token_size = int(size)
+        self.stopwords = INNODB_STOPWORDS if int(enabled) else frozenset()
+
+    def indexed(self, term):
+        if self.min_token_size is None or self.stopwords is None:
+            self.load_settings()
+        return len(term) >= self.min_token_size and term not in self.stopwords
+
+    def match(self, terms):
+        """
+        (boolean mode query of the indexed terms, word start patterns of
+        the others).
+        """
+        indexed = [term for term in terms if self.indexed(term)]
+        # Terms are \w+ only, nothing to escape
+        patterns = [rf'\b{term}' for term in terms if term not in indexed]
+        return ' '.join(f'+{term}*' for term in indexed), patterns
+
+    def condition(self, match):
+        query, patterns = match
+        parts, params = [], []
+        if query:
+            parts.append('MATCH (title_folded, body_folded) AGAINST (%s IN BOOLEAN MODE)')
+            params.append(query)
+        for pattern in patterns:
+            parts.append('(title_folded REGEXP %s OR body_folded REGEXP %s)')
+            params += [pattern, pattern]
+        return ' AND '.join(parts), params
+
+    def score(self, match):
+        query, patterns = match
+        parts, params = [], []
+        if query:
+            parts.append(f'MATCH (title_folded) AGAINST (%s IN BOOLEAN MODE) * {TITLE_WEIGHT} '
+                         f'+ MATCH (title_folded, body_folded) AGAINST (%s IN BOOLEAN MODE)')
+            params += [query, query]
+        for pattern in patterns:
+            parts.append(f'(title_folded REGEXP %s) * {TITLE_WEIGHT}')
+            params.append(pattern)
+        return ' + '.join(parts), params
+
+    def hits(self, match, kinds, limit, offset):
+        placeholders = ', '.join(['%s'] * len(kinds))
+        score, score_params = self.score(match)
+        condition, params = self.condition(match)
+        sql = (
+            f"SELECT kind, object_id, title, body, {score} AS score "
+            f"FROM lecturers_searchentry "
+            f"WHERE {condition} "
+            f"AND kind IN ({placeholders}) ORDER BY score DESC, id LIMIT %s OFFSET %s"
+        )
+        return sql, [*score_params, *params, *kinds, limit, offset]
+
+    def facets(self, match, kinds):
+        placeholders = ', '.join(['%s'] * len(kinds))
+        condition, params = self.condition(match)
+        sql = (
+            f"SELECT kind, COUNT(*) FROM lecturers_searchentry "
+            f"WHERE {condition} "
+            f"AND kind IN ({placeholders}) GROUP BY kind"
+        )
+        return sql, [*params, *kinds]
+
+
+# Reads the server's full-text settings once
+_mysql_engine = MySQLEngine()
+
+
+def get_engine():
+    if connection.vendor == 'mysql':
+        return _mysql_engine
+    if connection.vendor == 'sqlite':
+        return SQLiteEngine()
+    raise ImproperlyConfigured(f"No full-text search engine for {connection.vendor}")
+
+
+def highlight(text, terms, size=24):
+    """
+    Return an HTML-escaped window of text around the first matching word,
+    with every matching word wrapped in <mark>.
+    """
+    words = text.split()
+
+    def matches(word):
+        folded = fold(word)
+        return any(part.startswith(term) for part in re.findall(r'\w+', folded) for term in terms)
+
+    first = next((i for i, word in enumerate(words) if matches(word)), 0)
+    start = max(0, min(first - size // 4, len(words) - size))
+    window = [
+        f'<mark>{escape(word)}</mark>' if matches(word) else escape(word)
+        for word in words[start:start + size]
+    ]
+    prefix = '… ' if start > 0 else ''
+    suffix = ' …' if start + size < len(words) else ''
+    return prefix + ' '.join(window) + suffix
+
+
+def search(query, kinds, limit=20, offset=0):
+    """
+    Return (hits, facets) for query over the given kinds, best first.
+    facets maps each kind to its number of matches.
+    """
+    terms = search_terms(query)
+    if not terms or not kinds:
+        return [], {kind: 0 for kind in kinds}
+    engine = get_engine()
+    match = engine.match(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(*engine.facets(match, kinds))
+        facets = {kind: 0 for kind in kinds}
+        facets.update(dict(cursor.fetchall()))
+        cursor.execute(*engine.hits(match, kinds, limit, offset))
+        rows = cursor.fetchall()
+    hits = [
+        SearchHit(kind, object_id, title, highlight(body, terms), float(score))
+        for kind, object_id, title, body, score in rows
+    ]
+    return hits, facets
@@ -0,0 +1,280 @@
+import json
+import logging
+import logging.handlers
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+DEFAULTS = {
+    # Fraction of requests that are instrumented (1.0 = all, 0 = none)
+    'SAMPLE_RATE': 0.01,
+    # Add X-Query-Count / X-DB-Time-Ms headers to instrumented responses
+    'RESPONSE_HEADERS': False,
+    # JSON lines file receiving the samples logged to LOGGER, rotated at
+    # LOG_MAX_BYTES with LOG_BACKUP_COUNT old files, or None
+    'LOG_FILE': None,
+    'LOG_MAX_BYTES': 10 * 1024 * 1024,
+    'LOG_BACKUP_COUNT': 3,
+}
+
+# Every sample is logged here at INFO as one JSON line. Route it with the
+# LOGGING setting, or set QUERY_BUDGET['LOG_FILE'].
+logger = logging.getLogger('backend.query_budget')
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACES = re.compile(r'\s+')
+
+_handler_lock = threading.Lock()
+# LOG_FILE path -> handler attached to logger
+_file_handlers = {}
+_stats_lock = threading.Lock()
+# Aggregated figures of this process, keyed by action name
+ACTION_STATS = {}
+# QueryRecord of the block being recorded in this thread, if any
+_current_record = ContextVar('query_record', default=None)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'QUERY_BUDGET', {}))
+    return config
+
+
+def fingerprint(sql):
+    """
+    Normalize a query so that executions differing only by parameters match.
+    """
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _LITERAL.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def action_name(request):
+    """
+    Return '<ViewSet>.<action>' for the view that served the request.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if view_class is None:
+        return match.view_name
+    actions = getattr(func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class QueryRecord:
+    """
+    Queries executed while recording, with their durations.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.render_ms = 0.0
+        self.serialize_ms = 0.0
+        # Set while a serializer runs, queries then count as DB time only
+        self.serializing = False
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.queries.append((sql, duration))
+            if self.serializing:
+                self.serialize_ms -= duration
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def db_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self):
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+    def as_dict(self, action):
+        return {
+            'action': action,
+            'queries': self.count,
+            'db_ms': round(self.db_ms, 3),
+            # Python time of the view outside the DB and the serializers
+            'view_ms': round(max(
+                self.total_ms - self.db_ms - self.serialize_ms - self.render_ms, 0), 3),
+            'serialize_ms': round(self.serialize_ms, 3),
+            'render_ms': round(self.render_ms, 3),
+            'duplicates': self.duplicates(),
+        }
+
+
+@contextmanager
+def record_queries():
+    """
+    Record every query run on any database connection inside the block.
+    """
+    record = QueryRecord()
+    token = _current_record.set(record)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            yield record
+    finally:
+        _current_record.reset(token)
+    record.total_ms = (time.perf_counter() - record.started) * 1000
+
+
+class SerializeTimingMixin:
+    """
+    Serializer mixin adding the time spent in to_representation(), outside
+    the DB, to the serialize_ms of the request being recorded. Nested and
+    per-item calls are counted once, by the outermost serializer.
+    """
+
+    def to_representation(self, instance):
+        record = _current_record.get()
+        if record is None or record.serializing:
+            return super().to_representation(instance)
+        record.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            record.serialize_ms += (time.perf_counter() - started) * 1000
+            record.serializing = False
+
+
+def merge_sample(action_stats, sample):
+    """
+    Fold one request sample into the aggregated figures of its action.
+    """
+    stats = action_stats.setdefault(sample['action'], {
+        'requests': 0,
+        'queries': 0,
+        'max_queries': 0,
+        'db_ms': 0.0,
+        'view_ms': 0.0,
+        'serialize_ms': 0.0,
+        'render_ms': 0.0,
+        'duplicates': Counter(),
+    })
+    stats['requests'] += 1
+    stats['queries'] += sample['queries']
+    stats['max_queries'] = max(stats['max_queries'], sample['queries'])
+    for key in ('db_ms', 'view_ms', 'serialize_ms', 'render_ms'):
+        stats[key] += sample[key]
+    stats['duplicates'].update(sample['duplicates'])
+
+
+def add_sample(sample):
+    with _stats_lock:
+        merge_sample(ACTION_STATS, sample)
+
+
+def summarize(action_stats):
+    """
+    Turn aggregated action figures into a JSON friendly per-action report.
+    """
+    report = {}
+    for action, stats in sorted(action_stats.items()):
+        requests = stats['requests'] or 1
+        report[action] = {
+            'requests': stats['requests'],
+            'avg_queries': round(stats['queries'] / requests, 2),
+            'max_queries': stats['max_queries'],
+            'avg_db_ms': round(stats['db_ms'] / requests, 3),
+            'avg_view_ms': round(stats['view_ms'] / requests, 3),
+            'avg_serialize_ms': round(stats['serialize_ms'] / requests, 3),
+            'avg_render_ms': round(stats['render_ms'] / requests, 3),
+            'duplicates': dict(stats['duplicates'].most_common(10)),
+        }
+    return report
+
+
+def summary():
+    with _stats_lock:
+        return summarize(ACTION_STATS)
+
+
+def file_handler(config):
+    """
+    Attach a rotating handler for config['LOG_FILE'] to logger, once per path.
+    """
+    path = str(config['LOG_FILE'])
+    with _handler_lock:
+        if path not in _file_handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT'],
+                encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            _file_handlers[path] = handler
+    return _file_handlers[path]
+
+
+def reset_stats():
+    with _stats_lock:
+        ACTION_STATS.clear()
+
+
+class QueryBudgetMiddleware:
+    """
+    Record query count, DB time, duplicated queries, serialization and
+    render time per view
+    action for a sample of requests. Configured by the QUERY_BUDGET setting.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if random.random() >= config['SAMPLE_RATE']:
+            return self.get_response(request)
+
+        with record_queries() as record:
+            request._query_record = record
+            response = self.get_response(request)
+        action = action_name(request)
+        if action is None:
+            return response
+
+        sample = record.as_dict(action)
+        add_sample(sample)
+        if config['LOG_FILE']:
+            file_handler(config)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(sample, ensure_ascii=False))
+        if config['RESPONSE_HEADERS']:
+            response['X-Query-Count'] = str(sample['queries'])
+            response['X-DB-Time-Ms'] = str(sample['db_ms'])
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, time the rendering
+        record = getattr(request, '_query_record', None)
+        if record is None:
+            return response
+        started = time.perf_counter()
+
+        def finished(rendered):
+            record.render_ms += (time.perf_counter() - started) * 1000
+
+        response.add_post_render_callback(finished)
+        return response
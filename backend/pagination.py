@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset, cap=1000):
+    """
+    Cheap row count: the optimizer's estimate on MySQL, otherwise an exact
+    count that stops at cap.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'mysql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = columns.index('rows')
+            return max((int(row[rows] or 0) for row in cursor.fetchall()), default=0)
+    return queryset[:cap].count()
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset mode.
+
+    Passing ?cursor= switches to keyset pagination: pages are fetched with a
+    WHERE on the ordering columns (plus id as tie-breaker) instead of COUNT(*)
+    and OFFSET. The ordering comes from OrderingFilter. Counts are skipped in
+    this mode unless ?count=estimate asks for an estimated total.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    estimate_cap = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.request = request
+        position, reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.count = estimate_count(queryset, self.estimate_cap)
+
+        ordering = self.get_keyset_ordering(queryset)
+        self.key_names = [f'_keyset_{i}' for i in range(len(ordering))]
+        # Walking backwards flips every direction, the page is reversed after
+        directions = [descending != reverse for _, descending in ordering]
+        queryset = queryset.annotate(**{
+            name: F(field) for name, (field, _) in zip(self.key_names, ordering)
+        }).order_by(*[
+            # NULLs sort as the smallest value on every database
+            F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_first=True)
+            for name, descending in zip(self.key_names, directions)
+        ])
+        if position is not None:
+            if len(position) != len(ordering):
+                raise NotFound('Invalid cursor')
+            queryset = queryset.filter(self.after(position, directions))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_keyset_ordering(self, queryset):
+        """
+        Return [(field, descending), ...] ending with the id tie-breaker.
+        """
+        ordering = []
+        for field in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(field, str) or field == '?':
+                continue
+            descending = field.startswith('-')
+            field = field.lstrip('-')
+            ordering.append(('id' if field == 'pk' else field, descending))
+        if not any(field == 'id' for field, _ in ordering):
+            ordering.append(('id', False))
+        return ordering
+
+    def after(self, position, directions):
+        """
+        Rows strictly after position in keyset order: for each key, the earlier
+        keys are equal and this one is past its value.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for name, value, descending in zip(self.key_names, position, directions):
+            if value is None:
+                past = Q(**{f'{name}__isnull': False}) if not descending else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            elif descending:
+                past = Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            else:
+                past = Q(**{f'{name}__gt': value})
+                same = Q(**{name: value})
+            condition |= equal & past
+            equal &= same
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return cursor['p'], bool(cursor.get('r'))
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, row, reverse):
+        position = [getattr(row, name) for name in self.key_names]
+        cursor = json.dumps({'p': position, 'r': reverse}, default=str)
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
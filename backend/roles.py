@@ -1,6 +1,26 @@
-from rest_framework_roles.roles import is_anon, is_user, is_admin, is_staff
+import threading
+from django.conf import settings
+from rest_framework_roles.roles import is_anon, is_admin, is_staff
+from rest_framework_roles.roles import is_user as is_model_user
+from backend.authentication import ClaimsUser
 from lecturers.models import Lecturer
 
+# Attribute used to memoize the user's group names on the underlying HttpRequest
+GROUP_NAMES_ATTR = '_role_group_names'
+
+_stats_lock = threading.Lock()
+ROLE_CACHE_STATS = {
+    'lookups': 0,      # role checks answered by has_group()
+    'cache_hits': 0,   # answered from the per-request set
+    'db_loads': 0,     # group names loaded with one query
+    'token_loads': 0,  # group names read from the verified JWT claims
+}
+
+
+def is_user(request, view):
+    # Token users built by StatelessJWTAuthentication count as users too
+    return is_model_user(request, view) or isinstance(request.user, ClaimsUser)
+
 
 def is_self_lecturer(request, view, pk=None):
     # For custom actions, check for lecturer_id
@@ -10,19 +30,78 @@ def is_self_lecturer(request, view, pk=None):
             lecturer = Lecturer.objects.get(pk=lecturer_id)
         except Lecturer.DoesNotExist:
             return False
-        return is_user(request, view) and lecturer.user == request.user
+        return is_user(request, view) and lecturer.user_id == request.user.pk
     # For standard retrieve/update/destroy with pk
     if 'pk' in getattr(view, 'kwargs', {}):
         obj = view.get_object()
         lecturer = getattr(obj, 'lecturer', None)
         if lecturer is not None and hasattr(lecturer, 'user'):
-            return is_user(request, view) and lecturer.user == request.user
+            return is_user(request, view) and lecturer.user_id == request.user.pk
         if hasattr(obj, 'user'):
-            return is_user(request, view) and obj.user == request.user
+            return is_user(request, view) and obj.user_id == request.user.pk
         return False
     return False
 
 
+def _count(key):
+    with _stats_lock:
+        ROLE_CACHE_STATS[key] += 1
+
+
+def role_cache_stats():
+    """
+    Return a snapshot of the role lookup counters.
+    """
+    with _stats_lock:
+        return dict(ROLE_CACHE_STATS)
+
+
+def reset_role_cache_stats():
+    with _stats_lock:
+        for key in ROLE_CACHE_STATS:
+            ROLE_CACHE_STATS[key] = 0
+
+
+def get_group_names(request):
+    """
+    Return the set of group names of the requesting user.
+    The set is loaded once per request, either from the claims of a token user,
+    from the 'groups' claim of the verified access token (when
+    ROLE_GROUPS_FROM_TOKEN is enabled) or with a single query, and reused by
+    every role check of that request.
+    """
+    # DRF's Request wraps the HttpRequest, cache on the latter so both share it
+    http_request = getattr(request, '_request', request)
+    group_names = getattr(http_request, GROUP_NAMES_ATTR, None)
+    if group_names is not None:
+        _count('cache_hits')
+        return group_names
+
+    token = getattr(request, 'auth', None)
+    claim = None
+    if isinstance(request.user, ClaimsUser):
+        claim = request.user.group_names
+    elif getattr(settings, 'ROLE_GROUPS_FROM_TOKEN', False) and token is not None:
+        try:
+            claim = token.get('groups')
+        except AttributeError:
+            claim = None
+    if claim is not None:
+        group_names = frozenset(claim)
+        _count('token_loads')
+    else:
+        group_names = frozenset(
+            request.user.groups.values_list('name', flat=True))
+        _count('db_loads')
+    setattr(http_request, GROUP_NAMES_ATTR, group_names)
+    return group_names
+
+
+def has_group(request, view, name):
+    _count('lookups')
+    return is_user(request, view) and name in get_group_names(request)
+
+
 ROLES = {
     # Django vanilla roles
     'anon': is_anon,
@@ -30,25 +109,15 @@ ROLES = {
     'admin': is_admin,
     'staff': is_staff,
 
-    # Custom roles
+    # Custom roles, resolved from the cached group names of the request
     'lecturer': 
-        lambda request, view: 
-            is_user(request, view) 
-            and request.user.groups.filter(name='lecturer').exists(),
+        lambda request, view: has_group(request, view, 'lecturer'),
     'potential_lecturer': 
-        lambda request, view: 
-            is_user(request, view) 
-            and request.user.groups.filter(name='potential_lecturer').exists(),
+        lambda request, view: has_group(request, view, 'potential_lecturer'),
     'it_faculty': 
-        lambda request, view: 
-            is_user(request, view) 
-            and request.user.groups.filter(name='it_faculty').exists(),
+        lambda request, view: has_group(request, view, 'it_faculty'),
     'education_department': 
-        lambda request, view: 
-            is_user(request, view) 
-            and request.user.groups.filter(name='education_department').exists(),
+        lambda request, view: has_group(request, view, 'education_department'),
     'supervision_department':
-        lambda request, view: 
-            is_user(request, view) 
-            and request.user.groups.filter(name='supervision_department').exists(),
+        lambda request, view: has_group(request, view, 'supervision_department'),
 }
\ No newline at end of file
@@ -0,0 +1,177 @@
+import re
+import unicodedata
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.db.models.expressions import DatabaseDefault
+from django.db.models.signals import post_save, pre_save
+from rest_framework import filters
+
+# Sorts after every folded character, closes the range of a prefix
+PREFIX_END = '\uffff'
+
+# {model: fields} with a folded shadow column kept by watch_folded_fields
+folded_models = {}
+
+
+def fold(value):
+    """
+    Lowercase and strip diacritics: 'Nguyễn Đức  Anh' -> 'nguyen duc anh'.
+    """
+    if not value:
+        return ''
+    # đ is a separate letter, not d with a combining mark
+    value = value.replace('đ', 'd').replace('Đ', 'd')
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.lower().split())
+
+
+def folded_name(field):
+    return f'{field}_folded'
+
+
+def field_value(instance, field):
+    value = getattr(instance, field)
+    if isinstance(value, DatabaseDefault):
+        # db_default placeholder of an unsaved row, or of a saved one on
+        # databases without RETURNING
+        db_default = instance._meta.get_field(field).db_default
+        value = getattr(db_default, 'value', db_default)
+    return value
+
+
+def folded_values(instance, fields):
+    values = {}
+    for field in fields:
+        column = instance._meta.get_field(folded_name(field))
+        values[column.attname] = fold(field_value(instance, field))[:column.max_length]
+    return values
+
+
+def watch_folded_fields(model, *fields):
+    """
+    Keep the <field>_folded shadow column of each field current on save.
+    Queryset.update() and bulk operations bypass this, run backfill_search
+    after them.
+    """
+    if model in folded_models:
+        return
+    folded_models[model] = fields
+
+    def fold_fields(sender, instance, **kwargs):
+        for name, value in folded_values(instance, fields).items():
+            setattr(instance, name, value)
+
+    def save_folded_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw or update_fields is None:
+            return
+        # save(update_fields=[...]) skipped the shadow of a changed field
+        missing = {folded_name(field) for field in fields if field in update_fields}
+        missing -= set(update_fields)
+        if missing:
+            model.objects.filter(pk=instance.pk).update(
+                **{name: getattr(instance, name) for name in missing})
+
+    uid = f'folded_fields:{model._meta.label_lower}'
+    pre_save.connect(fold_fields, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(save_folded_fields, sender=model, weak=False, dispatch_uid=uid)
+
+
+def backfill_folded_fields(model, fields, batch_size=1000):
+    """
+    Recompute the shadow columns of every row in pk order, writing only the
+    rows that changed. Return the number of rows updated.
+    """
+    columns = [folded_name(field) for field in fields]
+    updated = 0
+    last_pk = None
+    while True:
+        rows = model._base_manager.order_by('pk').only(*fields, *columns)
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        rows = list(rows[:batch_size])
+        if not rows:
+            return updated
+        changed = []
+        for row in rows:
+            values = folded_values(row, fields)
+            if any(getattr(row, name) != value for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(row, name, value)
+                changed.append(row)
+        model._base_manager.bulk_update(changed, columns)
+        updated += len(changed)
+        last_pk = rows[-1].pk
+
+
+def has_field(model, path):
+    *relations, field = path.split('__')
+    try:
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        model._meta.get_field(field)
+    except (FieldDoesNotExist, AttributeError):
+        return False
+    return True
+
+
+def folded_lookup(model, path):
+    """
+    Return the shadow column path of a search field, or None without one.
+    """
+    *relations, field = path.split('__')
+    folded = '__'.join(relations + [folded_name(field)])
+    return folded if has_field(model, folded) else None
+
+
+def prefix_q(path, value):
+    # A range instead of LIKE so every database answers it from the index
+    return Q(**{f'{path}__gte': value, f'{path}__lt': value + PREFIX_END})
+
+
+def word_start_q(path, value):
+    """
+    value at the start of any word of a folded column: 'an' finds 'nguyen
+    van an', 'hust' finds 'an@hust.edu.vn'. Words start after anything but a
+    letter or digit, folded columns holding lowercase ASCII for Vietnamese.
+    The regex cannot use the index, so the whole column is scanned.
+    """
+    return prefix_q(path, value) | Q(**{f'{path}__regex': r'[^0-9a-z]' + re.escape(value)})
+
+
+class FoldedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that matches ?search= against the accent-folded shadow
+    columns of search_fields: 'nguyen van' finds 'Nguyễn Văn An'. The folded
+    search string must start the column, which the column index answers as a
+    range. Prefix a field with '$' to also match the start of any other word
+    ('van an'), at the cost of a scan. Fields without a shadow column fall
+    back to icontains, fields missing from the model are skipped.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        value = fold(request.query_params.get(self.search_param, ''))
+        if not search_fields or not value:
+            return queryset
+
+        condition = Q()
+        lookups = []
+        for field in search_fields:
+            any_word = field.startswith('$')
+            field = field.lstrip('$')
+            path = folded_lookup(queryset.model, field)
+            if path is not None:
+                condition |= word_start_q(path, value) if any_word else prefix_q(path, value)
+            elif has_field(queryset.model, field):
+                condition |= Q(**{f'{field}__icontains': value})
+            else:
+                continue
+            lookups.append(field)
+        if not lookups:
+            return queryset
+
+        queryset = queryset.filter(condition)
+        if self.must_call_distinct(queryset, lookups):
+            queryset = queryset.distinct()
+        return queryset
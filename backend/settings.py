@@ -62,6 +62,36 @@ REST_FRAMEWORK_ROLES = {
   ],
 }
 
+# Answer role checks from the 'groups' claim of the verified access token
+# instead of querying the user's groups. The claim is only refreshed on login.
+ROLE_GROUPS_FROM_TOKEN = False
+
+# Lifetime (seconds) and size of the local user cache behind
+# backend.authentication.StatelessJWTAuthentication
+STATELESS_USER_CACHE_TTL = 60
+STATELESS_USER_CACHE_SIZE = 1024
+
+# Response cache of read-mostly endpoints (backend.caching.cache_response).
+# Entries are keyed on the ModelVersion rows, so every worker sees
+# invalidations. To fill the cache once for several workers, use e.g.
+# 'BACKEND': 'backend.caching.DjangoCacheBackend', 'OPTIONS': {'ALIAS': 'default'}
+# with a FileBasedCache or Redis entry in CACHES.
+RESPONSE_CACHE = {
+    'BACKEND': 'backend.caching.LRUBackend',
+    'OPTIONS': {'MAX_ENTRIES': 512, 'MAX_BYTES': 16 * 1024 * 1024},
+    'TIMEOUT': 300,
+}
+
+# Lifetime (seconds) of the cached /lecturers/dashboard/ payload
+DASHBOARD_CACHE_TTL = 60
+
+# Max age (seconds) of the per-process /autocomplete/ indexes, bounds how long
+# other workers miss a change
+AUTOCOMPLETE_TTL = 300
+
+# Processes hashing passwords in POST /users/bulk/, None for one per CPU
+PASSWORD_HASH_WORKERS = None
+
 # JWT settings
 SIMPLE_JWT = {
     # Custom token serializer for adding user group to token claims
@@ -77,8 +107,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.QueryBudgetMiddleware',
 ]
 
+# Per-action query instrumentation (backend.middleware.QueryBudgetMiddleware).
+# Samples are logged to the 'backend.query_budget' logger. Set 'LOG_FILE' to
+# also keep them in a rotated file for `python manage.py query_report`.
+# backend.testing.TestRunner turns sampling off for the test suite.
+QUERY_BUDGET = {
+    'SAMPLE_RATE': float(os.getenv('QUERY_BUDGET_SAMPLE_RATE', '0.01')),
+    'RESPONSE_HEADERS': DEBUG,
+    'LOG_FILE': os.getenv('QUERY_BUDGET_LOG_FILE') or None,
+}
+
+TEST_RUNNER = 'backend.testing.TestRunner'
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -107,12 +150,15 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Page numbers by default, keyset pagination with ?cursor=
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.KeysetPagination',
     'PAGE_SIZE': 10,  # Default page size
     'PAGINATE_BY_PARAM': 'page_size',  # Allow page size to be specified in the URL
     'MAX_PAGE_SIZE': 100,  # Maximum page size that can be requested
     'DEFAULT_FILTER_BACKENDS': [
-        'django_filters.rest_framework.DjangoFilterBackend'
+        'django_filters.rest_framework.DjangoFilterBackend',
+        # ?fields= / ?expand= narrow the list queries, see backend.sparse
+        'backend.sparse.SparseFieldsFilter',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -173,6 +219,13 @@ LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
 
+# Wall-clock zone of lessons, the default for schedule series and feeds
+SCHEDULE_TIME_ZONE = 'Asia/Ho_Chi_Minh'
+
+# Seconds the rendered events of an ICS feed stay in the response cache.
+# Feeds are revalidated on every request, so this only bounds memory use.
+SCHEDULE_FEED_TIMEOUT = 24 * 60 * 60
+
 USE_I18N = True
 
 USE_TZ = True
@@ -0,0 +1,142 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+from backend.middleware import SerializeTimingMixin
+
+
+def query_list(request, name):
+    value = request.query_params.get(name, '') if request is not None else ''
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+class SparseFieldsMixin(SerializeTimingMixin):
+    """
+    Narrow a serializer built with the request in its context:
+    ?fields=a,b keeps only those fields, and ?expand= adds nested relations
+    back to that selection. Fields listed in Meta.expandable_fields are left
+    out unless named in ?expand=, so only list new fields there: the default
+    payload must keep every field existing clients read.
+    Meta.field_sources maps method fields to the ORM paths they read, so
+    that sparse_queryset can pick .only(), select_related and prefetches.
+    Read serializers all mix this in, so it also times their serialization
+    for QueryBudgetMiddleware.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        requested = query_list(request, 'fields')
+        expand = query_list(request, 'expand')
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        for name in list(self.fields):
+            if name in expandable and name not in expand:
+                self.fields.pop(name)
+            elif requested and name not in requested and name not in expand:
+                self.fields.pop(name)
+
+
+def field_paths(serializer, name, field):
+    """
+    ORM paths read by a serializer field, None when unknown.
+    """
+    sources = getattr(serializer.Meta, 'field_sources', {})
+    if name in sources:
+        return list(sources[name])
+    if field.source == '*':
+        return None
+    path = field.source.replace('.', '__')
+    nested = getattr(field, 'child', field)
+    if isinstance(nested, serializers.BaseSerializer):
+        paths = serializer_paths(nested)
+        if paths is None:
+            return None
+        return [f'{path}__{child}' for child in paths]
+    if isinstance(field, serializers.SerializerMethodField):
+        return None
+    return [path]
+
+
+def serializer_paths(serializer):
+    paths = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        found = field_paths(serializer, name, field)
+        if found is None:
+            return None
+        paths.extend(found)
+    return paths
+
+
+def selected_paths(tree, prefix=''):
+    # Query.select_related is a nested dict of the relations to follow
+    for name, children in tree.items():
+        yield prefix + name
+        yield from selected_paths(children, f'{prefix}{name}__')
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    Load only the columns and relations the serializer's fields read:
+    .only() for columns, select_related for forward relations and
+    prefetch_related for many-valued ones.
+    """
+    model = queryset.model
+    if getattr(serializer.Meta, 'model', None) is not model:
+        return queryset
+    paths = serializer_paths(serializer)
+    known = paths is not None
+    only, select, prefetch = {'pk'}, set(), set()
+    for path in paths or []:
+        current = model
+        parts = path.split('__')
+        for i, part in enumerate(parts):
+            prefix = '__'.join(parts[:i + 1])
+            try:
+                field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                # Properties and other attributes, cannot narrow the columns
+                known = False
+                break
+            if field.many_to_many or field.one_to_many:
+                prefetch.add(prefix)
+                break
+            if field.is_relation and i < len(parts) - 1:
+                select.add(prefix)
+                current = field.related_model
+                continue
+            if field.is_relation and not field.concrete:
+                # Reverse one-to-one read as a whole object
+                select.add(prefix)
+                only.update(f'{prefix}__{column.name}'
+                            for column in field.related_model._meta.concrete_fields)
+                break
+            only.add(prefix)
+            break
+    # .only() would defer the columns of relations selected by the view itself
+    existing = queryset.query.select_related
+    if existing is True or not set(selected_paths(existing or {})) <= select:
+        known = False
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if known:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+class SparseFieldsFilter(BaseFilterBackend):
+    """
+    Apply sparse_queryset to the list querysets of generic views.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if request.method not in ('GET', 'HEAD') or not hasattr(view, 'get_serializer'):
+            return queryset
+        serializer = view.get_serializer()
+        if not isinstance(serializer, SparseFieldsMixin):
+            return queryset
+        return sparse_queryset(queryset, serializer)
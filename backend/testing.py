@@ -0,0 +1,41 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from backend.middleware import action_name, record_queries
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin asserting how many queries a view action may run.
+    """
+
+    def assertQueryBudget(self, budget, method, url, *args, **kwargs):
+        """
+        Request url through self.client and fail if the action served runs
+        more than budget queries. Returns the response.
+        """
+        with record_queries() as record:
+            response = getattr(self.client, method.lower())(url, *args, **kwargs)
+        if record.count > budget:
+            action = action_name(response.wsgi_request) or url
+            duplicates = ''.join(
+                f'\n  {count}x {sql}' for sql, count in record.duplicates().items())
+            self.fail(
+                f'{action} ran {record.count} queries, budget is {budget}'
+                + (f'. Duplicated queries:{duplicates}' if duplicates else ''))
+        return response
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner that turns query sampling off for the whole run. Tests that
+    check the instrumentation enable it with override_settings.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._query_budget = override_settings(QUERY_BUDGET={'SAMPLE_RATE': 0})
+        self._query_budget.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._query_budget.disable()
+        super().teardown_test_environment(**kwargs)
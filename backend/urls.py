@@ -5,12 +5,21 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from rest_framework.routers import SimpleRouter
+from backend.views import AutocompleteView, ChoicesViewSet, ExportView, SearchView
+
+router = SimpleRouter()
+router.register('choices', ChoicesViewSet, basename='choices')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('users.urls')),
     path('', include('documents.urls')),
     path('', include('lecturers.urls')),
+    path('search/', SearchView.as_view(), name='search'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    path('', include(router.urls)),
+    path('export/<str:kind>.<str:extension>', ExportView.as_view(), name='export'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/password_reset/', include('django_rest_passwordreset.urls', namespace='password_reset')),
@@ -0,0 +1,169 @@
+import importlib.util
+from django.contrib.auth.models import Group
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from backend.autocomplete import autocomplete, autocomplete_types
+from backend.caching import cache_response
+from backend.conditional import conditional_get
+from backend.export import CONTENT_TYPES, export_response, exports, filter_dates
+from backend.fulltext import search, search_types
+from backend.roles import get_group_names
+from documents.models import DocumentType
+from lecturers.apps import LECTURER_READER_GROUPS
+from lecturers.models import Class, Course, Lecturer
+
+
+def allowed_kinds(request, types):
+    # Registered types carry their own reader groups and one request can span
+    # several of them, so drop the kinds the caller may not read here rather
+    # than denying the whole view
+    group_names = get_group_names(request)
+    return [
+        kind for kind, registered in types.items()
+        if registered.groups is None or group_names & set(registered.groups)
+    ]
+
+
+def get_int(request, name, default, maximum=None):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValidationError({name: "Must be an integer"})
+    if value < 0:
+        raise ValidationError({name: "Must not be negative"})
+    return min(value, maximum) if maximum is not None else value
+
+
+class SearchView(APIView):
+    """
+    Ranked full-text search over lecturers and documents:
+    GET /search/?q=<text>[&type=lecturer][&limit=20][&offset=0]
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        kinds = allowed_kinds(request, search_types)
+        selected = request.query_params.get('type')
+        if selected:
+            kinds = [kind for kind in kinds if kind == selected]
+        limit = get_int(request, 'limit', 20, self.max_limit)
+        offset = get_int(request, 'offset', 0)
+
+        hits, facets = search(query, kinds, limit, offset)
+        return Response({
+            'query': query,
+            'count': sum(facets.values()),
+            'facets': facets,
+            'results': [hit._asdict() for hit in hits],
+        })
+
+
+class AutocompleteView(APIView):
+    """
+    Labels starting with a prefix, for form dropdowns:
+    GET /autocomplete/?type=lecturer&prefix=ngu[&limit=10]
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 50
+
+    def get(self, request):
+        kinds = allowed_kinds(request, autocomplete_types)
+        kind = request.query_params.get('type')
+        if kind not in kinds:
+            raise ValidationError({'type': f"Must be one of {', '.join(kinds)}"})
+        limit = get_int(request, 'limit', 10, self.max_limit)
+        matches = autocomplete.get_index(kind).lookup(request.query_params.get('prefix', ''), limit)
+        return Response([{'id': pk, 'label': label} for pk, label in matches])
+
+
+CHOICES = ['lecturers', 'courses', 'classes', 'document_types', 'groups']
+
+
+def choices(queryset, label='name'):
+    # Tuples straight from the cursor, no model instances
+    rows = queryset.order_by(label, 'pk').values_list('pk', label)
+    return Response([{'id': pk, 'label': text} for pk, text in rows])
+
+
+class ChoicesViewSet(viewsets.ViewSet):
+    """
+    id/label pairs for form dropdowns, e.g. GET /choices/lecturers/. Each
+    list is one projection query, cached and served with a versioned ETag.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        return Response(CHOICES)
+
+    @action(detail=False)
+    @conditional_get(Lecturer)
+    @cache_response(Lecturer)
+    def lecturers(self, request):
+        if not get_group_names(request) & set(LECTURER_READER_GROUPS):
+            raise NotFound()
+        return choices(Lecturer.objects.all())
+
+    @action(detail=False)
+    @conditional_get(Course)
+    @cache_response(Course)
+    def courses(self, request):
+        return choices(Course.objects.all())
+
+    @action(detail=False)
+    @conditional_get(Class)
+    @cache_response(Class)
+    def classes(self, request):
+        return choices(Class.objects.all())
+
+    @action(detail=False)
+    @conditional_get(DocumentType)
+    @cache_response(DocumentType)
+    def document_types(self, request):
+        return choices(DocumentType.objects.all())
+
+    @action(detail=False)
+    @conditional_get(Group)
+    @cache_response(Group)
+    def groups(self, request):
+        return choices(Group.objects.all())
+
+
+class ExportView(APIView):
+    """
+    Stream a whole table for reporting: GET /export/<kind>.<csv|ndjson|xlsx>
+    with optional ?from=YYYY-MM-DD&to=YYYY-MM-DD on dated kinds.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_date(self, request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValidationError({name: "Must be a date (YYYY-MM-DD)"})
+        return parsed
+
+    def get(self, request, kind, extension):
+        if kind not in allowed_kinds(request, exports) or extension not in CONTENT_TYPES:
+            raise NotFound()
+        if extension == 'xlsx' and importlib.util.find_spec('openpyxl') is None:
+            raise ValidationError("XLSX export needs openpyxl to be installed")
+
+        spec = exports[kind]
+        queryset = spec.model.objects.all()
+        if spec.date_field:
+            queryset = filter_dates(
+                spec, queryset, self.get_date(request, 'from'), self.get_date(request, 'to'))
+        return export_response(kind, extension, queryset)
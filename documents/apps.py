@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
+
+    def ready(self):
+        from backend.autocomplete import register_autocomplete
+        from backend.export import register_export
+        from backend.fulltext import register_search_type
+        from backend.search import watch_folded_fields
+        from .models import Document, DocumentType
+        watch_folded_fields(Document, 'name', 'published_by', 'signed_by')
+        watch_folded_fields(DocumentType, 'name')
+        register_search_type('document', Document, 'name', ['published_by', 'signed_by'])
+        register_autocomplete('document', Document, 'name')
+        register_export('documents', Document, [
+            ('id', 'id'), ('name', 'name'), ('type', 'document_type__name'),
+            ('published_at', 'published_at'), ('valid_at', 'valid_at'),
+            ('published_by', 'published_by'), ('signed_by', 'signed_by'), ('link', 'file_link'),
+        ], date_field='published_at')
@@ -3,6 +3,7 @@ from django.db import models
 
 class DocumentType(models.Model):
     name = models.CharField(max_length=100)
+    name_folded = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
     
     def __str__(self):
         return self.name
@@ -18,6 +19,17 @@ class Document(models.Model):
     published_by = models.CharField(max_length=100, null=True, blank=True)
     signed_by = models.CharField(max_length=100, null=True, blank=True)
     document_type = models.ForeignKey(DocumentType, on_delete=models.SET_NULL, null=True, blank=True)
+    # Accent-folded copies for search, kept by backend.search.watch_folded_fields
+    name_folded = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+    published_by_folded = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+    signed_by_folded = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['published_at'], name='document_published_at_idx'),
+            models.Index(fields=['valid_at'], name='document_valid_at_idx'),
+            models.Index(fields=['updated_at'], name='document_updated_at_idx'),
+        ]
     
     def __str__(self):
         return self.name
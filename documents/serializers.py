@@ -1,16 +1,17 @@
 from rest_framework import serializers
+from backend.sparse import SparseFieldsMixin
 from .models import Document, DocumentType
 
-class DocumentTypeSerializer(serializers.ModelSerializer):
+class DocumentTypeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = DocumentType
         fields = ('id', 'name')
 
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     document_type = serializers.PrimaryKeyRelatedField(queryset=DocumentType.objects.all())
     document_type_name = serializers.CharField(source='document_type.name', read_only=True)
     class Meta:
         model = Document
-        fields = "__all__"
+        exclude = ('name_folded', 'published_by_folded', 'signed_by_folded')
         read_only_fields = ('id', 'uploaded_at', 'updated_at')
\ No newline at end of file
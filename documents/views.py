@@ -4,15 +4,19 @@ from rest_framework import filters as rest_filters
 from rest_framework import viewsets, permissions, status
 from rest_framework.exceptions import PermissionDenied, NotAuthenticated
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from backend.caching import cache_response
+from backend.conditional import conditional_get
+from backend.pagination import KeysetPagination
+from backend.search import FoldedSearchFilter
+from backend.sparse import SparseFieldsFilter
 from .serializers import *
 from .models import *
 
 
-class DocumentPagination(PageNumberPagination):
+class DocumentPagination(KeysetPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -35,23 +39,26 @@ class DocumentTypeViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
+    @conditional_get(DocumentType)
+    @cache_response(DocumentType)
     def list(self, request):
         queryset = DocumentType.objects.all()
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No document type found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
 
+    @conditional_get(DocumentType)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except DocumentType.DoesNotExist:
             return Response({"error": "Document not found"}, status=404)
 
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
@@ -60,7 +67,7 @@ class DocumentTypeViewSet(viewsets.ModelViewSet):
     def update(self, request, pk=None):
         try:
             document_type = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(
+            serializer = self.get_serializer(
                 document_type, data=request.data)
             if serializer.is_valid():
                 serializer.save()
@@ -83,8 +90,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
     serializer_class = DocumentSerializer
     pagination_class = DocumentPagination
     filter_backends = [
-        rest_filters.SearchFilter,
-        rest_filters.OrderingFilter
+        FoldedSearchFilter,
+        rest_filters.OrderingFilter,
+        SparseFieldsFilter,
     ]
     filterset_class = DocumentFilter
     search_fields = ["name", "published_by",
@@ -94,6 +102,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
+    @conditional_get(Document, DocumentType)
     def list(self, request):
         queryset = Document.objects.all()
 
@@ -103,25 +112,26 @@ class DocumentViewSet(viewsets.ModelViewSet):
         # Add pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
 
         # If no pagination, return all results
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No documents found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
 
+    @conditional_get(Document, DocumentType)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except Document.DoesNotExist:
             return Response({"error": "Document not found"}, status=404)
 
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
@@ -130,7 +140,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def update(self, request, pk=None):
         try:
             document = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(document, data=request.data)
+            serializer = self.get_serializer(document, data=request.data)
             if serializer.is_valid():
                 serializer.save()
                 return Response(serializer.data)
@@ -8,3 +8,4 @@ admin.site.register(Class)
 admin.site.register(Schedule)
 admin.site.register(Evaluation)
 admin.site.register(LecturerRecommendation)
+admin.site.register(LecturerStat)
@@ -1,6 +1,48 @@
 from django.apps import AppConfig
 
+# Groups allowed to list lecturers, see LecturerViewSet.view_permissions
+LECTURER_READER_GROUPS = [
+    'lecturer', 'potential_lecturer', 'it_faculty', 'education_department', 'supervision_department',
+]
+
 
 class LecturersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lecturers'
+
+    def ready(self):
+        from backend.autocomplete import register_autocomplete
+        from backend.export import register_export
+        from backend.fulltext import register_search_type
+        from backend.search import watch_folded_fields
+        from . import signals  # noqa: F401
+        from .models import Class, Course, Evaluation, Lecturer, Schedule
+        watch_folded_fields(Lecturer, 'name', 'status', 'degree', 'email', 'address')
+        register_search_type(
+            'lecturer', Lecturer, 'name',
+            ['degree', 'title', 'work_position', 'workplace', 'exp_language',
+             'researches', 'published_works', 'exp_work'],
+            groups=LECTURER_READER_GROUPS,
+        )
+        register_autocomplete('lecturer', Lecturer, 'name', groups=LECTURER_READER_GROUPS)
+        register_autocomplete('course', Course, 'name')
+        register_autocomplete('class', Class, 'name')
+        register_export('lecturers', Lecturer, [
+            ('id', 'id'), ('name', 'name'), ('email', 'email'), ('phone_number', 'phone_number'),
+            ('gender', 'gender'), ('dob', 'dob'), ('hometown', 'hometown'), ('address', 'address'),
+            ('degree', 'degree'), ('title', 'title'), ('title_detail', 'title_detail'),
+            ('work_position', 'work_position'), ('workplace', 'workplace'), ('status', 'status'),
+            ('years_of_experience', 'years_of_experience'), ('exp_academic', 'exp_academic'),
+            ('exp_work', 'exp_work'), ('researches', 'researches'),
+            ('published_works', 'published_works'), ('courses', 'courses__code'),
+            ('username', 'user__username'),
+        ], groups=['education_department', 'it_faculty', 'supervision_department'])
+        register_export('schedules', Schedule, [
+            ('id', 'id'), ('start_time', 'start_time'), ('end_time', 'end_time'),
+            ('lecturer', 'lecturer__name'), ('course_code', 'course__code'),
+            ('course', 'course__name'), ('place', 'place'), ('notes', 'notes'),
+        ], groups=LECTURER_READER_GROUPS, date_field='start_time')
+        register_export('evaluations', Evaluation, [
+            ('id', 'id'), ('date', 'date'), ('lecturer', 'lecturer__name'), ('type', 'type'),
+            ('title', 'title'), ('content', 'content'),
+        ], groups=['it_faculty', 'supervision_department'], date_field='date')
@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from .conflicts import MAX_SCHEDULE_LENGTH
+from .models import Lecturer, Schedule
+
+
+def merge(intervals):
+    """
+    Merge sorted (start, end) intervals into disjoint busy blocks.
+    """
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def slot_grid(start, end, length, zone, day_start, day_end):
+    """
+    Sorted (start, end) slots of length inside start..end, laid from
+    day_start to day_end (wall-clock times in zone) of every day.
+    """
+    slots = []
+    day = start.astimezone(zone).date()
+    while True:
+        moment = datetime.combine(day, day_start, tzinfo=zone)
+        if moment >= end:
+            return slots
+        closing = datetime.combine(day, day_end, tzinfo=zone)
+        while moment + length <= closing:
+            if moment >= start and moment + length <= end:
+                slots.append((moment, moment + length))
+            moment += length
+        day += timedelta(days=1)
+
+
+def free_ranges(slots, busy):
+    """
+    Walk the sorted slots and merged busy blocks side by side, and return
+    the free slots as [start, end] ranges of consecutive slots.
+    """
+    ranges = []
+    index = 0
+    for start, end in slots:
+        while index < len(busy) and busy[index][1] <= start:
+            index += 1
+        if index < len(busy) and busy[index][0] < end:
+            continue
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def availability(course, start, end, length, zone, day_start, day_end):
+    """
+    Free time of every active lecturer qualified for course, in slots of
+    length between start and end, with one query for the lecturers and one
+    for all their lessons in the window.
+    """
+    lecturers = list(
+        Lecturer.objects.filter(courses=course, is_active_lecturer=True)
+        .order_by('name', 'id').values_list('id', 'name'))
+    busy = defaultdict(list)
+    lessons = (
+        Schedule.objects
+        .filter(lecturer_id__in=[pk for pk, _ in lecturers],
+                start_time__gt=start - MAX_SCHEDULE_LENGTH, start_time__lt=end, end_time__gt=start)
+        .order_by('lecturer_id', 'start_time')
+        .values_list('lecturer_id', 'start_time', 'end_time')
+    )
+    for lecturer_id, lesson_start, lesson_end in lessons:
+        busy[lecturer_id].append((lesson_start, lesson_end))
+
+    slots = slot_grid(start, end, length, zone, day_start, day_end)
+    result = []
+    for pk, name in lecturers:
+        free = free_ranges(slots, merge(busy[pk]))
+        result.append({
+            'id': pk,
+            'name': name,
+            'free_slots': sum(round((range_end - range_start) / length) for range_start, range_end in free),
+            'free': [{'start': range_start, 'end': range_end} for range_start, range_end in free],
+        })
+    # Most available first
+    result.sort(key=lambda lecturer: -lecturer['free_slots'])
+    return {'slots': len(slots), 'lecturers': result}
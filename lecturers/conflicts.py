@@ -0,0 +1,218 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from .models import Lecturer, Schedule
+
+# Longest lesson accepted. Bounds the start_time range an overlap query
+# scans, so (lecturer, start_time, end_time) and (place, start_time) serve it.
+MAX_SCHEDULE_LENGTH = timedelta(hours=24)
+
+
+class IntervalTree:
+    """
+    Static interval tree over (start, end, value) items: the items sorted by
+    start form an implicit balanced binary tree whose nodes keep the largest
+    end of their subtree. overlapping() skips every subtree that ends before
+    the query starts or starts after it ends, O(log n + matches).
+    """
+
+    def __init__(self, items):
+        self.items = sorted(items, key=lambda item: item[0])
+        self.max_end = [None] * len(self.items)
+        self._build(0, len(self.items))
+
+    def _build(self, low, high):
+        if low >= high:
+            return None
+        middle = (low + high) // 2
+        end = self.items[middle][1]
+        for child in (self._build(low, middle), self._build(middle + 1, high)):
+            if child is not None and child > end:
+                end = child
+        self.max_end[middle] = end
+        return end
+
+    def overlapping(self, start, end):
+        found = []
+        stack = [(0, len(self.items))]
+        while stack:
+            low, high = stack.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            if self.max_end[middle] <= start:
+                continue
+            stack.append((low, middle))
+            item_start, item_end, value = self.items[middle]
+            # Items to the right start later still. Back-to-back lessons,
+            # one ending when the next starts, do not overlap.
+            if item_start < end:
+                if item_end > start:
+                    found.append(value)
+                stack.append((middle + 1, high))
+        return found
+
+
+class ScheduleConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'conflict'
+
+    def __init__(self, conflicts):
+        super().__init__()
+        self.conflicts = conflicts
+        # Set directly, APIException would turn every value into a string
+        self.detail = {'conflicts': describe(conflicts)}
+
+
+def saved_overlapping(schedules, ignore=()):
+    """
+    Saved schedules of the batch's lecturers or places overlapping its
+    window, with one range query on each index.
+    """
+    window_start = min(schedule.start_time for schedule in schedules)
+    window_end = max(schedule.end_time for schedule in schedules)
+    # A locking read: on InnoDB it also locks the gaps of the scanned index
+    # ranges, so a concurrent insert for the same place and window waits
+    in_window = Schedule.objects.select_for_update().filter(
+        start_time__gt=window_start - MAX_SCHEDULE_LENGTH,
+        start_time__lt=window_end,
+        end_time__gt=window_start,
+    ).exclude(pk__in=list(ignore)).only(
+        'id', 'start_time', 'end_time', 'lecturer_id', 'place', 'course_id')
+    found = {}
+    for lookup in (
+        {'lecturer_id__in': {schedule.lecturer_id for schedule in schedules}},
+        {'place__in': {schedule.place for schedule in schedules}},
+    ):
+        for schedule in in_window.filter(**lookup):
+            found[schedule.pk] = schedule
+    return list(found.values())
+
+
+def find_conflicts(schedules, ignore=()):
+    """
+    Return [(schedule, conflicting schedule, 'lecturer' or 'place')] for a
+    batch of unsaved or changed schedules, against each other and against
+    the saved rows outside ignore (ids of rows the batch replaces).
+    """
+    if not schedules:
+        return []
+    calendars = defaultdict(list)
+    for schedule in saved_overlapping(schedules, ignore) + list(schedules):
+        item = (schedule.start_time, schedule.end_time, schedule)
+        calendars['lecturer', schedule.lecturer_id].append(item)
+        calendars['place', schedule.place].append(item)
+    trees = {key: IntervalTree(items) for key, items in calendars.items()}
+
+    conflicts = []
+    seen = set()
+    for schedule in schedules:
+        for kind, key in (('lecturer', schedule.lecturer_id), ('place', schedule.place)):
+            for other in trees[kind, key].overlapping(schedule.start_time, schedule.end_time):
+                pair = (kind, frozenset((id(schedule), id(other))))
+                if other is not schedule and pair not in seen:
+                    seen.add(pair)
+                    conflicts.append((schedule, other, kind))
+    return conflicts
+
+
+def lock_lecturers(schedules):
+    """
+    Lock the rows of the batch's lecturers, in pk order, until the
+    transaction ends, so that two writers booking one lecturer check and
+    save one after the other.
+    """
+    lecturer_ids = sorted({schedule.lecturer_id for schedule in schedules} - {None})
+    list(Lecturer.objects.select_for_update().filter(pk__in=lecturer_ids)
+         .order_by('pk').values_list('pk', flat=True))
+
+
+def check_conflicts(schedules, ignore=()):
+    """
+    Raise ScheduleConflict when schedules overlap each other or saved rows.
+    Call it in the transaction that saves them, which keeps the lecturers
+    and the overlapping rows locked until it commits.
+    """
+    if schedules:
+        lock_lecturers(schedules)
+    conflicts = find_conflicts(schedules, ignore)
+    if conflicts:
+        raise ScheduleConflict(conflicts)
+
+
+def sweep_conflicts(rows, key):
+    """
+    Yield (earlier, later) overlapping pairs of rows sharing row[key], rows
+    being dicts sorted by start_time. Each row is compared only with the
+    rows still running when it starts, kept in a heap by end_time.
+    """
+    running = defaultdict(list)
+    for row in rows:
+        active = running[row[key]]
+        while active and active[0][0] <= row['start_time']:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, row
+        heapq.heappush(active, (row['end_time'], row['id'], row))
+
+
+def conflict_report(start, end):
+    """
+    Every lecturer and place double booking among the schedules overlapping
+    start..end, found with one indexed query and a sweep over start times.
+    """
+    rows = list(
+        Schedule.objects
+        .filter(start_time__gt=start - MAX_SCHEDULE_LENGTH, start_time__lt=end, end_time__gt=start)
+        .order_by('start_time', 'id')
+        .values('id', 'start_time', 'end_time', 'lecturer_id', 'lecturer__name',
+                'place', 'course__name')
+    )
+    report = []
+    for kind, key in (('lecturer', 'lecturer_id'), ('place', 'place')):
+        for first, second in sweep_conflicts(rows, key):
+            report.append({
+                'type': kind,
+                'lecturer' if kind == 'lecturer' else 'place': first[key],
+                'overlap_start': max(first['start_time'], second['start_time']),
+                'overlap_end': min(first['end_time'], second['end_time']),
+                'schedules': [schedule_data(first), schedule_data(second)],
+            })
+    report.sort(key=lambda conflict: conflict['overlap_start'])
+    return report
+
+
+def schedule_data(row):
+    return {
+        'id': row['id'],
+        'start': row['start_time'],
+        'end': row['end_time'],
+        'lecturer': row['lecturer_id'],
+        'lecturer_name': row['lecturer__name'],
+        'place': row['place'],
+        'course_name': row['course__name'],
+    }
+
+
+def describe(conflicts):
+    """
+    Conflicts as response data.
+    """
+    to_string = serializers.DateTimeField().to_representation
+    return [
+        {
+            'type': kind,
+            'start': to_string(schedule.start_time),
+            'end': to_string(schedule.end_time),
+            'conflicts_with': {
+                'id': other.pk,
+                'start': to_string(other.start_time),
+                'end': to_string(other.end_time),
+                'place': other.place,
+                'lecturer': other.lecturer_id,
+            },
+        }
+        for schedule, other, kind in conflicts
+    ]
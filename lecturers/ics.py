@@ -0,0 +1,142 @@
+import secrets
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from backend.caching import get_backend, get_config
+from .models import Schedule, ScheduleFeedToken
+
+PRODID = '-//lecturer_management//Schedules//VI'
+UID_DOMAIN = 'lecturer-management'
+# Columns an event is rendered from
+FIELDS = ('id', 'updated_at', 'start_time', 'end_time', 'place', 'notes', 'course__name')
+
+
+def feed_token(lecturer, rotate=False):
+    """
+    Secret token of the lecturer's feed URL, created on first use and
+    replaced when rotate is set.
+    """
+    if not rotate:
+        existing = ScheduleFeedToken.objects.filter(lecturer=lecturer).values_list('token', flat=True).first()
+        if existing:
+            return existing
+    token = secrets.token_urlsafe(32)
+    ScheduleFeedToken.objects.update_or_create(lecturer=lecturer, defaults={'token': token})
+    return token
+
+
+def token_lecturer(token):
+    """
+    Lecturer whose feed token is token, or None.
+    """
+    found = ScheduleFeedToken.objects.select_related('lecturer').filter(token=token).first()
+    return found.lecturer if found else None
+
+
+def escape(text):
+    """
+    TEXT value escaping of RFC 5545.
+    """
+    return (
+        (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """
+    line with its CRLF, split into 75 octet lines continued by a space,
+    never inside a UTF-8 sequence.
+    """
+    data = line.encode()
+    parts, start, limit = [], 0, 75
+    while len(data) - start > limit:
+        end = start + limit
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode())
+        start, limit = end, 74
+    parts.append(data[start:].decode())
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def utc(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(row):
+    pk, updated_at, start, end, place, notes, course = row
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:schedule-{pk}@{UID_DOMAIN}',
+        f'DTSTAMP:{utc(updated_at)}',
+        f'LAST-MODIFIED:{utc(updated_at)}',
+        f'DTSTART:{utc(start)}',
+        f'DTEND:{utc(end)}',
+        f'SUMMARY:{escape(course)}',
+        f'LOCATION:{escape(place)}',
+    ]
+    if notes:
+        lines.append(f'DESCRIPTION:{escape(notes)}')
+    lines.append('END:VEVENT')
+    return ''.join(fold_line(line) for line in lines)
+
+
+def cache_key(lecturer_id):
+    return f"{get_config()['KEY_PREFIX']}:ics:{lecturer_id}"
+
+
+def feed_events(lecturer_id, versions):
+    """
+    Rendered VEVENTs of the lecturer's schedules, kept per lecturer in the
+    response cache with {schedule id: (updated_at, text)} and the versions
+    (see backend.conditional.queryset_versions) they were rendered at.
+
+    Unchanged versions reuse every event without a query. Otherwise, while
+    the course names are unchanged, only (id, updated_at) is read and just
+    the new or changed schedules are rendered again. A cold feed is
+    rendered while it streams.
+    """
+    backend = get_backend()
+    key = cache_key(lecturer_id)
+    cached = backend.get(key)
+    courses = {label: version for label, version in versions.items() if label != 'rows'}
+    if cached is not None and cached['versions'] == versions:
+        return (text for _, text in cached['events'].values())
+    schedules = Schedule.objects.filter(lecturer_id=lecturer_id)
+    timeout = getattr(settings, 'SCHEDULE_FEED_TIMEOUT', 24 * 60 * 60)
+
+    if cached is None or cached['courses'] != courses:
+        def render():
+            events = {}
+            for row in schedules.order_by('start_time').values_list(*FIELDS).iterator(chunk_size=500):
+                events[row[0]] = (row[1], render_event(row))
+                yield events[row[0]][1]
+            backend.set(key, {'versions': versions, 'courses': courses, 'events': events}, timeout)
+        return render()
+
+    old = cached['events']
+    current = dict(schedules.values_list('id', 'updated_at'))
+    stale = [pk for pk, updated_at in current.items() if old.get(pk, (None,))[0] != updated_at]
+    rendered = {
+        row[0]: (row[1], render_event(row))
+        for row in schedules.filter(pk__in=stale).values_list(*FIELDS)
+    } if stale else {}
+    events = {pk: rendered.get(pk) or old[pk] for pk in current}
+    backend.set(key, {'versions': versions, 'courses': courses, 'events': events}, timeout)
+    return (text for _, text in events.values())
+
+
+def calendar(name, events):
+    """
+    Chunks of a VCALENDAR named name holding events.
+    """
+    yield ''.join(fold_line(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}',
+    ))
+    yield from events
+    yield fold_line('END:VCALENDAR')
@@ -0,0 +1,218 @@
+import csv
+import io
+import json
+import re
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from django.db import connection, transaction
+from django.db.models import Max
+from rest_framework import serializers
+from backend.autocomplete import autocomplete
+from backend.conditional import bump_model_version
+from backend.fulltext import index_instances
+from backend.search import field_value, fold, folded_models, folded_values
+from .models import Course, Lecturer
+from .serializers import LecturerImportSerializer
+from .stats import adjust_bucket, is_active
+
+EXTENSIONS = ('csv', 'xlsx')
+CHUNK_SIZE = 500
+
+
+class ImportFileError(ValueError):
+    """
+    The uploaded file cannot be read at all, as opposed to row errors.
+    """
+
+
+def read_rows(file, extension):
+    """
+    Yield (row number, {header: value}) from a binary CSV or XLSX file, one
+    row at a time. The header is row 1, blank rows are skipped.
+    """
+    if extension == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError("XLSX import needs openpyxl")
+        try:
+            rows = load_workbook(file, read_only=True, data_only=True).active.iter_rows(values_only=True)
+        except Exception as error:
+            raise ImportFileError(f"Not an XLSX file: {error}")
+    else:
+        # utf-8-sig drops the BOM written by /export/ and spreadsheet programs
+        rows = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        headers = [str(header or '').strip() for header in next(rows, [])]
+        for number, values in enumerate(rows, start=2):
+            if all(value is None or str(value).strip() == '' for value in values):
+                continue
+            yield number, dict(zip(headers, values))
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise ImportFileError(f"Not a UTF-8 CSV file: {error}")
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class LecturerImport:
+    """
+    Validate rows of lecturers in chunks and create the valid ones with
+    bulk_create. Columns are named like the fields of LecturerSerializer,
+    plus 'courses' holding course codes separated by ',' or ';'. Columns that
+    cannot be written, such as the 'id' of an export, are ignored.
+
+    The import is all or nothing: when any row has errors nothing is saved.
+    """
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        # One serializer reused for every row, binding its fields is costly
+        self.serializer = LecturerImportSerializer()
+        self.columns = {
+            name for name, field in self.serializer.fields.items() if not field.read_only
+        } | {'courses'}
+        self.course_ids = {
+            code.casefold(): pk for code, pk in Course.objects.values_list('code', 'pk')
+        }
+        # Folded emails seen so far in the file
+        self.emails = set()
+        self.valid = []
+        self.errors = []
+        self.ignored = set()
+        self.rows = 0
+
+    def clean(self, row):
+        """
+        Return (data for the serializer, course codes, errors) of a row.
+        """
+        data, errors, codes = {}, {}, []
+        for header, value in row.items():
+            if header not in self.columns:
+                if header:
+                    self.ignored.add(header)
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+            if value is None or value == '':
+                continue
+            field = self.serializer.fields.get(header)
+            if header == 'courses':
+                codes = [code.strip() for code in re.split(r'[,;]', str(value)) if code.strip()]
+            elif isinstance(field, serializers.JSONField) and isinstance(value, str):
+                try:
+                    data[header] = json.loads(value)
+                except ValueError:
+                    errors[header] = ["Invalid JSON."]
+            elif isinstance(field, serializers.DateField) and isinstance(value, datetime):
+                # XLSX date cells are read as datetimes
+                data[header] = value.date()
+            else:
+                data[header] = value
+        return data, codes, errors
+
+    def validate(self, rows):
+        for chunk in chunks(rows, self.chunk_size):
+            self.validate_chunk(chunk)
+
+    def validate_chunk(self, chunk):
+        cleaned = [(number, *self.clean(row)) for number, row in chunk]
+        emails = {fold(str(data.get('email', '')))[:100] for _, data, _, _ in cleaned}
+        # One lookup per chunk against the indexed folded column
+        existing = set(Lecturer.objects.filter(email_folded__in=emails - {''})
+                       .values_list('email_folded', flat=True))
+        for number, data, codes, errors in cleaned:
+            self.rows += 1
+            try:
+                validated = self.serializer.run_validation(data)
+            except serializers.ValidationError as error:
+                errors = {**error.detail, **errors}
+                validated = None
+            email = fold(str(data.get('email', '')))[:100]
+            if email in existing:
+                errors.setdefault('email', []).append("A lecturer with this email already exists.")
+            elif email and email in self.emails:
+                errors.setdefault('email', []).append("Duplicate email in the file.")
+            self.emails.add(email)
+            unknown = [code for code in codes if code.casefold() not in self.course_ids]
+            if unknown:
+                errors['courses'] = [f"Unknown course code: {code}." for code in unknown]
+            if errors:
+                self.errors.append({'row': number, 'errors': errors})
+            elif validated is not None:
+                course_ids = {self.course_ids[code.casefold()] for code in codes}
+                self.valid.append((Lecturer(**validated), course_ids))
+
+    @transaction.atomic
+    def save(self):
+        """
+        Create the valid lecturers with their courses, search entries and
+        statistics. bulk_create sends no signals, so everything the Lecturer
+        signals keep is written here in bulk.
+        """
+        lecturers = [lecturer for lecturer, _ in self.valid]
+        for lecturer in lecturers:
+            lecturer.status = field_value(lecturer, 'status')
+            for name, value in folded_values(lecturer, folded_models[Lecturer]).items():
+                setattr(lecturer, name, value)
+            # No user is linked yet, so only a signed contract makes one active
+            lecturer.is_active_lecturer = is_active(self.bucket(lecturer))
+
+        last_pk = Lecturer.objects.aggregate(last=Max('pk'))['last'] or 0
+        Lecturer.objects.bulk_create(lecturers, batch_size=self.chunk_size)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL returns no ids, find them back by the emails checked unique above
+            self.assign_ids(lecturers, last_pk)
+
+        Through = Lecturer.courses.through
+        Through.objects.bulk_create([
+            Through(lecturer_id=lecturer.pk, course_id=course_id)
+            for lecturer, course_ids in self.valid for course_id in course_ids
+        ], batch_size=self.chunk_size)
+        for bucket, count in Counter(self.bucket(lecturer) for lecturer in lecturers).items():
+            adjust_bucket(bucket, count)
+        index_instances('lecturer', lecturers, batch_size=self.chunk_size)
+
+        autocomplete.mark_dirty('lecturer')
+        bump_model_version(Lecturer)
+        return len(lecturers)
+
+    def assign_ids(self, lecturers, last_pk):
+        by_email = {lecturer.email_folded: lecturer for lecturer in lecturers}
+        for emails in chunks(by_email, self.chunk_size):
+            rows = Lecturer.objects.filter(pk__gt=last_pk, email_folded__in=emails).values_list(
+                'email_folded', 'pk')
+            for email, pk in rows:
+                by_email[email].pk = pk
+
+    @staticmethod
+    def bucket(lecturer):
+        return (lecturer.status, lecturer.degree, lecturer.title, False, False)
+
+    def report(self, created=0, dry_run=False):
+        return {
+            'rows': self.rows,
+            'valid': len(self.valid),
+            'created': created,
+            'dry_run': dry_run,
+            'ignored_columns': sorted(self.ignored),
+            'errors': self.errors,
+        }
+
+
+def import_lecturers(file, extension, dry_run=False, chunk_size=None):
+    """
+    Validate every row of file and, unless dry_run or a row has errors,
+    create the lecturers. Return the report of LecturerImport.report().
+    Raise ImportFileError when the file cannot be read.
+    """
+    importer = LecturerImport(chunk_size)
+    importer.validate(read_rows(file, extension))
+    created = 0
+    if not dry_run and not importer.errors:
+        created = importer.save()
+    return importer.report(created, dry_run)
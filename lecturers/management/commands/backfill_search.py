@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from backend.search import backfill_folded_fields, folded_models
+
+
+class Command(BaseCommand):
+    help = ("Recompute the accent-folded search columns, e.g. after queryset.update() "
+            "or bulk_create() skipped them")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, fields in folded_models.items():
+            updated = backfill_folded_fields(model, fields, options['batch_size'])
+            self.stdout.write(f"{model._meta.label}: {updated} rows updated")
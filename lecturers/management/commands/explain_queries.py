@@ -0,0 +1,141 @@
+import re
+from datetime import timedelta
+from django.core.exceptions import FieldError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from documents.models import Document
+from documents.views import DocumentViewSet
+from lecturers.conflicts import MAX_SCHEDULE_LENGTH
+from lecturers.models import Class, Course, Evaluation, Lecturer, LecturerRecommendation, Schedule
+from lecturers.stats import SIGNED_STATUS, UNCHECKED_RECOMMENDATION_STATUS
+from lecturers.views import (
+    ClassViewSet, CourseViewSet, LecturerRecommendationViewSet, LecturerViewSet,
+)
+
+# SQLite: "SCAN lecturers_lecturer" without "USING ... INDEX" reads the whole table
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)')
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def hot_querysets():
+    """
+    Main queryset of each hot viewset action, built the way the views do.
+    """
+    now = timezone.now()
+    return {
+        'LecturerViewSet.list': Lecturer.objects.filter(is_active_lecturer=True).order_by('name'),
+        'LecturerViewSet.potential_lecturers': Lecturer.objects.filter(
+            Q(user__groups__name='potential_lecturer') | ~Q(status=SIGNED_STATUS)
+        ).distinct(),
+        'LecturerViewSet.status': Lecturer.objects.filter(status=SIGNED_STATUS).order_by('name'),
+        'CourseViewSet.lecturer_count': Course.objects.filter(lecturer__is_active_lecturer=True),
+        'ScheduleViewSet.today': Schedule.objects.filter(
+            start_time__gte=now, start_time__lt=now + timedelta(days=1),
+        ).select_related('course', 'lecturer').order_by('start_time', 'id'),
+        'ScheduleViewSet.list (window)': Schedule.objects.filter(
+            start_time__gt=now - MAX_SCHEDULE_LENGTH, start_time__lt=now + timedelta(days=7),
+            end_time__gt=now).select_related('course').order_by('start_time', 'id'),
+        'ScheduleViewSet.get_schedules_by_lecturer': Schedule.objects.filter(
+            lecturer_id=1, start_time__gt=now - MAX_SCHEDULE_LENGTH, start_time__lt=now + timedelta(days=7),
+            end_time__gt=now).select_related('course').order_by('start_time', 'id'),
+        'ScheduleViewSet.place': Schedule.objects.filter(
+            place='A1', start_time__gte=now).order_by('start_time'),
+        'ScheduleSerializer.validate (lecturer overlap)': Schedule.objects.filter(
+            lecturer_id__in=[1], start_time__gt=now - MAX_SCHEDULE_LENGTH,
+            start_time__lt=now + timedelta(hours=2), end_time__gt=now),
+        'ScheduleSerializer.validate (place overlap)': Schedule.objects.filter(
+            place__in=['A1'], start_time__gt=now - MAX_SCHEDULE_LENGTH,
+            start_time__lt=now + timedelta(hours=2), end_time__gt=now),
+        'EvaluationViewSet.get_by_lecturer': Evaluation.objects.filter(
+            lecturer_id=1).order_by('-date'),
+        'LecturerRecommendationViewSet.count_unchecked': LecturerRecommendation.objects.filter(
+            status=UNCHECKED_RECOMMENDATION_STATUS),
+        'LecturerRecommendationViewSet.list': LecturerRecommendation.objects.order_by('-date'),
+        'DocumentViewSet.valid': Document.objects.filter(valid_at__lte=now.date()),
+    }
+
+
+def ordering_querysets():
+    """
+    One queryset per OrderingFilter field of the paginated viewsets.
+    """
+    viewsets = {
+        CourseViewSet: Course,
+        LecturerViewSet: Lecturer,
+        ClassViewSet: Class,
+        LecturerRecommendationViewSet: LecturerRecommendation,
+        DocumentViewSet: Document,
+    }
+    querysets = {}
+    for viewset, model in viewsets.items():
+        for field in viewset.ordering_fields:
+            try:
+                queryset = model.objects.order_by(field)
+            except FieldError:
+                # Listed in ordering_fields but not a column, OrderingFilter ignores it
+                continue
+            querysets[f'{viewset.__name__}?ordering={field}'] = queryset
+    return querysets
+
+
+def explain(queryset, connection):
+    """
+    Return (plan lines, full scans, sorts) for a queryset.
+    """
+    if connection.vendor == 'mysql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        lines = [
+            f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}"
+            for row in rows
+        ]
+        scans = [row['table'] for row in rows if row['type'] == 'ALL']
+        sorts = [row['table'] for row in rows if 'filesort' in (row['Extra'] or '')]
+        return lines, scans, sorts
+
+    lines = queryset.explain().splitlines()
+    scans = [match.group(1) for line in lines for match in [SQLITE_FULL_SCAN.search(line)] if match]
+    sorts = [line for line in lines if SQLITE_SORT in line]
+    return lines, scans, sorts
+
+
+class Command(BaseCommand):
+    help = ("Run EXPLAIN on the main queryset of each viewset action and flag full table "
+            "scans and unindexed sorts. Works on MySQL and SQLite. Planners may prefer "
+            "scans on tiny tables, so run it against realistic data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan")
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help="Exit with an error when a full scan is found")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor not in ('mysql', 'sqlite'):
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        querysets = {**hot_querysets(), **ordering_querysets()}
+        flagged = []
+        for name, queryset in querysets.items():
+            lines, scans, sorts = explain(queryset.using(options['database']), connection)
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"{name}: full scan of {', '.join(scans)}"))
+            elif sorts:
+                self.stdout.write(self.style.WARNING(f"{name}: sort without an index"))
+            else:
+                self.stdout.write(f"{name}: ok")
+            if options['verbose_plans'] or scans:
+                for line in lines:
+                    self.stdout.write(f"    {line}")
+
+        self.stdout.write(f"{len(querysets)} queries checked on {connection.vendor}, "
+                          f"{len(flagged)} with full scans")
+        if flagged and options['fail_on_scan']:
+            raise CommandError(f"Full scans in: {', '.join(flagged)}")
@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from lecturers.imports import EXTENSIONS, ImportFileError, import_lecturers
+
+
+class Command(BaseCommand):
+    help = ("Create lecturers from a CSV or XLSX file with the columns of /export/lecturers.csv. "
+            "Nothing is saved when a row has errors")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--dry-run', action='store_true', help="Validate only")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        extension = options['path'].rpartition('.')[2].lower()
+        if extension not in EXTENSIONS:
+            raise CommandError("Expected a .csv or .xlsx file")
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                report = import_lecturers(
+                    file, extension, dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+        except (OSError, ImportFileError) as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors']:
+            messages = '; '.join(
+                f"{field}: {' '.join(str(message) for message in messages)}"
+                for field, messages in error['errors'].items())
+            self.stderr.write(f"row {error['row']}: {messages}")
+        if report['ignored_columns']:
+            self.stdout.write(f"Ignored columns: {', '.join(report['ignored_columns'])}")
+        self.stdout.write(
+            f"{report['rows']} rows, {report['valid']} valid, {report['created']} created "
+            f"in {elapsed:.2f}s" + (" (dry run)" if report['dry_run'] else ""))
+        if report['errors']:
+            raise CommandError(f"{len(report['errors'])} rows have errors, nothing was imported")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from lecturers.stats import rebuild_stats, stats_drift
+
+
+class Command(BaseCommand):
+    help = "Rebuild the LecturerStat table and is_active_lecturer flags, or check for drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report buckets whose stored count is wrong")
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = stats_drift()
+            for bucket, (stored, actual) in sorted(drift.items(), key=str):
+                self.stdout.write(f"{bucket}: stored {stored}, actual {actual}")
+            if drift:
+                raise CommandError(f"{len(drift)} lecturer statistics buckets drifted")
+            self.stdout.write(self.style.SUCCESS("Lecturer statistics are in sync"))
+            return
+
+        buckets = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt lecturer statistics: {len(buckets)} buckets, "
+            f"{sum(buckets.values())} lecturers"))
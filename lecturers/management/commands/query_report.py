@@ -0,0 +1,44 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from backend.middleware import get_config, merge_sample, summarize
+
+
+class Command(BaseCommand):
+    help = "Summarize the per-action query samples written by QueryBudgetMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help="Samples file (defaults to QUERY_BUDGET['LOG_FILE'])")
+        parser.add_argument('--output', help="Write the JSON summary to this file instead of stdout")
+        parser.add_argument('--budget', type=int,
+                            help="Fail when an action's max query count exceeds this budget")
+
+    def handle(self, *args, **options):
+        path = options['file'] or get_config()['LOG_FILE']
+        if not path:
+            raise CommandError("No samples file given and QUERY_BUDGET['LOG_FILE'] is not set")
+
+        action_stats = {}
+        try:
+            with open(path, encoding='utf-8') as fh:
+                for line in fh:
+                    if line.strip():
+                        merge_sample(action_stats, json.loads(line))
+        except FileNotFoundError:
+            raise CommandError(f"Samples file not found: {path}")
+
+        report = json.dumps(summarize(action_stats), indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(report)
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote summary of {len(action_stats)} actions to {options['output']}"))
+        else:
+            self.stdout.write(report)
+
+        budget = options['budget']
+        if budget is not None:
+            over = [action for action, stats in action_stats.items()
+                    if stats['max_queries'] > budget]
+            if over:
+                raise CommandError(
+                    f"Actions over the budget of {budget} queries: {', '.join(sorted(over))}")
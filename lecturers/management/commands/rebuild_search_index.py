@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from backend.fulltext import rebuild_index, search_types
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search entries, e.g. after bulk writes that skipped signals"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', help=f"Kinds to rebuild: {', '.join(search_types)}")
+
+    def handle(self, *args, **options):
+        unknown = set(options['kinds']) - set(search_types)
+        if unknown:
+            raise CommandError(f"Unknown search kinds: {', '.join(sorted(unknown))}")
+        for kind, count in rebuild_index(options['kinds']).items():
+            self.stdout.write(f"{kind}: {count} entries")
@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from backend.search import fold, folded_lookup, prefix_q
+from lecturers.models import Lecturer
+from lecturers.views import LecturerViewSet
+
+FAMILY_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng',
+                'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương', 'Lý']
+MIDDLE_NAMES = ['Văn', 'Thị', 'Đức', 'Minh', 'Thành', 'Quốc', 'Ngọc', 'Hữu', 'Thu', 'Gia']
+GIVEN_NAMES = ['An', 'Bình', 'Cường', 'Dũng', 'Đạt', 'Giang', 'Hà', 'Hải', 'Hiếu', 'Hùng',
+               'Khánh', 'Linh', 'Long', 'Mai', 'Nam', 'Phương', 'Quân', 'Sơn', 'Thảo', 'Trang']
+CITIES = ['Hà Nội', 'Hải Phòng', 'Đà Nẵng', 'Huế', 'Cần Thơ', 'Nha Trang']
+DEGREES = ['Thạc sĩ', 'Tiến sĩ', 'Cử nhân']
+STATUSES = ['Đã ký hợp đồng', 'Chưa được duyệt', 'Đã duyệt hồ sơ']
+
+
+def fake_lecturer(i):
+    name = f'{random.choice(FAMILY_NAMES)} {random.choice(MIDDLE_NAMES)} {random.choice(GIVEN_NAMES)}'
+    address = f'{i} {random.choice(CITIES)}'
+    lecturer = Lecturer(
+        name=name, email=f'lecturer{i}@example.com', phone_number='0123456789',
+        gender='Nam', dob=date(1980, 1, 1), hometown=random.choice(CITIES),
+        degree=random.choice(DEGREES), title_detail='', title_granted_at=date(2010, 1, 1),
+        address=address, work_position='Giảng viên', workplace='HUST',
+        status=random.choice(STATUSES),
+    )
+    # bulk_create skips the save signals that fill the shadow columns
+    for field in ('name', 'status', 'degree', 'email', 'address'):
+        setattr(lecturer, f'{field}_folded', fold(getattr(lecturer, field)))
+    return lecturer
+
+
+def timed(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(queryset.values_list('pk', flat=True))
+        timings.append((time.perf_counter() - start) * 1000)
+    return count, statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = ("Compare icontains over the raw lecturer columns with the folded prefix "
+            "search on generated rows. Runs in a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('queries', nargs='*',
+                            default=['Nguyễn Văn', 'nguyen van', 'Đặng', 'dang', 'Hà Nội', 'tien si'])
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        fields = LecturerViewSet.search_fields
+        with transaction.atomic():
+            Lecturer.objects.bulk_create(
+                (fake_lecturer(i) for i in range(options['rows'])), batch_size=2000)
+            self.stdout.write(f"{Lecturer.objects.count()} lecturers, median of {options['repeat']} runs")
+            self.stdout.write(f"{'query':<16}{'icontains':>22}{'folded prefix':>22}")
+            for query in options['queries']:
+                raw = Q()
+                folded = Q()
+                for field in fields:
+                    raw |= Q(**{f'{field}__icontains': query})
+                    path = folded_lookup(Lecturer, field)
+                    folded |= prefix_q(path, fold(query)) if path else Q(**{f'{field}__icontains': fold(query)})
+                raw_count, raw_ms = timed(Lecturer.objects.filter(raw), options['repeat'])
+                folded_count, folded_ms = timed(Lecturer.objects.filter(folded), options['repeat'])
+                self.stdout.write(
+                    f"{query:<16}{raw_count:>8} rows {raw_ms:>8.1f} ms"
+                    f"{folded_count:>8} rows {folded_ms:>8.1f} ms")
+            transaction.set_rollback(True)
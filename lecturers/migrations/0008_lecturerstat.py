@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef
+
+
+def build_lecturer_stats(apps, schema_editor):
+    Lecturer = apps.get_model('lecturers', 'Lecturer')
+    LecturerStat = apps.get_model('lecturers', 'LecturerStat')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Membership = CustomUser.groups.through
+
+    def in_group(name):
+        return Exists(Membership.objects.filter(
+            customuser_id=OuterRef('user_id'), group__name=name))
+
+    rows = (
+        Lecturer.objects
+        .annotate(
+            in_lecturer_group=in_group('lecturer'),
+            in_potential_group=in_group('potential_lecturer'),
+        )
+        .values('status', 'degree', 'title', 'in_lecturer_group', 'in_potential_group')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    LecturerStat.objects.bulk_create([LecturerStat(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('lecturers', '0007_evaluation_lecturerrecommendation'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LecturerStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=100)),
+                ('degree', models.CharField(max_length=20)),
+                ('title', models.CharField(blank=True, max_length=20)),
+                ('in_lecturer_group', models.BooleanField(default=False)),
+                ('in_potential_group', models.BooleanField(default=False)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('status', 'degree', 'title', 'in_lecturer_group', 'in_potential_group'), name='unique_lecturer_stat_bucket')],
+            },
+        ),
+        migrations.RunPython(build_lecturer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:41
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q
+
+
+def backfill_is_active_lecturer(apps, schema_editor):
+    Lecturer = apps.get_model('lecturers', 'Lecturer')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    in_lecturer_group = Exists(CustomUser.groups.through.objects.filter(
+        customuser_id=OuterRef('user_id'), group__name='lecturer'))
+    Lecturer.objects.filter(
+        Q(in_lecturer_group) | Q(status="Đã ký hợp đồng")
+    ).update(is_active_lecturer=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturers', '0009_modelversion'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecturer',
+            name='is_active_lecturer',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(backfill_is_active_lecturer, migrations.RunPython.noop),
+    ]
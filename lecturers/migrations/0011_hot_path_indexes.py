@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturers', '0010_lecturer_is_active_lecturer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lecturer',
+            index=models.Index(fields=['status', 'name'], name='lecturer_status_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecturer',
+            index=models.Index(fields=['degree'], name='lecturer_degree_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecturer',
+            index=models.Index(fields=['title'], name='lecturer_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecturer',
+            index=models.Index(fields=['name'], name='lecturer_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['start_time'], name='schedule_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['lecturer', 'start_time'], name='schedule_lecturer_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['place', 'start_time'], name='schedule_place_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecturerrecommendation',
+            index=models.Index(fields=['status', 'date'], name='recommendation_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecturerrecommendation',
+            index=models.Index(fields=['date'], name='recommendation_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluation',
+            index=models.Index(fields=['lecturer', 'date'], name='evaluation_lecturer_date_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:20
+
+import unicodedata
+from django.db import migrations, models
+
+
+def fold(value):
+    # Frozen copy of backend.search.fold as of this migration
+    if not value:
+        return ''
+    value = value.replace('đ', 'd').replace('Đ', 'd')
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.lower().split())
+
+
+def backfill(model, fields, batch_size=1000):
+    columns = [f'{field}_folded' for field in fields]
+    last_pk = None
+    while True:
+        rows = model._base_manager.order_by('pk').only(*fields, *columns)
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        rows = list(rows[:batch_size])
+        if not rows:
+            return
+        for row in rows:
+            for field, column in zip(fields, columns):
+                max_length = model._meta.get_field(column).max_length
+                setattr(row, column, fold(getattr(row, field))[:max_length])
+        model._base_manager.bulk_update(rows, columns)
+        last_pk = rows[-1].pk
+
+
+def fold_lecturers(apps, schema_editor):
+    Lecturer = apps.get_model('lecturers', 'Lecturer')
+    backfill(Lecturer, ['name', 'status', 'degree', 'email', 'address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturers', '0011_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecturer',
+            name='name_folded',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='lecturer',
+            name='status_folded',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='lecturer',
+            name='degree_folded',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='lecturer',
+            name='email_folded',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='lecturer',
+            name='address_folded',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fold_lecturers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:02
+
+import unicodedata
+from django.db import migrations, models
+
+# Frozen copies of backend.fulltext and backend.search as of this migration
+FTS_TABLE = 'lecturers_searchentry_fts'
+
+# kind -> (model, title field, searched fields)
+SEARCH_TYPES = {
+    'lecturer': ('lecturers.Lecturer', 'name',
+                 ['degree', 'title', 'work_position', 'workplace', 'exp_language',
+                  'researches', 'published_works', 'exp_work']),
+    'document': ('documents.Document', 'name', ['published_by', 'signed_by']),
+}
+
+CREATE_INDEX = {
+    'mysql': [
+        'ALTER TABLE lecturers_searchentry '
+        'ADD FULLTEXT INDEX searchentry_fulltext (title_folded, body_folded), '
+        'ADD FULLTEXT INDEX searchentry_title_fulltext (title_folded)',
+    ],
+    'sqlite': [
+        # External content table, the triggers keep it in step with the rows
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title_folded, body_folded, "
+        f"content='lecturers_searchentry', content_rowid='id')",
+        f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON lecturers_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, title_folded, body_folded) "
+        f"VALUES (new.id, new.title_folded, new.body_folded); END",
+        f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON lecturers_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title_folded, body_folded) "
+        f"VALUES ('delete', old.id, old.title_folded, old.body_folded); END",
+        f"CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON lecturers_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title_folded, body_folded) "
+        f"VALUES ('delete', old.id, old.title_folded, old.body_folded); "
+        f"INSERT INTO {FTS_TABLE}(rowid, title_folded, body_folded) "
+        f"VALUES (new.id, new.title_folded, new.body_folded); END",
+    ],
+}
+
+DROP_INDEX = {
+    'mysql': [
+        'ALTER TABLE lecturers_searchentry '
+        'DROP INDEX searchentry_fulltext, DROP INDEX searchentry_title_fulltext',
+    ],
+    'sqlite': [
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+        f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+        f'DROP TABLE IF EXISTS {FTS_TABLE}',
+    ],
+}
+
+
+def fold(value):
+    if not value:
+        return ''
+    value = value.replace('đ', 'd').replace('Đ', 'd')
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.lower().split())
+
+
+def flatten(value):
+    if value is None or value == '':
+        return
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from flatten(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from flatten(item)
+    else:
+        yield str(value)
+
+
+def add_fulltext_index(apps, schema_editor):
+    for statement in CREATE_INDEX.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def remove_fulltext_index(apps, schema_editor):
+    for statement in DROP_INDEX.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def build_search_entries(apps, schema_editor, batch_size=1000):
+    SearchEntry = apps.get_model('lecturers', 'SearchEntry')
+    for kind, (label, title_field, fields) in SEARCH_TYPES.items():
+        model = apps.get_model(label)
+        batch = []
+        for instance in model._base_manager.order_by('pk').iterator(chunk_size=batch_size):
+            title = str(getattr(instance, title_field) or '')[:255]
+            body = '\n'.join(
+                text for field in fields for text in flatten(getattr(instance, field)))
+            batch.append(SearchEntry(
+                kind=kind, object_id=instance.pk, title=title, body=body,
+                title_folded=fold(title)[:255], body_folded=fold(body)))
+            if len(batch) >= batch_size:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_document_folded_fields'),
+        ('lecturers', '0012_lecturer_folded_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('title_folded', models.CharField(max_length=255)),
+                ('body_folded', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+        migrations.RunPython(build_search_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturers', '0013_searchentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.CharField(max_length=200)),
+                ('notes', models.CharField(blank=True, max_length=500, null=True)),
+                ('weekdays', models.JSONField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('timezone', models.CharField(max_length=64)),
+                ('excluded_dates', models.JSONField(blank=True, default=list)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lecturers.course')),
+                ('lecturer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lecturers.lecturer')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='lecturers.scheduleseries'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturers', '0014_scheduleseries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['lecturer', 'start_time', 'end_time'], name='schedule_lecturer_span_idx'),
+        ),
+        # After the new index, which MySQL can use for the lecturer foreign key
+        migrations.RemoveIndex(
+            model_name='schedule',
+            name='schedule_lecturer_start_idx',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturers', '0016_schedule_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleFeedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('lecturer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feed_token', to='lecturers.lecturer')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lecturers', '0017_schedulefeedtoken'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='schedulefeedtoken',
+            old_name='created_at',
+            new_name='rotated_at',
+        ),
+    ]
@@ -51,6 +51,22 @@ class Lecturer(models.Model):
         CustomUser, null=True, blank=True, on_delete=models.SET_NULL)
     status = models.CharField(db_default="Chưa được duyệt", max_length=100)
     date = models.DateField(auto_now_add=True)
+    # Signed a contract or in the 'lecturer' group, kept by lecturers/signals.py
+    is_active_lecturer = models.BooleanField(default=False, db_index=True)
+    # Accent-folded copies for search, kept by backend.search.watch_folded_fields
+    name_folded = models.CharField(max_length=30, blank=True, default='', db_index=True, editable=False)
+    status_folded = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+    degree_folded = models.CharField(max_length=20, blank=True, default='', db_index=True, editable=False)
+    email_folded = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+    address_folded = models.CharField(max_length=100, blank=True, default='', db_index=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'name'], name='lecturer_status_name_idx'),
+            models.Index(fields=['degree'], name='lecturer_degree_idx'),
+            models.Index(fields=['title'], name='lecturer_title_idx'),
+            models.Index(fields=['name'], name='lecturer_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.workplace}"
@@ -75,6 +91,29 @@ class Class(models.Model):
         return f'{self.name} ({self.course.code} - {self.lecturer.name})'
 
 
+class ScheduleSeries(models.Model):
+    """
+    Weekly teaching pattern expanded into Schedule rows by lecturers.recurrence.
+    Times are wall-clock times in timezone, so a lesson stays at 07:00 local.
+    """
+    lecturer = models.ForeignKey(Lecturer, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    place = models.CharField(max_length=200)
+    notes = models.CharField(max_length=500, blank=True, null=True)
+    # 0 is Monday, as in date.weekday()
+    weekdays = models.JSONField()
+    start_date = models.DateField()
+    end_date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    timezone = models.CharField(max_length=64)
+    # ISO dates without a lesson, e.g. holidays
+    excluded_dates = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f'{self.course} - {self.place} ({self.start_date} - {self.end_date})'
+
+
 class Schedule(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
@@ -82,11 +121,36 @@ class Schedule(models.Model):
     lecturer = models.ForeignKey(Lecturer, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     place = models.CharField(max_length=200)
+    series = models.ForeignKey(
+        ScheduleSeries, on_delete=models.CASCADE, null=True, blank=True, related_name='schedules')
+    # Validator of calendar windows, see backend.conditional.conditional_queryset
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time'], name='schedule_start_idx'),
+            # Covers the overlap test of lecturers.conflicts
+            models.Index(fields=['lecturer', 'start_time', 'end_time'], name='schedule_lecturer_span_idx'),
+            models.Index(fields=['place', 'start_time'], name='schedule_place_start_idx'),
+        ]
 
     def __str__(self):
         return f'{self.course.name} - {self.place}'
 
 
+class ScheduleFeedToken(models.Model):
+    """
+    Secret of a lecturer's calendar feed URL, for calendar apps that cannot
+    send a JWT. Rotating it cuts off every existing subscription.
+    """
+    lecturer = models.OneToOneField(Lecturer, on_delete=models.CASCADE, related_name='feed_token')
+    token = models.CharField(max_length=64, unique=True)
+    rotated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Feed of {self.lecturer_id}'
+
+
 class LecturerRecommendation(models.Model):
     name = models.CharField(max_length=30)
     email = models.EmailField(max_length=100, blank=True, null=True)
@@ -99,6 +163,12 @@ class LecturerRecommendation(models.Model):
     content = models.TextField(max_length=1000)
     date = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'date'], name='recommendation_status_date_idx'),
+            models.Index(fields=['date'], name='recommendation_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.workplace}"
 
@@ -110,5 +180,68 @@ class Evaluation(models.Model):
     lecturer = models.ForeignKey(Lecturer, on_delete=models.CASCADE)
     type = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['lecturer', 'date'], name='evaluation_lecturer_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.lecturer.name} - {self.date}"
+
+
+class LecturerStat(models.Model):
+    """
+    Number of lecturers per (status, degree, title, group membership) bucket,
+    kept up to date by the signals in lecturers/signals.py.
+    """
+    status = models.CharField(max_length=100)
+    degree = models.CharField(max_length=20)
+    title = models.CharField(max_length=20, blank=True)
+    in_lecturer_group = models.BooleanField(default=False)
+    in_potential_group = models.BooleanField(default=False)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['status', 'degree', 'title', 'in_lecturer_group', 'in_potential_group'],
+                name='unique_lecturer_stat_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.status} - {self.degree} - {self.title}: {self.count}"
+
+
+class ModelVersion(models.Model):
+    """
+    Change counter per model, bumped by backend.conditional on every write.
+    Used to build ETag / Last-Modified headers shared by all workers.
+    """
+    label = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
+
+
+class SearchEntry(models.Model):
+    """
+    Flattened text of a searchable object, kept by backend.fulltext. The
+    folded columns carry a FULLTEXT index on MySQL and an FTS5 table on SQLite.
+    """
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    title_folded = models.CharField(max_length=255)
+    body_folded = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
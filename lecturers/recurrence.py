@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.db import transaction
+from django.utils import timezone
+from backend.conditional import bump_model_version
+from .conflicts import check_conflicts
+from .models import Schedule
+
+# Longest series accepted, a bit more than a school year of daily lessons
+MAX_OCCURRENCES = 400
+
+
+def occurrence_dates(series):
+    excluded = set(series.excluded_dates or [])
+    day = series.start_date
+    while day <= series.end_date:
+        if day.weekday() in series.weekdays and day.isoformat() not in excluded:
+            yield day
+        day += timedelta(days=1)
+
+
+def expand(series):
+    """
+    Unsaved Schedule rows of every occurrence of series. Wall-clock times
+    are made aware in the series' time zone, then stored in UTC.
+    """
+    zone = ZoneInfo(series.timezone)
+    return [
+        Schedule(
+            start_time=datetime.combine(day, series.start_time, tzinfo=zone),
+            end_time=datetime.combine(day, series.end_time, tzinfo=zone),
+            lecturer_id=series.lecturer_id,
+            course_id=series.course_id,
+            place=series.place,
+            notes=series.notes,
+            series=series,
+        )
+        for day in occurrence_dates(series)
+    ]
+
+
+def schedules_changed():
+    # bulk_create() and queryset updates send no signals
+    bump_model_version(Schedule)
+
+
+@transaction.atomic
+def create_series(series):
+    """
+    Save series and its occurrences in one bulk_create. Raise
+    ScheduleConflict, saving nothing, when an occurrence overlaps another
+    lesson of the lecturer or in the place.
+    """
+    schedules = expand(series)
+    check_conflicts(schedules)
+    series.save()
+    Schedule.objects.bulk_create(schedules)
+    schedules_changed()
+    return schedules
+
+
+def occurrences(series, start=None, end=None):
+    """
+    Saved occurrences of series whose local date is between start and end,
+    both included and optional.
+    """
+    zone = ZoneInfo(series.timezone)
+    queryset = series.schedules.all()
+    if start:
+        queryset = queryset.filter(start_time__gte=datetime.combine(start, datetime.min.time(), tzinfo=zone))
+    if end:
+        queryset = queryset.filter(
+            start_time__lt=datetime.combine(end + timedelta(days=1), datetime.min.time(), tzinfo=zone))
+    return queryset
+
+
+def shift_local(value, shift, zone):
+    """
+    value moved by shift in wall-clock time of zone, so a lesson keeps its
+    local slot across a DST change: 09:00 + 7 days stays 09:00.
+    """
+    local = value.astimezone(zone).replace(tzinfo=None) + shift
+    return local.replace(tzinfo=zone)
+
+
+@transaction.atomic
+def move_series(series, start=None, end=None, shift=timedelta(0), place=None):
+    """
+    Shift the occurrences of series between start and end by shift, in the
+    series' wall-clock time, and/or move them to place, in one bulk_update.
+    Raise ScheduleConflict, changing nothing, when a moved occurrence would
+    overlap another lesson.
+    """
+    zone = ZoneInfo(series.timezone)
+    queryset = occurrences(series, start, end)
+    moved = list(queryset.only('id', 'start_time', 'end_time', 'lecturer_id', 'place'))
+    for schedule in moved:
+        schedule.start_time = shift_local(schedule.start_time, shift, zone)
+        schedule.end_time = shift_local(schedule.end_time, shift, zone)
+        if place:
+            schedule.place = place
+    check_conflicts(moved, ignore=[schedule.pk for schedule in moved])
+    # bulk_update() skips auto_now
+    now = timezone.now()
+    for schedule in moved:
+        schedule.updated_at = now
+    Schedule.objects.bulk_update(moved, ['start_time', 'end_time', 'place', 'updated_at'])
+    schedules_changed()
+    return len(moved)
+
+
+@transaction.atomic
+def cancel_series(series, start=None, end=None):
+    """
+    Delete the occurrences of series between start and end. Without bounds
+    the series itself goes too. Return the number of occurrences deleted.
+    """
+    if start is None and end is None:
+        deleted = series.schedules.count()
+        series.delete()
+    else:
+        deleted, _ = occurrences(series, start, end).delete()
+    return deleted
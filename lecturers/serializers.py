@@ -1,14 +1,21 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import serializers
+from backend.sparse import SparseFieldsMixin
+from .conflicts import MAX_SCHEDULE_LENGTH, check_conflicts
 from .models import *
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = "__all__"
 
 
-class LecturerSerializer(serializers.ModelSerializer):
+class LecturerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # courses = CourseSerializer(many=True)
     course_names = serializers.SerializerMethodField()
 
@@ -17,10 +24,24 @@ class LecturerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Lecturer
-        fields = "__all__"
+        exclude = ['name_folded', 'status_folded', 'degree_folded', 'email_folded', 'address_folded']
+        read_only_fields = ['is_active_lecturer']
+        field_sources = {'course_names': ['courses']}
+
+
+class LecturerImportSerializer(LecturerSerializer):
+    """
+    Validates one row of a bulk import. Courses, the recommender and the
+    user are resolved by lecturers.imports, so no field queries the database.
+    """
+
+    class Meta(LecturerSerializer.Meta):
+        exclude = LecturerSerializer.Meta.exclude + ['courses', 'recommender', 'user']
+        # Left out, the column's db_default applies
+        extra_kwargs = {'status': {'required': False}}
 
 
-class ClassSerializer(serializers.ModelSerializer):
+class ClassSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     course_name = serializers.SerializerMethodField()
     lecturer_name = serializers.SerializerMethodField()
 
@@ -33,9 +54,10 @@ class ClassSerializer(serializers.ModelSerializer):
     class Meta:
         model = Class
         fields = "__all__"
+        field_sources = {'course_name': ['course__name'], 'lecturer_name': ['lecturer__name']}
 
 
-class ScheduleSerializer(serializers.ModelSerializer):
+class ScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     title = serializers.SerializerMethodField()
     start = serializers.DateTimeField(source='start_time')
     end = serializers.DateTimeField(source='end_time')
@@ -47,13 +69,160 @@ class ScheduleSerializer(serializers.ModelSerializer):
     def get_title(self, obj):
         return str(obj)
 
+    def validate(self, data):
+        def value(name):
+            return data.get(name, getattr(self.instance, name, None))
+
+        start, end = value('start_time'), value('end_time')
+        if end <= start:
+            raise serializers.ValidationError({'end': "Must be after start."})
+        if end - start > MAX_SCHEDULE_LENGTH:
+            raise serializers.ValidationError({'end': "A schedule lasts at most 24 hours."})
+        schedule = Schedule(start_time=start, end_time=end, lecturer=value('lecturer'), place=value('place'))
+        # Raises ScheduleConflict, answered with 409
+        check_conflicts([schedule], ignore=[self.instance.pk] if self.instance else [])
+        return data
+
     class Meta:
         model = Schedule
         fields = ("id", "start", "end", "title", 'classNames',
-                  'lecturer', 'course', 'place', 'notes')
+                  'lecturer', 'course', 'place', 'notes', 'series')
+        read_only_fields = ['series']
+        field_sources = {'title': ['course__name', 'place'], 'classNames': ['course__name']}
+
+
+class ScheduleSeriesSerializer(serializers.ModelSerializer):
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), allow_empty=False)
+    excluded_dates = serializers.ListField(child=serializers.DateField(), required=False)
+    timezone = serializers.CharField(max_length=64, required=False)
+    count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ScheduleSeries
+        fields = "__all__"
+
+    def get_count(self, obj):
+        # Annotated as schedule_count by list views
+        if hasattr(obj, 'schedule_count'):
+            return obj.schedule_count
+        return obj.schedules.count()
+
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError("Unknown time zone.")
+        return value
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({'end_date': "Must not be before start_date."})
+        if data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError({'end_time': "Must be after start_time."})
+        data['weekdays'] = sorted(set(data['weekdays']))
+        # Stored as JSON, which has no date type
+        data['excluded_dates'] = sorted({day.isoformat() for day in data.get('excluded_dates', [])})
+        data.setdefault('timezone', settings.SCHEDULE_TIME_ZONE)
+        return data
+
+
+def schedule_zone(name=None):
+    """
+    ZoneInfo of a ?timezone= parameter, SCHEDULE_TIME_ZONE when empty.
+    """
+    try:
+        return ZoneInfo(name or settings.SCHEDULE_TIME_ZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise serializers.ValidationError({'timezone': "Unknown time zone."})
+
+
+class ScheduleWindowSerializer(serializers.Serializer):
+    """
+    start/end query parameters of schedule views: ISO datetimes, or dates
+    read as midnight in ?timezone= (SCHEDULE_TIME_ZONE by default).
+    """
+    start = serializers.CharField()
+    end = serializers.CharField()
+    timezone = serializers.CharField(required=False)
+    max_days = 366
+
+    def parse(self, name, value, zone):
+        try:
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value)
+                moment = datetime.combine(day, time.min) if day else None
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise serializers.ValidationError({name: "Expected an ISO date or datetime."})
+        return moment if timezone.is_aware(moment) else moment.replace(tzinfo=zone)
+
+    def validate(self, data):
+        zone = schedule_zone(data.get('timezone'))
+        data['start'] = self.parse('start', data['start'], zone)
+        data['end'] = self.parse('end', data['end'], zone)
+        if data['end'] <= data['start']:
+            raise serializers.ValidationError({'end': "Must be after start."})
+        if data['end'] - data['start'] > timedelta(days=self.max_days):
+            raise serializers.ValidationError({'end': f"The window spans at most {self.max_days} days."})
+        data['timezone'] = zone
+        return data
+
+
+class AvailabilitySerializer(ScheduleWindowSerializer):
+    course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all())
+    # Slot length in minutes
+    slot = serializers.IntegerField(min_value=5, max_value=24 * 60, default=60)
+    # Teaching day, from the first to the last period of ScheduleViewSet.PERIOD_MAPPING
+    day_start = serializers.TimeField(default=time(7, 0))
+    day_end = serializers.TimeField(default=time(21, 10))
+    max_days = 31
+
+    def validate(self, data):
+        data = super().validate(data)
+        if data['day_end'] <= data['day_start']:
+            raise serializers.ValidationError({'day_end': "Must be after day_start."})
+        data['slot'] = timedelta(minutes=data['slot'])
+        return data
+
+
+class UpcomingSerializer(serializers.Serializer):
+    """
+    ?days= local days from today in ?timezone=, as an aware start/end range.
+    """
+    days = serializers.IntegerField(min_value=1, max_value=31, default=1)
+    timezone = serializers.CharField(required=False)
+
+    def validate(self, data):
+        zone = schedule_zone(data.get('timezone'))
+        today = timezone.now().astimezone(zone).date()
+        # Combined per day, a DST change makes some days 23 or 25 hours long
+        data['start'] = datetime.combine(today, time.min, tzinfo=zone)
+        data['end'] = datetime.combine(today + timedelta(days=data['days']), time.min, tzinfo=zone)
+        data['timezone'] = zone
+        return data
+
+
+class UpcomingScheduleSerializer(ScheduleSerializer):
+    lecturer_name = serializers.CharField(source='lecturer.name', read_only=True)
+
+    class Meta(ScheduleSerializer.Meta):
+        fields = ScheduleSerializer.Meta.fields + ('lecturer_name',)
+        field_sources = dict(ScheduleSerializer.Meta.field_sources, lecturer_name=['lecturer__name'])
+
+
+class ScheduleMoveSerializer(serializers.Serializer):
+    # Occurrences on local dates between start and end, both optional
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    days = serializers.IntegerField(default=0)
+    minutes = serializers.IntegerField(default=0)
+    place = serializers.CharField(max_length=200, required=False)
 
 
-class EvaluationSerializer(serializers.ModelSerializer):
+class EvaluationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Evaluation
         fields = ['id', 'title', 'content', 'date', 'lecturer', 'type']
@@ -66,13 +235,14 @@ class RecommenderSerializer(serializers.ModelSerializer):
         model = Lecturer
         # Include only the fields you want to expose
         fields = ['name', 'workplace', 'email', 'full_name']
+        field_sources = {'full_name': ['name', 'workplace']}
 
     def get_full_name(self, obj):
         # Assuming the full name is a combination of first and last name
         return f"{obj.name} - {obj.workplace}"
 
 
-class LecturerRecommendationSerializer(serializers.ModelSerializer):
+class LecturerRecommendationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     course_names = serializers.SerializerMethodField()
     recommender_details = RecommenderSerializer(
         source='recommender', read_only=True, required=False)
@@ -84,9 +254,10 @@ class LecturerRecommendationSerializer(serializers.ModelSerializer):
         model = LecturerRecommendation
         fields = "__all__"
         read_only_fields = ['id', 'date']
+        field_sources = {'course_names': ['courses']}
 
 
-class LecturerStatusSerializer(serializers.ModelSerializer):
+class LecturerStatusSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Lecturer
         fields = ['status']
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .models import Lecturer
+from .stats import STAT_GROUPS, bucket_of, is_active, move_bucket, rebuild_stats, stat_group_names
+
+User = get_user_model()
+
+
+def sync_active_flags(lecturers):
+    # Write is_active_lecturer where it no longer matches the bucket, one
+    # UPDATE per flag value
+    changed = {True: [], False: []}
+    for lecturer, bucket in lecturers:
+        active = is_active(bucket)
+        if lecturer.is_active_lecturer != active:
+            changed[active].append(lecturer.pk)
+            lecturer.is_active_lecturer = active
+    for active, pks in changed.items():
+        if pks:
+            Lecturer.objects.filter(pk__in=pks).update(is_active_lecturer=active)
+
+
+# Keep LecturerStat and is_active_lecturer in sync with lecturer rows. Both
+# buckets are computed in pre_save, from the stored row and the groups of
+# the old and new user, and post_save only moves the count.
+@receiver(pre_save, sender=Lecturer)
+def remember_stat_bucket(sender, instance, raw=False, **kwargs):
+    instance._stat_buckets = None
+    if raw:
+        return
+    old = None
+    if instance.pk is not None:
+        old = Lecturer.objects.filter(pk=instance.pk).only(
+            'status', 'degree', 'title', 'user', 'is_active_lecturer').first()
+    group_names = stat_group_names([instance.user_id, old.user_id if old else None])
+    bucket = bucket_of(instance, group_names.get(instance.user_id, set()))
+    instance.is_active_lecturer = is_active(bucket)
+    old_bucket = None
+    flag_changed = True
+    if old is not None:
+        old_bucket = bucket_of(old, group_names.get(old.user_id, set()))
+        flag_changed = old.is_active_lecturer != instance.is_active_lecturer
+    instance._stat_buckets = (old_bucket, bucket, flag_changed)
+
+
+@receiver(post_save, sender=Lecturer)
+def update_stat_bucket(sender, instance, raw=False, update_fields=None, **kwargs):
+    buckets = getattr(instance, '_stat_buckets', None)
+    if raw or buckets is None:
+        return
+    instance._stat_buckets = None
+    old_bucket, bucket, flag_changed = buckets
+    move_bucket(old_bucket, bucket)
+    if flag_changed and update_fields is not None and 'is_active_lecturer' not in update_fields:
+        # The flag set in pre_save was not part of this save
+        Lecturer.objects.filter(pk=instance.pk).update(
+            is_active_lecturer=instance.is_active_lecturer)
+
+
+@receiver(post_delete, sender=Lecturer)
+def remove_stat_bucket(sender, instance, **kwargs):
+    move_bucket(bucket_of(instance), None)
+
+
+# Group membership decides whether a lecturer counts as lecturer/potential
+@receiver(m2m_changed, sender=User.groups.through)
+def track_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('pre_'):
+        if reverse:
+            # instance is a Group, pk_set holds user ids (None when clearing)
+            user_ids = pk_set if pk_set is not None else list(
+                instance.user_set.values_list('id', flat=True))
+        else:
+            user_ids = [instance.pk]
+        lecturers = list(Lecturer.objects.filter(user_id__in=user_ids))
+        group_names = stat_group_names([lecturer.user_id for lecturer in lecturers])
+        instance._old_stat_buckets = [
+            (lecturer, bucket_of(lecturer, group_names[lecturer.user_id]))
+            for lecturer in lecturers
+        ]
+    elif action.startswith('post_'):
+        old_buckets = getattr(instance, '_old_stat_buckets', [])
+        instance._old_stat_buckets = []
+        group_names = stat_group_names([lecturer.user_id for lecturer, _ in old_buckets])
+        new_buckets = []
+        for lecturer, old_bucket in old_buckets:
+            bucket = bucket_of(lecturer, group_names[lecturer.user_id])
+            move_bucket(old_bucket, bucket)
+            new_buckets.append((lecturer, bucket))
+        sync_active_flags(new_buckets)
+
+
+@receiver(pre_delete, sender=User)
+def release_lecturer_stat_bucket(sender, instance, **kwargs):
+    # Deleting a user drops its groups and unlinks its lecturer without signals
+    group_names = stat_group_names([instance.pk]).get(instance.pk, set())
+    new_buckets = []
+    for lecturer in Lecturer.objects.filter(user_id=instance.pk):
+        bucket = bucket_of(lecturer, group_names=set())
+        move_bucket(bucket_of(lecturer, group_names), bucket)
+        new_buckets.append((lecturer, bucket))
+    sync_active_flags(new_buckets)
+
+
+@receiver(pre_delete, sender=Group)
+def release_group_members(sender, instance, **kwargs):
+    # Deleting a group drops its memberships without m2m_changed, so clear
+    # them first through track_group_membership
+    if instance.name in STAT_GROUPS:
+        instance.user_set.clear()
+
+
+@receiver(pre_save, sender=Group)
+def rebuild_stats_on_rename(sender, instance, raw=False, **kwargs):
+    # Renaming a statistics group moves all its members at once
+    if raw or instance.pk is None:
+        return
+    old_name = Group.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+    if old_name != instance.name and {old_name, instance.name} & set(STAT_GROUPS):
+        transaction.on_commit(rebuild_stats)
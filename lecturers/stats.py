@@ -0,0 +1,231 @@
+from collections import Counter
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from .models import Course, Lecturer, LecturerRecommendation, LecturerStat
+
+User = get_user_model()
+
+SIGNED_STATUS = "Đã ký hợp đồng"
+UNREVIEWED_STATUS = "Chưa duyệt hồ sơ"
+VALID_PROFILE_STATUS = "Hồ sơ hợp lệ"
+UNCHECKED_RECOMMENDATION_STATUS = "Chưa được duyệt"
+
+DASHBOARD_CACHE_KEY = 'lecturers:dashboard'
+
+BUCKET_FIELDS = ('status', 'degree', 'title', 'in_lecturer_group', 'in_potential_group')
+# Groups that decide a lecturer's bucket
+STAT_GROUPS = ('lecturer', 'potential_lecturer')
+
+
+def in_group(name):
+    """
+    Exists() subquery telling whether the lecturer's user belongs to a group.
+    Unlike a join on user__groups it never duplicates lecturer rows.
+    """
+    return Exists(User.groups.through.objects.filter(
+        customuser_id=OuterRef('user_id'), group__name=name))
+
+
+def percentages(counter, total, key, blank=None):
+    # Response format: [{key: "PhD", "percentage": 40.0}, ...]
+    return [
+        {
+            key: blank if blank is not None and value == "" else value,
+            "percentage": round(count / total * 100, 2) if total > 0 else 0,
+        }
+        for value, count in counter.most_common()
+    ]
+
+
+def computed_buckets():
+    """
+    Count lecturers per statistics bucket straight from the Lecturer table.
+    """
+    rows = (
+        Lecturer.objects
+        .annotate(
+            in_lecturer_group=in_group('lecturer'),
+            in_potential_group=in_group('potential_lecturer'),
+        )
+        .values(*BUCKET_FIELDS)
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return {tuple(row[field] for field in BUCKET_FIELDS): row['count'] for row in rows}
+
+
+def stored_buckets():
+    rows = LecturerStat.objects.filter(count__gt=0).values_list(*BUCKET_FIELDS, 'count')
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def stat_group_names(user_ids):
+    """
+    Return {user_id: set of STAT_GROUPS names} for the given users in one query.
+    """
+    names = {user_id: set() for user_id in user_ids if user_id is not None}
+    if names:
+        rows = User.groups.through.objects.filter(
+            customuser_id__in=names, group__name__in=STAT_GROUPS,
+        ).values_list('customuser_id', 'group__name')
+        for user_id, name in rows:
+            names[user_id].add(name)
+    return names
+
+
+def bucket_of(lecturer, group_names=None):
+    """
+    Statistics bucket of a lecturer. group_names overrides the groups of the
+    linked user, e.g. while that user is being deleted.
+    """
+    if group_names is None:
+        group_names = stat_group_names([lecturer.user_id]).get(lecturer.user_id, set())
+    status = lecturer.status
+    if not isinstance(status, str):
+        # Still the db_default placeholder of an insert
+        default = Lecturer._meta.get_field('status').db_default
+        status = getattr(default, 'value', default)
+    return (
+        status,
+        lecturer.degree,
+        lecturer.title,
+        'lecturer' in group_names,
+        'potential_lecturer' in group_names,
+    )
+
+
+def invalidate_dashboard():
+    # After commit, so that a concurrent dashboard_stats() cannot cache the
+    # counts this transaction is still changing
+    transaction.on_commit(lambda: cache.delete(DASHBOARD_CACHE_KEY))
+
+
+def adjust_bucket(bucket, delta):
+    """
+    Add delta to the count of bucket in one UPDATE, creating its row the
+    first time the bucket is used.
+    """
+    fields = dict(zip(BUCKET_FIELDS, bucket))
+    if not LecturerStat.objects.filter(**fields).update(count=F('count') + delta):
+        try:
+            with transaction.atomic():
+                LecturerStat.objects.create(count=delta, **fields)
+        except IntegrityError:
+            # Created concurrently by another writer
+            LecturerStat.objects.filter(**fields).update(count=F('count') + delta)
+    invalidate_dashboard()
+
+
+def move_bucket(old, new):
+    if old == new:
+        return
+    if old is not None:
+        adjust_bucket(old, -1)
+    if new is not None:
+        adjust_bucket(new, 1)
+
+
+def rebuild_stats():
+    """
+    Replace the statistics table with counts computed from scratch and fix
+    any drifted is_active_lecturer flag.
+    """
+    buckets = computed_buckets()
+    active = Q(in_group('lecturer')) | Q(status=SIGNED_STATUS)
+    with transaction.atomic():
+        # Repair the denormalized Lecturer.is_active_lecturer flag as well
+        Lecturer.objects.filter(active, is_active_lecturer=False).update(is_active_lecturer=True)
+        Lecturer.objects.exclude(active).filter(is_active_lecturer=True).update(is_active_lecturer=False)
+        LecturerStat.objects.all().delete()
+        LecturerStat.objects.bulk_create([
+            LecturerStat(count=count, **dict(zip(BUCKET_FIELDS, bucket)))
+            for bucket, count in buckets.items()
+        ])
+    invalidate_dashboard()
+    return buckets
+
+
+def stats_drift():
+    """
+    Return {bucket: (stored, actual)} for every bucket whose stored count is wrong.
+    """
+    stored = stored_buckets()
+    actual = computed_buckets()
+    return {
+        bucket: (stored.get(bucket, 0), actual.get(bucket, 0))
+        for bucket in stored.keys() | actual.keys()
+        if stored.get(bucket, 0) != actual.get(bucket, 0)
+    }
+
+
+def is_active(bucket):
+    status, _, _, in_lecturer_group, _ = bucket
+    return in_lecturer_group or status == SIGNED_STATUS
+
+
+def is_potential(bucket):
+    status, _, _, _, in_potential_group = bucket
+    return in_potential_group or status == UNREVIEWED_STATUS
+
+
+def is_pending(bucket):
+    status, _, _, _, in_potential_group = bucket
+    return in_potential_group or status == VALID_PROFILE_STATUS
+
+
+def count_buckets(predicate, buckets=None):
+    buckets = stored_buckets() if buckets is None else buckets
+    return sum(count for bucket, count in buckets.items() if predicate(bucket))
+
+
+def active_breakdown(field, buckets=None):
+    """
+    Counter of active lecturers by 'degree' or 'title', and their total.
+    """
+    buckets = stored_buckets() if buckets is None else buckets
+    index = BUCKET_FIELDS.index(field)
+    counter = Counter()
+    for bucket, count in buckets.items():
+        if is_active(bucket):
+            counter[bucket[index]] += count
+    return counter, sum(counter.values())
+
+
+def compute_dashboard():
+    """
+    Compute every dashboard figure from the statistics table, one pass over
+    courses and one over recommendations.
+    """
+    buckets = stored_buckets()
+    degrees, all_lecturers = active_breakdown('degree', buckets)
+    titles, _ = active_breakdown('title', buckets)
+
+    courses = Course.objects.annotate(
+        lecturer_count=Count('lecturer', filter=Q(lecturer__is_active_lecturer=True))
+    ).values('name', 'lecturer_count')
+
+    unchecked = LecturerRecommendation.objects.filter(
+        status=UNCHECKED_RECOMMENDATION_STATUS).count()
+
+    return {
+        "all_lecturers": all_lecturers,
+        "potential_lecturers": count_buckets(is_potential, buckets),
+        "pending_lecturers": count_buckets(is_pending, buckets),
+        "unchecked_recommendations": unchecked,
+        "degrees": percentages(degrees, all_lecturers, "degree"),
+        "titles": percentages(titles, all_lecturers, "title", blank="None"),
+        "course_lecturers": list(courses),
+    }
+
+
+def dashboard_stats(timeout=60):
+    """
+    Return the dashboard payload, cached as a single entry for timeout seconds.
+    """
+    data = cache.get(DASHBOARD_CACHE_KEY)
+    if data is None:
+        data = compute_dashboard()
+        cache.set(DASHBOARD_CACHE_KEY, data, timeout)
+    return data
@@ -1,3 +1,1293 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+from unittest.mock import patch
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from backend import authentication
+from backend.authentication import ClaimsUser, clear_cached_user, get_cached_user
+from backend.autocomplete import autocomplete
+from backend.caching import get_backend
+from backend.fulltext import INNODB_STOPWORDS, MySQLEngine
+from backend import middleware
+from backend.middleware import record_queries, summary
+from backend.roles import is_self_lecturer, reset_role_cache_stats, role_cache_stats
+from backend.search import FoldedSearchFilter, fold
+from backend.testing import QueryBudgetMixin
+from documents.models import Document
+from users.models import CustomUser
+from .conflicts import IntervalTree
+from .ics import fold_line, render_event
+from .models import Course, Lecturer, LecturerRecommendation, Schedule, SearchEntry
+from .stats import DASHBOARD_CACHE_KEY, count_buckets, is_active, rebuild_stats, stats_drift
 
-# Create your tests here.
+
+def create_lecturer(name, **kwargs):
+    data = {
+        'name': name,
+        'email': f'{name.lower().replace(" ", "")}@example.com',
+        'phone_number': '0123456789',
+        'gender': 'Nam',
+        'dob': date(1980, 1, 1),
+        'hometown': 'Hà Nội',
+        'degree': 'Tiến sĩ',
+        'title_detail': '',
+        'title_granted_at': date(2010, 1, 1),
+        'address': 'Hà Nội',
+        'work_position': 'Giảng viên',
+        'workplace': 'HUST',
+        'status': 'Đã ký hợp đồng',
+    }
+    data.update(kwargs)
+    return Lecturer.objects.create(**data)
+
+
+def create_user(username, *group_names):
+    user = CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password='password')
+    for name in group_names:
+        group, _ = Group.objects.get_or_create(name=name)
+        user.groups.add(group)
+    return user
+
+
+class LecturerListQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        courses = [
+            Course.objects.create(name=f'Course {i}', code=f'C{i}', credits=3)
+            for i in range(3)
+        ]
+        for i in range(20):
+            lecturer = create_lecturer(f'Lecturer {i}')
+            lecturer.courses.set(courses)
+        for i in range(20):
+            lecturer = create_lecturer(f'Candidate {i}', status='Chưa được duyệt')
+            lecturer.courses.set(courses)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, url):
+        small = self.count_queries(f'{url}?page_size=2')
+        large = self.count_queries(f'{url}?page_size=20')
+        self.assertEqual(small, large)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries('/lecturers/')
+
+    def test_potential_lecturers_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries('/lecturers/potential_lecturers/')
+
+    def test_list_returns_course_names(self):
+        response = self.client.get('/lecturers/?page_size=1')
+        self.assertEqual(
+            response.data['results'][0]['course_names'],
+            ['Course 0', 'Course 1', 'Course 2'])
+
+    def test_all_lecturers_queries_do_not_grow_with_rows(self):
+        before = self.count_queries('/lecturers/all_lecturers/')
+        # Model versions are bumped once the writes commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(10):
+                create_lecturer(f'Extra {i}').courses.set(Course.objects.all())
+        self.assertEqual(self.count_queries('/lecturers/all_lecturers/'), before)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('supervision', 'supervision_department')
+        for i in range(5):
+            create_lecturer(f'Lecturer {i}', degree='Tiến sĩ' if i % 2 else 'Thạc sĩ')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_degree_count_budget(self):
+        response = self.assertQueryBudget(3, 'get', '/lecturers/degree_count/')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGET={'SAMPLE_RATE': 1.0, 'RESPONSE_HEADERS': True})
+    def test_query_count_header(self):
+        response = self.client.get('/lecturers/degree_count/')
+        self.assertIn('X-Query-Count', response)
+        self.assertIn('LecturerViewSet.degree_count', summary())
+
+    def test_samples_logged_and_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'samples.jsonl')
+            with override_settings(QUERY_BUDGET={'SAMPLE_RATE': 1.0, 'LOG_FILE': path}), \
+                    self.assertLogs('backend.query_budget', 'INFO') as logs:
+                self.client.get('/lecturers/degree_count/')
+                out = StringIO()
+                call_command('query_report', stdout=out)
+            for handler in middleware._file_handlers.values():
+                handler.close()
+                middleware.logger.removeHandler(handler)
+            middleware._file_handlers.clear()
+        self.assertEqual(json.loads(logs.records[0].getMessage())['action'], 'LecturerViewSet.degree_count')
+        report = json.loads(out.getvalue())['LecturerViewSet.degree_count']
+        self.assertEqual(report['requests'], 1)
+        self.assertIn('avg_view_ms', report)
+        self.assertIn('avg_serialize_ms', report)
+
+    @override_settings(QUERY_BUDGET={'SAMPLE_RATE': 1.0})
+    def test_serialization_timed_apart_from_the_view(self):
+        to_representation = serializers.Serializer.to_representation
+
+        def slow(serializer, instance):
+            time.sleep(0.01)
+            return to_representation(serializer, instance)
+
+        with patch.object(serializers.Serializer, 'to_representation', slow), \
+                self.assertLogs('backend.query_budget', 'INFO') as logs:
+            self.client.get('/lecturers/?page_size=5')
+        sample = json.loads(logs.records[0].getMessage())
+        self.assertEqual(sample['action'], 'LecturerViewSet.list')
+        self.assertGreaterEqual(sample['serialize_ms'], 50)
+        self.assertLess(sample['view_ms'], sample['serialize_ms'])
+
+
+class RoleCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        create_lecturer('Lecturer')
+
+    def setUp(self):
+        reset_role_cache_stats()
+
+    def get(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/lecturers/')
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries if 'auth_group' in q['sql']]
+
+    def token_client(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def test_groups_loaded_once_per_request(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # lecturer, potential_lecturer, it_faculty and education_department are checked
+        self.assertEqual(len(self.get(client)), 1)
+        stats = role_cache_stats()
+        self.assertEqual(stats['lookups'], 4)
+        self.assertEqual((stats['db_loads'], stats['cache_hits']), (1, 3))
+
+        # The cache lives on the request only
+        self.assertEqual(len(self.get(client)), 1)
+        self.assertEqual(role_cache_stats()['db_loads'], 2)
+
+    @override_settings(ROLE_GROUPS_FROM_TOKEN=True)
+    def test_groups_read_from_the_token_claim(self):
+        response = APIClient().post('/api/token/', {'username': 'education', 'password': 'password'})
+        self.assertEqual(self.get(self.token_client(response.data['access'])), [])
+        stats = role_cache_stats()
+        self.assertEqual((stats['token_loads'], stats['db_loads'], stats['cache_hits']), (1, 0, 3))
+
+    @override_settings(ROLE_GROUPS_FROM_TOKEN=True)
+    def test_token_without_groups_claim_falls_back_to_the_database(self):
+        # Tokens minted outside the login serializer carry no 'groups' claim
+        token = AccessToken.for_user(self.user)
+        self.assertNotIn('groups', token.payload)
+        self.assertEqual(len(self.get(self.token_client(str(token)))), 1)
+        stats = role_cache_stats()
+        self.assertEqual((stats['token_loads'], stats['db_loads'], stats['cache_hits']), (0, 1, 3))
+
+
+class DashboardTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department', 'it_faculty')
+        course = Course.objects.create(name='Course', code='C', credits=3)
+        signed = create_lecturer('Signed', title='PGS')
+        signed.courses.add(course)
+        grouped = create_lecturer(
+            'Grouped', status='Hồ sơ hợp lệ', degree='Thạc sĩ',
+            user=create_user('grouped', 'lecturer', 'it_faculty'))
+        grouped.courses.add(course)
+        create_lecturer('Candidate', status='Chưa duyệt hồ sơ',
+                        user=create_user('candidate', 'potential_lecturer'))
+        LecturerRecommendation.objects.create(
+            name='Recommended', recommender=signed, content='Good')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_dashboard_matches_individual_actions(self):
+        # One query resolves the caller's roles, three compute the figures
+        data = self.assertQueryBudget(4, 'get', '/lecturers/dashboard/').data
+        self.assertEqual(data['all_lecturers'], 2)
+        self.assertEqual(data['potential_lecturers'], 1)
+        self.assertEqual(data['pending_lecturers'], 2)
+        self.assertEqual(data['unchecked_recommendations'], 1)
+        self.assertCountEqual(
+            data['degrees'], self.client.get('/lecturers/degree_count/').data)
+        self.assertCountEqual(
+            data['titles'], self.client.get('/lecturers/title_count/').data)
+        self.assertEqual(
+            data['course_lecturers'], [{'name': 'Course', 'lecturer_count': 2}])
+
+    def test_dashboard_is_cached(self):
+        self.client.get('/lecturers/dashboard/')
+        self.assertQueryBudget(1, 'get', '/lecturers/dashboard/')
+
+    def test_cache_dropped_after_commit(self):
+        self.client.get('/lecturers/dashboard/')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            create_lecturer('New')
+            # Still cached while the write is uncommitted
+            self.assertIsNotNone(cache.get(DASHBOARD_CACHE_KEY))
+        self.assertTrue(callbacks)
+        self.assertIsNone(cache.get(DASHBOARD_CACHE_KEY))
+        self.assertEqual(self.client.get('/lecturers/dashboard/').data['all_lecturers'], 3)
+
+    def test_figures_follow_the_count_actions_permissions(self):
+        public = {'all_lecturers', 'degrees', 'titles', 'course_lecturers'}
+        for groups, extra in [
+            (('lecturer',), set()),
+            (('potential_lecturer',), set()),
+            (('supervision_department',), set()),
+            (('it_faculty',), {'potential_lecturers', 'unchecked_recommendations'}),
+            (('education_department',), {'potential_lecturers', 'pending_lecturers'}),
+        ]:
+            client = APIClient()
+            client.force_authenticate(create_user('_'.join(groups) + '_reader', *groups))
+            response = client.get('/lecturers/dashboard/')
+            self.assertEqual(response.status_code, 200, groups)
+            self.assertEqual(set(response.data), public | extra, groups)
+
+
+class LecturerStatTests(TestCase):
+    def assertInSync(self):
+        self.assertEqual(stats_drift(), {})
+
+    def test_signals_keep_stats_in_sync(self):
+        user = create_user('candidate', 'potential_lecturer')
+        lecturer = create_lecturer('Candidate', status='Chưa duyệt hồ sơ', user=user)
+        other = create_lecturer('Other', title='GS')
+        self.assertInSync()
+
+        lecturer.status = 'Đã ký hợp đồng'
+        lecturer.save()
+        user.groups.set([Group.objects.get_or_create(name='lecturer')[0]])
+        self.assertInSync()
+        self.assertEqual(count_buckets(is_active), 2)
+
+        Group.objects.get(name='lecturer').user_set.clear()
+        self.assertInSync()
+        user.groups.add(Group.objects.get(name='potential_lecturer'))
+        user.delete()
+        self.assertInSync()
+        other.delete()
+        self.assertInSync()
+
+    def test_group_delete_and_rename_keep_stats_in_sync(self):
+        lecturer = create_lecturer(
+            'Lecturer', status='Hồ sơ hợp lệ', user=create_user('member', 'lecturer'))
+        potential = create_lecturer(
+            'Potential', status='Hồ sơ hợp lệ', user=create_user('candidate', 'potential_lecturer'))
+        self.assertEqual(count_buckets(is_active), 1)
+
+        Group.objects.get(name='lecturer').delete()
+        self.assertInSync()
+        lecturer.refresh_from_db()
+        self.assertFalse(lecturer.is_active_lecturer)
+
+        group = Group.objects.get(name='potential_lecturer')
+        group.name = 'lecturer'
+        with self.captureOnCommitCallbacks(execute=True):
+            group.save()
+        self.assertInSync()
+        potential.refresh_from_db()
+        self.assertTrue(potential.is_active_lecturer)
+
+    def test_save_moves_buckets_with_few_queries(self):
+        user = create_user('candidate', 'potential_lecturer')
+        lecturer = create_lecturer('Candidate', user=user)
+        # Both buckets already have their LecturerStat row
+        lecturer.status = 'Chưa duyệt hồ sơ'
+        lecturer.save()
+        lecturer.status = 'Đã ký hợp đồng'
+        with CaptureQueriesContext(connection) as context:
+            lecturer.save()
+        stat_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'lecturerstat' in query['sql'] or 'groups' in query['sql']
+            or query['sql'].startswith('SELECT') and 'FROM "lecturers_lecturer"' in query['sql']
+        ]
+        # Stored row, groups of the user, one UPDATE per bucket
+        self.assertEqual(len(stat_queries), 4, stat_queries)
+        self.assertInSync()
+        self.assertTrue(Lecturer.objects.get(pk=lecturer.pk).is_active_lecturer)
+
+    def test_rebuild_fixes_drift(self):
+        create_lecturer('Lecturer')
+        Lecturer.objects.update(degree='Thạc sĩ')
+        self.assertNotEqual(stats_drift(), {})
+        rebuild_stats()
+        self.assertInSync()
+
+
+class ResponseCacheTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        cls.course = Course.objects.create(name='Course', code='C', credits=3)
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cached_until_model_changes(self):
+        self.client.get('/courses/all_courses/')
+        # Only the role and model version lookups hit the database
+        self.assertQueryBudget(2, 'get', '/courses/all_courses/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(name='Other', code='O', credits=2)
+        response = self.client.get('/courses/all_courses/')
+        self.assertEqual(len(response.data), 2)
+
+    def test_m2m_change_invalidates(self):
+        lecturer = create_lecturer('Lecturer')
+        self.assertEqual(
+            self.client.get('/lecturers/all_lecturers/').data[0]['course_names'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            lecturer.courses.add(self.course)
+        self.assertEqual(
+            self.client.get('/lecturers/all_lecturers/').data[0]['course_names'], ['Course'])
+
+    def test_varies_on_query_string(self):
+        self.client.get('/courses/all_courses/')
+        with record_queries() as record:
+            self.client.get('/courses/all_courses/?ordering=name')
+        self.assertGreater(record.count, 1)
+
+
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.course = Course.objects.create(name='Course', code='C', credits=3)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified_without_serializing(self):
+        response = self.client.get('/courses/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        # Role and version lookups only, the list itself is not queried
+        response = self.assertQueryBudget(
+            2, 'get', '/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_model(self):
+        etag = self.client.get(f'/courses/{self.course.pk}/')['ETag']
+        self.course.credits = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+        response = self.client.get(f'/courses/{self.course.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_m2m_change_bumps_owner(self):
+        lecturer = create_lecturer('Lecturer')
+        etag = self.client.get(f'/lecturers/{lecturer.pk}/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            lecturer.courses.add(self.course)
+        response = self.client.get(f'/lecturers/{lecturer.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_bumped_after_commit(self):
+        etag = self.client.get('/courses/')['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            Course.objects.create(name='Other', code='O', credits=2)
+            # The version row is not touched inside the writing transaction
+            self.assertEqual(
+                self.client.get('/courses/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(
+            self.client.get('/courses/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        for i in range(11):
+            create_lecturer(f'Lecturer {i:02}', degree=['Tiến sĩ', 'Thạc sĩ'][i % 2])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        names = []
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            names += [row['name'] for row in response.data['results']]
+            pages.append(response.data)
+            url = response.data['next']
+        return names, pages
+
+    def test_walks_every_row_once_with_ties(self):
+        names, pages = self.walk('/lecturers/?cursor=&page_size=3&ordering=-degree')
+        expected = list(Lecturer.objects.order_by('-degree', 'id').values_list('name', flat=True))
+        self.assertEqual(names, expected)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertIsNone(pages[0]['count'])
+
+        # Walking back from the last page returns the previous one
+        previous = self.client.get(pages[-1]['previous']).data
+        self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_estimated_count(self):
+        response = self.client.get('/lecturers/?cursor=&count=estimate')
+        self.assertEqual(response.data['count'], 11)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/lecturers/?cursor=abc').status_code, 404)
+
+
+class ActiveLecturerFlagTests(TestCase):
+    def assertActive(self, lecturer, expected):
+        lecturer.refresh_from_db()
+        self.assertEqual(lecturer.is_active_lecturer, expected)
+
+    def test_flag_follows_status_and_groups(self):
+        user = create_user('candidate', 'potential_lecturer')
+        lecturer = create_lecturer('Candidate', status='Hồ sơ hợp lệ', user=user)
+        self.assertActive(lecturer, False)
+
+        user.groups.set([Group.objects.get_or_create(name='lecturer')[0]])
+        self.assertActive(lecturer, True)
+        user.groups.clear()
+        self.assertActive(lecturer, False)
+
+        lecturer.status = 'Đã ký hợp đồng'
+        lecturer.save(update_fields=['status'])
+        self.assertActive(lecturer, True)
+
+    def test_sign_contract_activates(self):
+        client = APIClient()
+        client.force_authenticate(create_user('education', 'education_department'))
+        lecturer = create_lecturer('Candidate', status='Hồ sơ hợp lệ',
+                                   user=create_user('candidate', 'potential_lecturer'))
+        client.post(f'/lecturers/{lecturer.pk}/sign_contract/')
+        self.assertActive(lecturer, True)
+        self.assertEqual(stats_drift(), {})
+
+
+class FoldedSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('education', 'education_department'))
+
+    def search(self, value):
+        response = self.client.get('/lecturers/', {'search': value})
+        return [row['name'] for row in response.data['results']]
+
+    def test_search_ignores_diacritics_and_case(self):
+        create_lecturer('Nguyễn Văn An')
+        create_lecturer('Đặng Thị Hà')
+        self.assertEqual(fold('Nguyễn  Đức'), 'nguyen duc')
+        self.assertEqual(self.search('nguyen van'), ['Nguyễn Văn An'])
+        self.assertEqual(self.search('ĐẶNG'), ['Đặng Thị Hà'])
+        # Only the column start, which the index answers
+        self.assertEqual(self.search('van an'), [])
+        self.assertEqual(self.search('guyen'), [])
+        self.assertNotIn('name_folded', self.client.get('/lecturers/').data['results'][0])
+
+    def test_search_email_address_and_phone(self):
+        create_lecturer('Nguyễn Văn An', email='an@hust.edu.vn', address='Số 1, Đà Nẵng')
+        create_lecturer('Trần Bình', phone_number='0987654321')
+        self.assertEqual(self.search('an@hust'), ['Nguyễn Văn An'])
+        self.assertEqual(self.search('so 1, da'), ['Nguyễn Văn An'])
+        self.assertEqual(self.search('87654'), ['Trần Bình'])
+
+    def test_any_word_start_is_opt_in(self):
+        create_lecturer('Nguyễn Văn An', email='an@hust.edu.vn')
+        view = SimpleNamespace(search_fields=['$name', 'email'])
+
+        def search(value):
+            request = SimpleNamespace(query_params={'search': value})
+            queryset = FoldedSearchFilter().filter_queryset(request, Lecturer.objects.all(), view)
+            return list(queryset.values_list('name', flat=True))
+
+        self.assertEqual(search('van an'), ['Nguyễn Văn An'])
+        self.assertEqual(search('an'), ['Nguyễn Văn An'])
+        self.assertEqual(search('guyen'), [])
+        self.assertEqual(search('hust'), [])
+
+    def test_shadow_column_follows_updates(self):
+        lecturer = create_lecturer('Nguyễn Văn An')
+        lecturer.name = 'Trần Văn Bình'
+        lecturer.save(update_fields=['name'])
+        lecturer.refresh_from_db()
+        self.assertEqual(lecturer.name_folded, 'tran van binh')
+
+        Lecturer.objects.filter(pk=lecturer.pk).update(name='Lê Minh')
+        call_command('backfill_search', stdout=StringIO())
+        lecturer.refresh_from_db()
+        self.assertEqual(lecturer.name_folded, 'le minh')
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('education', 'education_department'))
+        self.expert = create_lecturer('Trần Học Máy', researches=[{'name': 'Thị giác máy tính'}])
+        self.author = create_lecturer('Lê Văn Bình', published_works=[
+            {'title': 'Học máy ứng dụng', 'year': 2021}])
+
+    def search(self, client=None, **params):
+        return (client or self.client).get('/search/', params).data
+
+    def test_ranks_json_fields_with_facets(self):
+        Document.objects.create(name='Quy chế học vụ', file_link='http://example.com/1')
+        data = self.search(q='hoc may')
+        self.assertEqual(data['facets'], {'lecturer': 2, 'document': 0})
+        self.assertEqual([hit['object_id'] for hit in data['results']],
+                         [self.expert.pk, self.author.pk])
+        self.assertIn('<mark>Học</mark> <mark>máy</mark>', data['results'][1]['snippet'])
+        self.assertEqual(self.search(q='hoc', type='document')['count'], 1)
+
+    def test_entries_follow_saves_and_deletes(self):
+        self.author.published_works = []
+        self.author.save()
+        self.assertEqual(self.search(q='ung dung')['count'], 0)
+        self.expert.delete()
+        self.assertEqual(self.search(q='hoc may')['count'], 0)
+
+    def test_rebuild_restores_entries(self):
+        SearchEntry.objects.all().delete()
+        self.assertEqual(self.search(q='hoc may')['count'], 0)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search(q='hoc may')['count'], 2)
+
+    def test_lecturers_hidden_without_role(self):
+        client = APIClient()
+        client.force_authenticate(create_user('outsider'))
+        self.assertEqual(self.search(client, q='hoc may')['facets'], {'document': 0})
+
+    def test_mysql_short_terms_skip_the_index(self):
+        # InnoDB defaults: no tokens under 3 letters, 'the' is a stopword
+        engine = MySQLEngine(min_token_size=3, stopwords=INNODB_STOPWORDS)
+        match = engine.match(['le', 'van', 'the'])
+        self.assertEqual(match, ('+van*', [r'\ble', r'\bthe']))
+        sql, params = engine.hits(match, ['lecturer'], 20, 0)
+        self.assertEqual(sql.count('%s'), len(params))
+        self.assertEqual(sql.count('REGEXP'), 6)
+        sql, params = engine.facets(engine.match(['le']), ['lecturer'])
+        self.assertNotIn('MATCH', sql)
+        self.assertEqual(params, [r'\ble', r'\ble', 'lecturer'])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('education', 'education_department'))
+        autocomplete.clear()
+
+    def lookup(self, client=None, **params):
+        return (client or self.client).get('/autocomplete/', params)
+
+    def test_word_prefixes_without_diacritics(self):
+        an = create_lecturer('Nguyễn Văn An')
+        binh = create_lecturer('Nguyễn Thị Bình')
+        create_lecturer('Trần Đức')
+        response = self.lookup(type='lecturer', prefix='ngu')
+        self.assertEqual([row['id'] for row in response.data], [binh.pk, an.pk])
+        self.assertEqual(self.lookup(type='lecturer', prefix='VĂN').data,
+                         [{'id': an.pk, 'label': 'Nguyễn Văn An'}])
+        self.assertEqual(len(self.lookup(type='lecturer', prefix='n', limit=1).data), 1)
+
+    def test_rebuilt_after_changes(self):
+        self.assertEqual(self.lookup(type='course', prefix='toan').data, [])
+        course = Course.objects.create(name='Toán rời rạc', code='MI1', credits=3)
+        self.assertEqual(self.lookup(type='course', prefix='toan').data[0]['id'], course.pk)
+        with self.assertNumQueries(1):
+            # Only the role lookup, the index is reused
+            self.lookup(type='course', prefix='roi')
+        course.delete()
+        self.assertEqual(self.lookup(type='course', prefix='toan').data, [])
+
+    def test_lecturers_need_a_reader_group(self):
+        client = APIClient()
+        client.force_authenticate(create_user('outsider'))
+        self.assertEqual(self.lookup(client, type='lecturer', prefix='a').status_code, 400)
+        self.assertEqual(self.lookup(client, type='course', prefix='a').status_code, 200)
+
+
+class ChoicesTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        for name in ['Trần B', 'Nguyễn A']:
+            create_lecturer(name)
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_projection_is_cached_with_etag(self):
+        # Version lookup, role lookup and the projection itself
+        response = self.assertQueryBudget(3, 'get', '/choices/lecturers/')
+        self.assertEqual([row['label'] for row in response.data], ['Nguyễn A', 'Trần B'])
+        self.assertEqual(set(response.data[0]), {'id', 'label'})
+        self.assertQueryBudget(2, 'get', '/choices/lecturers/')
+        response = self.client.get('/choices/lecturers/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_lecturer('Lê C')
+        self.assertEqual(len(self.client.get('/choices/lecturers/').data), 3)
+
+    def test_lecturers_need_a_reader_group(self):
+        client = APIClient()
+        client.force_authenticate(create_user('outsider'))
+        self.assertEqual(client.get('/choices/lecturers/').status_code, 404)
+        self.assertEqual(client.get('/choices/groups/').status_code, 200)
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('it', 'it_faculty')
+        cls.lecturer = create_lecturer('Nguyễn A', researches=[{'name': 'Học máy'}])
+        cls.lecturer.courses.add(Course.objects.create(name='Toán', code='MI1', credits=3))
+        for i in range(3):
+            recommendation = LecturerRecommendation.objects.create(
+                name=f'Ứng viên {i}', recommender=cls.lecturer, content='...')
+            recommendation.courses.set(cls.lecturer.courses.all())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_narrow_payload_and_columns(self):
+        response, queries = self.get('/lecturers/?fields=id,name')
+        self.assertEqual(response.data['results'], [{'id': self.lecturer.pk, 'name': 'Nguyễn A'}])
+        lecturer_query = next(sql for sql in queries if 'FROM "lecturers_lecturer"' in sql
+                              and 'COUNT' not in sql)
+        self.assertNotIn('researches', lecturer_query)
+        self.assertFalse(any('lecturers_lecturer_courses' in sql for sql in queries))
+
+        response, queries = self.get('/lecturers/?fields=name,course_names')
+        self.assertEqual(response.data['results'][0]['course_names'], ['Toán'])
+
+    def test_recommender_nested_by_default(self):
+        response, queries = self.get('/recommendations/')
+        self.assertEqual(response.data['results'][0]['recommender_details']['full_name'],
+                         'Nguyễn A - HUST')
+        self.assertEqual(response.data['results'][0]['course_names'], ['Toán'])
+
+        response, narrowed = self.get('/recommendations/?fields=id,name')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        self.assertFalse(any('JOIN "lecturers_lecturer" ' in sql for sql in narrowed))
+
+        response, expanded = self.get('/recommendations/?fields=id&expand=recommender_details')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'recommender_details'})
+        # The recommender is joined, not fetched per row
+        self.assertLessEqual(len(expanded), len(queries))
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        course = Course.objects.create(name='Toán', code='MI1', credits=3)
+        for i in range(5):
+            lecturer = create_lecturer(f'Nguyễn {i}', researches=[{'name': 'Học máy', 'year': 2020}])
+            lecturer.courses.add(course)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_csv_streams_flattened_rows_in_chunks(self):
+        with patch('backend.export.CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/export/lecturers.csv')
+            self.assertTrue(response.streaming)
+            lines = b''.join(response.streaming_content).decode().lstrip('\ufeff').splitlines()
+        header = next(csv.reader(lines[:1]))
+        rows = list(csv.DictReader(lines))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['researches'], 'Học máy; 2020')
+        self.assertEqual(rows[0]['courses'], 'MI1')
+        self.assertIn('name', header)
+        # Three chunks of rows, each with its course lookup, plus the last empty chunk
+        chunk_queries = [q for q in queries if 'lecturers_lecturer' in q['sql']]
+        self.assertEqual(len(chunk_queries), 7)
+
+    def test_ndjson_keeps_json_and_checks_roles(self):
+        response = self.client.get('/export/lecturers.ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows[0]['researches'], [{'name': 'Học máy', 'year': 2020}])
+
+        client = APIClient()
+        client.force_authenticate(create_user('outsider'))
+        self.assertEqual(client.get('/export/lecturers.csv').status_code, 404)
+        self.assertEqual(self.client.get('/export/lecturers.pdf').status_code, 404)
+
+
+class ImportTests(TestCase):
+    header = ('id,name,email,phone_number,gender,dob,hometown,degree,title_detail,'
+              'title_granted_at,address,work_position,workplace,status,researches,courses\n')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        Course.objects.create(name='Toán', code='MI1', credits=3)
+        Course.objects.create(name='Lý', code='PH1', credits=3)
+        create_lecturer('Trần B')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, rows, query=''):
+        file = SimpleUploadedFile('lecturers.csv', ('\ufeff' + self.header + rows).encode())
+        return self.client.post(f'/lecturers/import/{query}', {'file': file})
+
+    def row(self, name, email, status='Đã ký hợp đồng', courses='MI1; ph1', researches='[]'):
+        return (f'99,{name},{email},0123,Nam,1980-01-01,Huế,Tiến sĩ,TS,2010-01-01,Huế,GV,HUST,'
+                f'{status},"{researches}",{courses}\n')
+
+    def test_row_errors_save_nothing(self):
+        response = self.upload(
+            self.row('Lê C', 'le@example.com')
+            + self.row('Lê D', 'LE@example.com', courses='XX9')
+            + self.row('Lê E', 'tranb@example.com', researches='[oops')
+            + self.row('Lê F', 'not-an-email'))
+        self.assertEqual(response.status_code, 400)
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [3, 4, 5])
+        self.assertIn('courses', errors[3])
+        self.assertIn('email', errors[3])
+        self.assertEqual(set(errors[4]), {'email', 'researches'})
+        self.assertEqual(response.data['ignored_columns'], ['id'])
+        self.assertEqual(Lecturer.objects.count(), 1)
+
+    def test_import_creates_rows_in_bulk(self):
+        rows = ''.join(self.row(f'Nguyễn {i}', f'n{i}@example.com') for i in range(20))
+        rows += self.row('Phạm Chờ', 'cho@example.com', status='', courses='')
+        self.assertEqual(self.upload(rows, '?dry_run=1').status_code, 200)
+        self.assertEqual(Lecturer.objects.count(), 1)
+
+        with patch('lecturers.imports.CHUNK_SIZE', 8), CaptureQueriesContext(connection) as queries:
+            response = self.upload(rows)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 21)
+        self.assertLess(len(queries), 40)
+
+        lecturer = Lecturer.objects.get(email='n3@example.com')
+        self.assertEqual(lecturer.name_folded, 'nguyen 3')
+        self.assertTrue(lecturer.is_active_lecturer)
+        self.assertEqual(sorted(lecturer.courses.values_list('code', flat=True)), ['MI1', 'PH1'])
+        self.assertEqual(Lecturer.objects.get(email='cho@example.com').status, 'Chưa được duyệt')
+        self.assertEqual(SearchEntry.objects.filter(kind='lecturer').count(), 22)
+        self.assertEqual(stats_drift(), {})
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ScheduleSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        cls.course = Course.objects.create(name='Toán', code='MI1', credits=3)
+        cls.lecturer = create_lecturer('Nguyễn A')
+        cls.other = create_lecturer('Trần B')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, **kwargs):
+        data = {
+            'lecturer': self.lecturer.pk, 'course': self.course.pk, 'place': 'D3-101',
+            # Mondays and Thursdays of October 2026, without the 15th
+            'weekdays': [0, 3], 'start_date': '2026-10-01', 'end_date': '2026-10-31',
+            'start_time': '07:00', 'end_time': '09:40', 'excluded_dates': ['2026-10-15'],
+        }
+        data.update(kwargs)
+        return self.client.post('/schedule-series/', data, format='json')
+
+    def test_series_expands_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 8)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "lecturers_schedule"')]
+        self.assertEqual(len(inserts), 1)
+        first = Schedule.objects.order_by('start_time').first()
+        # 07:00 in Hanoi is midnight UTC
+        self.assertEqual(first.start_time.isoformat(), '2026-10-01T00:00:00+00:00')
+        self.assertEqual(first.series_id, response.data['id'])
+
+        # Same room on Thursdays, even with another lecturer
+        response = self.create(lecturer=self.other.pk, weekdays=[3], start_time='09:00', end_time='10:00')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual({c['type'] for c in response.data['conflicts']}, {'place'})
+        self.assertEqual(len(response.data['conflicts']), 4)
+        self.assertEqual(Schedule.objects.count(), 8)
+
+    def test_move_and_cancel_part_of_series(self):
+        series_id = self.create().data['id']
+        blocker = self.create(lecturer=self.other.pk, place='D3-102', weekdays=[1],
+                              start_date='2026-10-20', end_date='2026-10-20').data['id']
+        url = f'/schedule-series/{series_id}/'
+
+        response = self.client.post(url + 'move/', {'start': '2026-10-19', 'days': 1, 'place': 'D3-102'})
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(url + 'move/', {'start': '2026-10-19', 'minutes': 60})
+        self.assertEqual(response.data, {'moved': 4})
+        self.assertEqual(Schedule.objects.filter(series_id=series_id, start_time__hour=1).count(), 4)
+
+        response = self.client.post(url + 'cancel/', {'start': '2026-10-26'})
+        self.assertEqual(response.data, {'cancelled': 2})
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(list(Schedule.objects.values_list('series_id', flat=True)), [blocker])
+
+
+    def test_move_keeps_wall_clock_time_across_dst(self):
+        # Berlin leaves summer time on 2026-10-25
+        series_id = self.create(timezone='Europe/Berlin', weekdays=[0], start_date='2026-10-19',
+                                end_date='2026-11-02', excluded_dates=[]).data['id']
+        response = self.client.post(f'/schedule-series/{series_id}/move/', {'days': 7})
+        self.assertEqual(response.data, {'moved': 3})
+        zone = ZoneInfo('Europe/Berlin')
+        local = [(s.start_time.astimezone(zone), s.end_time.astimezone(zone))
+                 for s in Schedule.objects.filter(series_id=series_id).order_by('start_time')]
+        self.assertEqual([start.date().isoformat() for start, _ in local],
+                         ['2026-10-26', '2026-11-02', '2026-11-09'])
+        self.assertEqual({(start.strftime('%H:%M'), end.strftime('%H:%M')) for start, end in local},
+                         {('07:00', '09:40')})
+
+
+class ScheduleConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        cls.course = Course.objects.create(name='Toán', code='MI1', credits=3)
+        cls.lecturer = create_lecturer('Nguyễn A')
+        cls.other = create_lecturer('Trần B')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, start, end, lecturer=None, place='D3-101'):
+        return self.client.post('/schedules/', {
+            'start': f'2026-10-19T{start}:00Z', 'end': f'2026-10-19T{end}:00Z',
+            'lecturer': (lecturer or self.lecturer).pk, 'course': self.course.pk, 'place': place,
+        })
+
+    def test_interval_tree_matches_brute_force(self):
+        rng = random.Random(7)
+        items = [(start, start + rng.randint(1, 30), i)
+                 for i, start in enumerate(rng.randint(0, 500) for _ in range(300))]
+        tree = IntervalTree(items)
+        for _ in range(200):
+            start = rng.randint(0, 520)
+            end = start + rng.randint(1, 40)
+            expected = {i for s, e, i in items if s < end and start < e}
+            self.assertEqual(set(tree.overlapping(start, end)), expected)
+
+    def test_create_and_update_reject_double_booking(self):
+        first = self.post('07:00', '09:00').data['id']
+        # Back to back is fine, in the same room and for the same lecturer
+        self.assertEqual(self.post('09:00', '10:00').status_code, 201)
+        response = self.post('08:00', '08:30', lecturer=self.other)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'][0]['type'], 'place')
+        self.assertEqual(response.data['conflicts'][0]['conflicts_with']['id'], first)
+        self.assertEqual(self.post('08:00', '08:30', place='D3-102').status_code, 409)
+        self.assertEqual(self.post('10:00', '09:00', place='D3-102').status_code, 400)
+
+        # A schedule does not conflict with its own old times
+        data = {'start': '2026-10-19T07:00:00Z', 'end': '2026-10-19T08:30:00Z',
+                'lecturer': self.lecturer.pk, 'course': self.course.pk, 'place': 'D3-101'}
+        self.assertEqual(self.client.put(f'/schedules/{first}/', data).status_code, 200)
+        data['end'] = '2026-10-19T09:30:00Z'
+        self.assertEqual(self.client.put(f'/schedules/{first}/', data).status_code, 409)
+
+    def test_conflict_report_sweeps_window(self):
+        start = datetime(2026, 10, 19, 7, tzinfo=dt_timezone.utc)
+        for lecturer, offset, place in [
+            (self.lecturer, 0, 'A'), (self.lecturer, 1, 'B'), (self.other, 2, 'B'), (self.other, 30, 'C'),
+        ]:
+            Schedule.objects.create(
+                start_time=start + timedelta(hours=offset), end_time=start + timedelta(hours=offset + 2),
+                lecturer=lecturer, course=self.course, place=place)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/schedules/conflicts/?start=2026-10-19&end=2026-10-20')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(c['type'], c.get('place')) for c in response.data],
+                         [('lecturer', None), ('place', 'B')])
+        self.assertEqual(len([q for q in queries if 'lecturers_schedule' in q['sql']]), 1)
+        self.assertEqual(self.client.get('/schedules/conflicts/?start=2026-10-20&end=2026-10-19').status_code, 400)
+
+
+class ScheduleLockTests(TransactionTestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name='Toán', code='MI1', credits=3)
+        self.lecturer = create_lecturer('Nguyễn A')
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('education', 'education_department'))
+
+    def test_conflict_check_locks_inside_the_save_transaction(self):
+        locked = []
+        select_for_update = QuerySet.select_for_update
+
+        def spy(queryset, *args, **kwargs):
+            locked.append((queryset.model, connection.in_atomic_block))
+            return select_for_update(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, 'select_for_update', spy):
+            response = self.client.post('/schedules/', {
+                'start': '2026-10-19T07:00:00Z', 'end': '2026-10-19T09:00:00Z',
+                'lecturer': self.lecturer.pk, 'course': self.course.pk, 'place': 'D3-101',
+            })
+        self.assertEqual(response.status_code, 201)
+        # The lecturer row, then the overlapping lessons, both before the insert commits
+        self.assertEqual(locked, [(Lecturer, True), (Schedule, True)])
+
+
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        cls.course = Course.objects.create(name='Toán', code='MI1', credits=3)
+        cls.busy = create_lecturer('Nguyễn A')
+        cls.free = create_lecturer('Trần B')
+        create_lecturer('Lê C')  # not qualified
+        for lecturer in (cls.busy, cls.free):
+            lecturer.courses.add(cls.course)
+        # 07:00-09:00 and 08:30-10:00 in Hanoi on October 19th, merged into one block
+        for start, end in ((0, 2), (1.5, 3)):
+            Schedule.objects.create(
+                start_time=datetime(2026, 10, 19, tzinfo=dt_timezone.utc) + timedelta(hours=start),
+                end_time=datetime(2026, 10, 19, tzinfo=dt_timezone.utc) + timedelta(hours=end),
+                lecturer=cls.busy, course=cls.course, place='D3-101')
+
+    def test_free_slots_per_lecturer(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = (f'/schedules/availability/?course={self.course.pk}&start=2026-10-19&end=2026-10-20'
+               '&slot=60&day_start=07:00&day_end=12:00')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['slots'], 5)
+        # The course, the qualified lecturers and all their lessons, plus the ETag versions
+        self.assertEqual(len([q for q in queries if 'lecturers_' in q['sql']]), 4)
+        self.assertEqual(len([q for q in queries if 'FROM "lecturers_schedule"' in q['sql']]), 1)
+        free, busy = response.data['lecturers']
+        self.assertEqual((free['name'], free['free_slots'], len(free['free'])), ('Trần B', 5, 1))
+        self.assertEqual(busy['free_slots'], 2)
+        # 10:00-12:00 in Hanoi
+        self.assertEqual(busy['free'], [{
+            'start': datetime(2026, 10, 19, 3, tzinfo=dt_timezone.utc),
+            'end': datetime(2026, 10, 19, 5, tzinfo=dt_timezone.utc),
+        }])
+
+
+class ScheduleWindowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('faculty', 'it_faculty')
+        cls.course = Course.objects.create(name='Toán', code='MI1', credits=3)
+        cls.lecturer = create_lecturer('Nguyễn A')
+        # One lesson a day from October 19th, 01:00-03:00 UTC
+        cls.schedules = [
+            Schedule.objects.create(
+                start_time=datetime(2026, 10, 19 + day, 1, tzinfo=dt_timezone.utc),
+                end_time=datetime(2026, 10, 19 + day, 3, tzinfo=dt_timezone.utc),
+                lecturer=cls.lecturer, course=cls.course, place=f'D3-{day}')
+            for day in range(5)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_window_filters_and_reads_courses_in_one_query(self):
+        # Midnight in Hanoi is 17:00 UTC the day before
+        url = '/schedules/?start=2026-10-20&end=2026-10-22'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data],
+                         [schedule.pk for schedule in self.schedules[1:3]])
+        self.assertEqual(response.data[0]['classNames'], 'Toán')
+        self.assertEqual(len([q for q in queries if 'lecturers_course' in q['sql']]), 1)
+        # A lesson running across start is in the window
+        response = self.client.get(
+            f'/schedules/by-lecturer/{self.lecturer.pk}/?start=2026-10-19T02:00:00Z&end=2026-10-19T02:30:00Z')
+        self.assertEqual([row['id'] for row in response.data], [self.schedules[0].pk])
+        self.assertEqual(self.client.get('/schedules/?start=2026-10-20').status_code, 400)
+        self.assertEqual(len(self.client.get('/schedules/').data), 5)
+
+    def test_pages_with_page_size(self):
+        response = self.client.get('/schedules/?start=2026-10-19&end=2026-10-25&page_size=2&cursor=')
+        ids = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [row['id'] for row in response.data['results']]
+        self.assertEqual(ids, [schedule.pk for schedule in self.schedules])
+
+    def test_etag_changes_only_with_the_window(self):
+        url = '/schedules/?start=2026-10-19&end=2026-10-21'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Outside the window
+        self.schedules[4].place = 'D9-401'
+        self.schedules[4].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.schedules[0].place = 'D9-401'
+        self.schedules[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.schedules[1].delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ScheduleFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('lecturer', 'lecturer')
+        cls.course = Course.objects.create(name='Toán, rời rạc', code='MI1', credits=3)
+        cls.lecturer = create_lecturer('Nguyễn A', user=cls.user)
+        cls.other = create_lecturer('Trần B')
+        cls.schedules = [
+            Schedule.objects.create(
+                start_time=datetime(2026, 10, 19 + day, 1, tzinfo=dt_timezone.utc),
+                end_time=datetime(2026, 10, 19 + day, 3, tzinfo=dt_timezone.utc),
+                lecturer=lecturer, course=cls.course, place='D3-101', notes='Mang máy tính')
+            for day, lecturer in enumerate([cls.lecturer] * 3 + [cls.other])
+        ]
+
+    def setUp(self):
+        get_backend().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, client=None, **headers):
+        response = (client or self.client).get(url, **headers)
+        if response.status_code == 200:
+            response.body = b''.join(response.streaming_content).decode()
+        return response
+
+    def test_feed_events(self):
+        response = self.get('/schedules/me.ics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        text = response.body
+        self.assertTrue(text.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(text.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(text.count('BEGIN:VEVENT'), 3)
+        self.assertIn('DTSTART:20261019T010000Z\r\n', text)
+        self.assertIn('SUMMARY:Toán\\, rời rạc\r\n', text)
+        self.assertEqual(self.get(f'/schedules/ics/{self.lecturer.pk}/').body.count('BEGIN:VEVENT'), 3)
+        # Only schedule managers read other lecturers' feeds
+        self.assertEqual(self.get(f'/schedules/ics/{self.other.pk}/').status_code, 404)
+        self.client.force_authenticate(create_user('education', 'education_department'))
+        self.assertEqual(self.get(f'/schedules/ics/{self.other.pk}/').body.count('BEGIN:VEVENT'), 1)
+        self.assertEqual(self.get('/schedules/ics/999999/').status_code, 404)
+
+    def test_token_url_for_calendar_apps(self):
+        url = self.client.get('/schedules/feed/').data['url']
+        self.assertEqual(self.client.get('/schedules/feed/').data['url'], url)
+        app = APIClient()
+        response = self.get(url, app, HTTP_ACCEPT='text/calendar')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body.count('BEGIN:VEVENT'), 3)
+        token = url.partition('?')[2]
+        self.assertEqual(self.get(f'/schedules/me.ics?{token}', app).status_code, 200)
+        # A token opens only its own lecturer's feed
+        self.assertEqual(self.get(f'/schedules/ics/{self.other.pk}/?{token}', app).status_code, 404)
+        self.assertEqual(self.get('/schedules/me.ics', app).status_code, 404)
+
+        # Rotating cuts off the old URL
+        rotated = self.client.post('/schedules/feed/').data['url']
+        self.assertNotEqual(rotated, url)
+        self.assertEqual(self.get(url, app).status_code, 404)
+        self.assertEqual(self.get(rotated, app).status_code, 200)
+
+    def test_fold_keeps_utf8_sequences(self):
+        line = 'DESCRIPTION:' + 'ờ' * 60
+        folded = fold_line(line)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded.split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', '').rstrip('\r\n'), line)
+
+    def test_conditional_get_and_incremental_regeneration(self):
+        etag = self.get('/schedules/me.ics')['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/schedules/me.ics', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries if 'SELECT "lecturers_schedule"."id"' in q['sql']])
+
+        # Another lecturer's lesson keeps this feed
+        self.schedules[3].place = 'D9-401'
+        self.schedules[3].save()
+        self.assertEqual(self.get('/schedules/me.ics', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Only the changed event is rendered again
+        self.schedules[0].place = 'D9-401'
+        self.schedules[0].save()
+        with patch('lecturers.ics.render_event', wraps=render_event) as render:
+            response = self.get('/schedules/me.ics', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render.call_count, 1)
+        self.assertIn('LOCATION:D9-401', response.body)
+        self.assertEqual(response.body.count('BEGIN:VEVENT'), 3)
+
+        self.schedules[1].delete()
+        response = self.get('/schedules/me.ics', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.body.count('BEGIN:VEVENT'), 2)
+
+
+class UpcomingScheduleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('faculty', 'it_faculty')
+        cls.course = Course.objects.create(name='Toán', code='MI1', credits=3)
+        lecturers = [create_lecturer('Nguyễn A'), create_lecturer('Trần B')]
+        # 23:00 UTC on October 18th is 06:00 on the 19th in Hanoi
+        cls.schedules = [
+            Schedule.objects.create(
+                start_time=datetime(2026, 10, 18, 23, tzinfo=dt_timezone.utc) + timedelta(hours=hours),
+                end_time=datetime(2026, 10, 18, 23, tzinfo=dt_timezone.utc) + timedelta(hours=hours + 1),
+                lecturer=lecturers[index % 2], course=cls.course, place=f'D3-{index}')
+            for index, hours in enumerate((0, 2, 4, 26, 50))
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @patch('django.utils.timezone.now', return_value=datetime(2026, 10, 19, 2, tzinfo=dt_timezone.utc))
+    def test_today_in_callers_timezone(self, now):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/schedules/today/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data],
+                         [schedule.pk for schedule in self.schedules[:3]])
+        self.assertEqual(response.data[1]['lecturer_name'], 'Trần B')
+        # One query for the rows with their course and lecturer
+        self.assertEqual(len([q for q in queries if 'FROM "lecturers_schedule"' in q['sql']
+                              and 'COUNT' not in q['sql']]), 1)
+        self.assertEqual(len([q for q in queries if 'FROM "lecturers_course"' in q['sql']]), 0)
+
+        # The UTC day starts 7 hours later, after the 23:00 lesson
+        response = self.client.get('/schedules/today/?timezone=UTC')
+        self.assertEqual([row['id'] for row in response.data],
+                         [schedule.pk for schedule in self.schedules[1:3]])
+
+    @patch('django.utils.timezone.now', return_value=datetime(2026, 10, 19, 2, tzinfo=dt_timezone.utc))
+    def test_days_horizon(self, now):
+        response = self.client.get('/schedules/today/?days=3')
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(self.client.get('/schedules/today/?days=2').data), 4)
+        self.assertEqual(self.client.get('/schedules/today/?days=0').status_code, 400)
+        self.assertEqual(self.client.get('/schedules/today/?timezone=Mars/Base').status_code, 400)
+
+    def test_etag_moves_with_the_day(self):
+        with patch('django.utils.timezone.now', return_value=datetime(2026, 11, 1, 2, tzinfo=dt_timezone.utc)):
+            etag = self.client.get('/schedules/today/')['ETag']
+            self.assertEqual(self.client.get('/schedules/today/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Both days are empty, only the range tells them apart
+        with patch('django.utils.timezone.now', return_value=datetime(2026, 11, 2, 2, tzinfo=dt_timezone.utc)):
+            self.assertEqual(self.client.get('/schedules/today/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class StatelessAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('faculty', 'it_faculty')
+        cls.lecturer = create_lecturer('Nguyễn A', user=cls.user)
+
+    def setUp(self):
+        clear_cached_user()
+        response = APIClient().post('/api/token/', {'username': 'faculty', 'password': 'password'})
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_dashboard_reads_the_caller_from_the_claims(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/lecturers/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'users_customuser' in q['sql']])
+        user = response.wsgi_request.user
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.pk, user.id, user.lecturer_id), (self.user.pk, self.user.pk, self.lecturer.pk))
+        self.assertEqual(user.group_names, {'it_faculty'})
+        self.assertEqual(user.instance, self.user)
+
+    def test_self_lecturer_compares_ids(self):
+        response = self.client.get('/lecturers/dashboard/')
+        view = SimpleNamespace(kwargs={'lecturer_id': self.lecturer.pk})
+        self.assertTrue(is_self_lecturer(response.wsgi_request, view))
+
+    @override_settings(STATELESS_USER_CACHE_SIZE=2, STATELESS_USER_CACHE_TTL=60)
+    def test_user_cache_is_bounded(self):
+        users = [self.user] + [create_user(f'user{i}') for i in range(3)]
+        with override_settings(STATELESS_USER_CACHE_TTL=-1):
+            self.assertEqual(get_cached_user(users[0].pk), users[0])
+        get_cached_user(users[1].pk)
+        # Expired entries go before the least recently used
+        get_cached_user(users[2].pk)
+        self.assertEqual(list(authentication._user_cache), [users[1].pk, users[2].pk])
+        get_cached_user(users[1].pk)
+        get_cached_user(users[3].pk)
+        self.assertEqual(list(authentication._user_cache), [users[1].pk, users[3].pk])
@@ -1,3 +1,4 @@
+from django.urls import path
 from .views import *
 from rest_framework.routers import DefaultRouter
 
@@ -6,6 +7,9 @@ router.register("courses", CourseViewSet, basename="courses")
 router.register("lecturers", LecturerViewSet, basename="lecturers")
 router.register("classes", ClassViewSet, basename="classes")
 router.register("schedules", ScheduleViewSet, basename="schedules")
+router.register("schedule-series", ScheduleSeriesViewSet, basename="schedule-series")
 router.register("evaluations", EvaluationViewSet, basename="evaluations")
 router.register("recommendations", LecturerRecommendationViewSet, basename="recommendations")
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = [
+    path('schedules/me.ics', ScheduleViewSet.as_view({'get': 'me_ics'}), name='schedules-me-ics'),
+] + router.urls
\ No newline at end of file
@@ -1,16 +1,41 @@
-from datetime import date
+from datetime import timedelta
+from django.conf import settings
 from django.shortcuts import render
+from django.db import transaction
 from django.db.models import Q, Count
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth.models import Group
 from rest_framework import viewsets, permissions ,status
 from .serializers import *
 from .models import *
+from .availability import availability
+from .conflicts import MAX_SCHEDULE_LENGTH, conflict_report
+from .ics import calendar, feed_events, feed_token, token_lecturer
+from .imports import EXTENSIONS as IMPORT_EXTENSIONS, ImportFileError, import_lecturers
+from .recurrence import (
+    MAX_OCCURRENCES, cancel_series, create_series, move_series, occurrence_dates,
+)
+from .stats import (
+    active_breakdown, count_buckets, dashboard_stats,
+    is_active, is_pending, is_potential, percentages,
+)
 from rest_framework import filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from backend.authentication import StatelessJWTAuthentication
+from backend.caching import cache_response
+from backend.pagination import KeysetPagination
+from backend.roles import get_group_names, has_group
+from backend.search import FoldedSearchFilter
+from backend.sparse import SparseFieldsFilter, sparse_queryset
+from backend.conditional import (
+    compute_etag, conditional_get, conditional_queryset, is_not_modified, queryset_versions,
+)
 
 
 class CoursePagination(PageNumberPagination):
@@ -25,7 +50,7 @@ class CourseViewSet(viewsets.ModelViewSet):
     pagination_class = CoursePagination
     authentication_classes = [JWTAuthentication]
     # permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter, SparseFieldsFilter]
     filterset_fields = ['name', 'code', 'credits']
     search_fields = ['name', 'code', 'credits']
     ordering_fields = ['name', 'code', 'credits']
@@ -40,6 +65,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         },
     }
 
+    @conditional_get(Course)
     def list(self, request):
         queryset = Course.objects.all()
         # Apply search filter and ordering
@@ -48,52 +74,50 @@ class CourseViewSet(viewsets.ModelViewSet):
         # Add pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
         # If no pagination, return all results
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No courses found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
 
     # Get all courses (not paginated)
     @action(detail=False, methods=['get'], url_path='all_courses')
+    @conditional_get(Course)
+    @cache_response(Course)
     def all_courses(self, request):
         queryset = Course.objects.all()
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No courses found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='lecturer_count')
+    @conditional_get(Lecturer, Course, CustomUser)
     def lecturer_count(self, request):
-        lecturer_group = Group.objects.filter(name='lecturer').first()
-        # Filter lecturers in the 'lecturer' group
-        lecturer_queryset = Lecturer.objects.filter(
-            Q(user__groups=lecturer_group) |
-            Q(status="Đã ký hợp đồng")
-        )
-        # Annotate each Course with the count of lecturers in the filtered queryset
+        # Annotate each Course with the count of its active lecturers
         courses = Course.objects.annotate(
             lecturer_count=Count(
                 'lecturer',
-                filter=Q(lecturer__in=lecturer_queryset)
+                filter=Q(lecturer__is_active_lecturer=True)
             )
         ).values('name', 'lecturer_count')
         return Response(list(courses))
     
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
+    @conditional_get(Course)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except Course.DoesNotExist:
             return Response({"error": "Course not found"}, status=404)
@@ -104,7 +128,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         except Course.DoesNotExist:
             return Response({"error": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(Course, data=request.data)
+        serializer = self.get_serializer(Course, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -122,7 +146,7 @@ class CourseViewSet(viewsets.ModelViewSet):
             return Response({"error": "Course not found"}, status=404)
 
         
-class LecturerPagination(PageNumberPagination):
+class LecturerPagination(KeysetPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -134,9 +158,9 @@ class LecturerViewSet(viewsets.ModelViewSet):
     pagination_class = LecturerPagination
     authentication_classes = [JWTAuthentication]
     # permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [FoldedSearchFilter, filters.OrderingFilter, SparseFieldsFilter]
     filterset_fields = ['name', 'status', 'degree', 'specialization', 'phone_number', 'email', 'address']
-    search_fields = ['name', 'status', 'degree', 'specialization', 'phone_number', 'email', 'address']
+    search_fields = ['name', 'status', 'degree', 'phone_number', 'email', 'address']
     ordering_fields = ['name', 'status', 'degree', 'specialization', 'phone_number', 'email', 'address']
     view_permissions = {
         'me': {
@@ -154,7 +178,7 @@ class LecturerViewSet(viewsets.ModelViewSet):
             'it_faculty': True,
             'supervision_department': True
         },
-        'create,update,destroy': {
+        'create,update,destroy,bulk_import': {
           'education_department': True  
         },
         'potential_lecturers,partial_update,count_potential_lecturers': {
@@ -167,25 +191,33 @@ class LecturerViewSet(viewsets.ModelViewSet):
         'degree_count,title_count,count_all_lecturers': {
             'user': True,
         },
+        'dashboard': {
+            'user': True,
+        },
+    }
+    # Dashboard figures that only some groups could read through the
+    # count_* actions, the other figures are open to every user
+    DASHBOARD_READERS = {
+        'potential_lecturers': {'it_faculty', 'education_department'},
+        'pending_lecturers': {'education_department'},
+        'unchecked_recommendations': {'it_faculty'},
     }
     
+    @conditional_get(Lecturer, Course, CustomUser)
     def list(self, request):
-        lecturer_group = Group.objects.filter(name='lecturer').first()
-        queryset = Lecturer.objects.filter(
-            Q(user__groups=lecturer_group) |
-            Q(status="Đã ký hợp đồng")
-        ).distinct()
-        # Apply search filter and ordering
+        # Lecturers in the 'lecturer' group or with a signed contract
+        queryset = Lecturer.objects.filter(is_active_lecturer=True)
+        # Search, ordering, and the columns/prefetches ?fields= needs
         queryset = self.filter_queryset(queryset)
         
         # Add pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
         # If no pagination, return all results
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No lecturers found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
@@ -215,38 +247,62 @@ class LecturerViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='potential_lecturers')
+    @conditional_get(Lecturer, Course, CustomUser)
     def potential_lecturers(self, request):
         potential_group = Group.objects.filter(name='potential_lecturer').first()
         queryset = Lecturer.objects.filter(
             Q(user__groups=potential_group) |
             ~Q(status="Đã ký hợp đồng")
         ).distinct()
-        # Apply search filter and ordering
+        # Search, ordering, and the columns/prefetches ?fields= needs
         queryset = self.filter_queryset(queryset)
         
         # Add pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
         # If no pagination, return all results
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No potential lecturers found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
     
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Create lecturers from an uploaded CSV or XLSX file ('file'). Nothing
+        is saved when a row has errors or with ?dry_run=1; the report lists
+        the errors of every row.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        extension = upload.name.rpartition('.')[2].lower()
+        if extension not in IMPORT_EXTENSIONS:
+            return Response({"error": "Upload a .csv or .xlsx file"}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+        try:
+            report = import_lecturers(upload.file, extension, dry_run=dry_run)
+        except ImportFileError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if report['errors']:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=200 if dry_run else 201)
+    
+    @conditional_get(Lecturer, Course)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except Lecturer.DoesNotExist:
             return Response({"error": "Lecturer not found"}, status=404)
@@ -296,7 +352,7 @@ class LecturerViewSet(viewsets.ModelViewSet):
         except Lecturer.DoesNotExist:
             return Response({"error": "Lecturer not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(Lecturer, data=request.data)
+        serializer = self.get_serializer(Lecturer, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -315,17 +371,21 @@ class LecturerViewSet(viewsets.ModelViewSet):
         
     # Get all lecturers (not paginated)
     @action(detail=False, methods=['get'], url_path='all_lecturers')
+    @conditional_get(Lecturer, Course)
+    @cache_response(Lecturer, Course)
     def all_lecturers(self, request):
-        queryset = Lecturer.objects.all()
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(many=True)
+        # Only the columns and prefetches (courses for course_names) the fields need
+        serializer.instance = sparse_queryset(Lecturer.objects.all(), serializer.child)
         if not serializer.data:
             return Response({"error": "No lecturers found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get', 'put', 'patch', 'post'], url_path='me')
+    @conditional_get(Lecturer, Course)
     def me(self, request):
         try:
-            lecturer = Lecturer.objects.get(user=request.user)
+            lecturer = Lecturer.objects.get(user_id=request.user.id)
             if request.method in ['PUT', 'PATCH', 'POST']:
                 serializer = self.get_serializer(lecturer, data=request.data, partial=(request.method == 'PATCH'))
                 if serializer.is_valid():
@@ -347,96 +407,59 @@ class LecturerViewSet(viewsets.ModelViewSet):
                 # For other methods (PUT, PATCH, POST), create a new lecturer
                 data = request.data.copy()
                 data['user'] = request.user.id
-                serializer = self.serializer_class(data=data)
+                serializer = self.get_serializer(data=data)
                 if serializer.is_valid():
                     serializer.save()
                     return Response(serializer.data, status=201)
                 return Response(serializer.errors, status=400)
     
-    @action(detail=False, methods=['get'])
+    # The counters below are served from the LecturerStat table. They are
+    # the dashboard's read-heavy traffic, so the caller comes from the
+    # token claims instead of a user row.
+    @action(detail=False, methods=['get'], authentication_classes=[StatelessJWTAuthentication])
     def count_all_lecturers(self, request):
-        lecturer_group = Group.objects.filter(name='lecturer').first()
-        queryset = Lecturer.objects.filter(
-            Q(user__groups=lecturer_group) |
-            Q(status="Đã ký hợp đồng")
-        )
-        total = queryset.count()
+        total = count_buckets(is_active)
         return Response(total)
     
-    @action(detail=False, methods=["get"])
+    @action(detail=False, methods=['get'], authentication_classes=[StatelessJWTAuthentication])
     def count_potential_lecturers(self, request):
-        potential_group = Group.objects.filter(name='potential_lecturer').first()
-        queryset = Lecturer.objects.filter(
-            Q(status="Chưa duyệt hồ sơ") |
-            Q(user__groups=potential_group)
-        ).distinct()
-        count = queryset.count()
+        count = count_buckets(is_potential)
         return Response(count)
     
-    @action(detail=False, methods=["get"])
+    @action(detail=False, methods=['get'], authentication_classes=[StatelessJWTAuthentication])
     def count_pending_lecturers(self, request):
-        potential_group = Group.objects.filter(name='potential_lecturer').first()
-        queryset = Lecturer.objects.filter(
-            Q(status="Hồ sơ hợp lệ") |
-            Q(user__groups=potential_group)
-        ).distinct()
-        count = queryset.count()
+        count = count_buckets(is_pending)
         return Response(count)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], authentication_classes=[StatelessJWTAuthentication])
     def degree_count(self, request):
-        # Total number of lecturers
-        lecturer_group = Group.objects.filter(name='lecturer').first()
-        queryset = Lecturer.objects.filter(
-            Q(user__groups=lecturer_group) |
-            Q(status="Đã ký hợp đồng") 
-        )
-        total = queryset.count()
-        # Group by degree and count lecturers
-        data = (
-            queryset.values('degree')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-        # Calculate percentage for each degree
-        result = [
-            {
-                "degree": item["degree"],
-                "percentage": round(item["count"] / total * 100, 2) if total > 0 else 0
-            }
-            for item in data
-        ]
+        # Number of lecturers per degree, and the total
+        data, total = active_breakdown('degree')
         # Response format: [{"degree": "PhD", "percentage": 40.0}, ...]
-        return Response(result)
+        return Response(percentages(data, total, "degree"))
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], authentication_classes=[StatelessJWTAuthentication])
     def title_count(self, request):
-        # Total number of lecturers
-        lecturer_group = Group.objects.filter(name='lecturer').first()
-        queryset = Lecturer.objects.filter(
-            Q(user__groups=lecturer_group) |
-            Q(status="Đã ký hợp đồng") 
-        )
-        total = queryset.count()
-        # Group by title and count lecturers
-        data = (
-            queryset.values('title')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-        # Calculate percentage for each title
-        result = [
-            {
-                "title": item["title"] if item["title"] != "" else "None",
-                "percentage": round(item["count"] / total * 100, 2) if total > 0 else 0,
-            }
-            for item in data
-        ]
+        # Number of lecturers per title, and the total
+        data, total = active_breakdown('title')
         # Response format: [{"title": "Professor", "percentage": 40.0}, ...]
-        return Response(result)
+        return Response(percentages(data, total, "title", blank="None"))
+    
+    @action(detail=False, methods=['get'], authentication_classes=[StatelessJWTAuthentication])
+    def dashboard(self, request):
+        """
+        Every dashboard figure (the count_* and *_count actions) in one payload,
+        without the figures whose action the caller's groups could not read.
+        """
+        data = dashboard_stats(timeout=getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+        group_names = get_group_names(request)
+        return Response({
+            key: value for key, value in data.items()
+            if key not in self.DASHBOARD_READERS or self.DASHBOARD_READERS[key] & group_names
+        })
     
 
-class ClassPagination(PageNumberPagination):
+class ClassPagination(KeysetPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -448,11 +471,12 @@ class ClassViewSet(viewsets.ModelViewSet):
     pagination_class = ClassPagination
     authentication_classes = [JWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter, SparseFieldsFilter]
     filterset_fields = ['name', 'course.name', 'lecturer.name', 'semester', 'year']
     search_fields = ['name', 'course.name', 'lecturer.name', 'semester', 'year']
     ordering_fields = ['name', 'course.name', 'lecturer.name', 'semester', 'year']
     
+    @conditional_get(Class, Course, Lecturer)
     def list(self, request):
         queryset = Class.objects.all()
         # Apply search filter and ordering
@@ -461,26 +485,27 @@ class ClassViewSet(viewsets.ModelViewSet):
         # Add pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
         # If no pagination, return all results
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No classes found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
     
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
+    @conditional_get(Class, Course, Lecturer)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except Class.DoesNotExist:
             return Response({"error": "Class not found"}, status=404)
@@ -491,7 +516,7 @@ class ClassViewSet(viewsets.ModelViewSet):
         except Class.DoesNotExist:
             return Response({"error": "Class not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(Class, data=request.data)
+        serializer = self.get_serializer(Class, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -510,20 +535,30 @@ class ClassViewSet(viewsets.ModelViewSet):
         
     # Get all classes (not paginated)
     @action(detail=False, methods=['get'], url_path='all_classes')
+    @conditional_get(Class, Course, Lecturer)
+    @cache_response(Class, Course, Lecturer)
     def all_classes(self, request):
         queryset = Class.objects.all()
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No classes found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
 
 
+class SchedulePagination(KeysetPagination):
+    # Calendars load a whole window, pages only when ?page_size= asks
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
 class ScheduleViewSet(viewsets.ModelViewSet): 
     queryset = Schedule.objects.all()
     serializer_class = ScheduleSerializer
+    pagination_class = SchedulePagination
     authentication_classes = [JWTAuthentication]
     # permission_classes = [permissions.AllowAny]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter, SparseFieldsFilter]
     filterset_fields = ['class_assigned__name', 'day_of_week', 'start_period', 'location']
     search_fields = ['class_assigned__name', 'day_of_week', 'start_period', 'location']
     ordering_fields = ['class_assigned__name', 'day_of_week', 'start_period', 'location']
@@ -544,7 +579,7 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         14: {"start": "20:20", "end": "21:10"},
     }
     view_permissions = {
-        'list,get_schedules_by_lecturer': {
+        'list,get_schedules_by_lecturer,today': {
             'lecturer': True,
             'potential_lecturer': True,
             'it_faculty': True,
@@ -552,43 +587,83 @@ class ScheduleViewSet(viewsets.ModelViewSet):
             'supervision_department': True,
             
         },
-        'retrieve,update,create,destroy': {
+        'retrieve,update,create,destroy,conflicts': {
             'education_department': True,
         },
-        'me': {
+        'availability': {
+            'education_department': True,
+            'it_faculty': True,
+        },
+        'me,feed_link': {
             'lecturer': True,
-        }
+        },
+        # Calendar apps send no JWT, feed_lecturer() checks the ?token= instead
+        'ics,me_ics': {
+            'anon': True,
+            'user': True,
+        },
     }
+    # Who may read any lecturer's feed with their JWT
+    FEED_READERS = ('education_department',)
     
     
+    def calendar(self, request, action, queryset, *models):
+        """
+        Schedules of queryset in the optional ?start= / ?end= window, paged
+        with ?page_size=, answered with an ETag that only changes when a
+        schedule in the window does.
+        """
+        if 'start' in request.query_params or 'end' in request.query_params:
+            window = ScheduleWindowSerializer(data=request.query_params)
+            if not window.is_valid():
+                return Response(window.errors, status=status.HTTP_400_BAD_REQUEST)
+            start, end = window.validated_data['start'], window.validated_data['end']
+            # Bounded on start_time, the (lecturer, start_time, end_time) and
+            # start_time indexes serve the overlap test
+            queryset = queryset.filter(
+                start_time__gt=start - MAX_SCHEDULE_LENGTH, start_time__lt=end, end_time__gt=start)
+        queryset = queryset.order_by('start_time', 'id')
+
+        def respond():
+            # Titles and class names read the course of every row
+            rows = queryset.select_related('course')
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(rows, many=True).data)
+
+        return conditional_queryset(request, self, action, queryset, (Course,) + models, respond)
+
     def list(self, request):
-        queryset = Schedule.objects.all()
-        serializer = self.serializer_class(queryset, many=True)
-        return Response(serializer.data)
+        return self.calendar(request, 'list', Schedule.objects.all())
     
     
+    # Validation checks for conflicts and locks the lecturer until the save commits
+    @transaction.atomic
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
+    @conditional_get(Schedule, Course)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except Schedule.DoesNotExist:
             return Response({"error": "Schedule not found"}, status=404)
     
+    @transaction.atomic
     def update(self, request, pk=None):
         try:
             Schedule = self.queryset.get(pk=pk)
         except Schedule.DoesNotExist:
             return Response({"error": "Schedule not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(Schedule, data=request.data)
+        serializer = self.get_serializer(Schedule, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -600,13 +675,14 @@ class ScheduleViewSet(viewsets.ModelViewSet):
     
     
     
+    @transaction.atomic
     def partial_update(self, request, pk=None):
         try:
             Schedule = self.queryset.get(pk=pk)
         except Schedule.DoesNotExist:
             return Response({"error": "Schedule not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(Schedule, data=request.data, partial=True)
+        serializer = self.get_serializer(Schedule, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -625,42 +701,226 @@ class ScheduleViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"], url_path="by-lecturer/(?P<lecturer_id>[^/.]+)")
     def get_schedules_by_lecturer(self, request, lecturer_id=None):
-        try:
-            schedules = self.queryset.filter(lecturer_id=lecturer_id)
-            serializer = self.serializer_class(schedules, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Lecturer.DoesNotExist:
-            return Response(
-                {"error": "Lecturer not found"},
-                status=status.HTTP_404_NOT_FOUND,
-            )    
+        return self.calendar(request, f'by-lecturer:{lecturer_id}',
+                             self.queryset.filter(lecturer_id=lecturer_id))
     
-    @action(detail=False, methods=['get'], url_path='today')
-    def today(self, request):
-        today = date.today()
-        schedules = self.queryset.filter(start_time__date=today)
-        # Prefetch lecturer to avoid N+1 queries
-        schedules = schedules.select_related('lecturer')
-        result = []
-        for schedule in schedules:
-            data = self.serializer_class(schedule).data
-            # Attach lecturer name
-            data['lecturer_name'] = schedule.lecturer.name if schedule.lecturer else None
-            result.append(data)
-        return Response(result)
+    @action(detail=False, methods=['get'])
+    @conditional_get(Schedule, Lecturer, Course)
+    def conflicts(self, request):
+        """
+        Lecturers and places booked twice at once between ?start= and ?end=.
+        """
+        window = ScheduleWindowSerializer(data=request.query_params)
+        if not window.is_valid():
+            return Response(window.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(conflict_report(window.validated_data['start'], window.validated_data['end']))
     
+    @action(detail=False, methods=['get'])
+    @conditional_get(Schedule, Lecturer, Course)
+    def availability(self, request):
+        """
+        Free slots of the lecturers qualified for ?course= between ?start=
+        and ?end=, in ?slot= minute slots between ?day_start= and ?day_end=.
+        """
+        query = AvailabilitySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = query.validated_data
+        return Response(availability(
+            data['course'], data['start'], data['end'], data['slot'],
+            data['timezone'], data['day_start'], data['day_end']))
     
+    @action(detail=False, methods=['get'], url_path='today')
+    def today(self, request):
+        """
+        Lessons starting today, or in the next ?days= days, in the caller's
+        ?timezone= (SCHEDULE_TIME_ZONE by default), with lecturer names.
+        """
+        query = UpcomingSerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Local midnights as a UTC range on start_time, which its index serves
+        start, end = query.validated_data['start'], query.validated_data['end']
+        schedules = self.queryset.filter(start_time__gte=start, start_time__lt=end).order_by('start_time', 'id')
+
+        def respond():
+            rows = schedules.select_related('course', 'lecturer')
+            return Response(UpcomingScheduleSerializer(rows, many=True, context=self.get_serializer_context()).data)
+
+        # The range moves at local midnight, the query string does not
+        return conditional_queryset(request, self, 'today', schedules, (Course, Lecturer), respond,
+                                    scope=(start.isoformat(), end.isoformat()))
+
+    def feed(self, request, action, lecturer):
+        """
+        Stream lecturer's schedules as an iCalendar feed, or answer 304 Not
+        Modified while none of them (nor the course names) changed.
+        """
+        versions = queryset_versions(self.queryset.filter(lecturer=lecturer), [Course])
+        etag = compute_etag(request, self, action, (lecturer.pk,), {}, dict(versions, name=lecturer.name))
+        if is_not_modified(request, etag, None):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = StreamingHttpResponse(
+                calendar(lecturer.name, feed_events(lecturer.pk, versions)),
+                content_type='text/calendar; charset=utf-8')
+        response['ETag'] = etag
+        return response
+
+    def perform_content_negotiation(self, request, force=False):
+        # Calendar apps ask for text/calendar, which the feeds stream
+        # themselves instead of going through a renderer
+        return super().perform_content_negotiation(request, force=force or self.action in ('ics', 'me_ics'))
+
+    def feed_lecturer(self, request, lecturer_id=None):
+        """
+        Lecturer of a feed request: the owner of ?token=, or with a JWT the
+        caller themself, whom FEED_READERS may replace with lecturer_id.
+        """
+        token = request.query_params.get('token')
+        if token:
+            lecturer = token_lecturer(token)
+            if lecturer is None or (lecturer_id is not None and lecturer.pk != int(lecturer_id)):
+                return None
+            return lecturer
+        if not request.user.is_authenticated:
+            return None
+        own = Lecturer.objects.only('id', 'name').filter(user_id=request.user.pk).first()
+        if lecturer_id is None or (own is not None and own.pk == int(lecturer_id)):
+            return own
+        if not any(has_group(request, self, name) for name in self.FEED_READERS):
+            return None
+        return Lecturer.objects.only('id', 'name').filter(pk=lecturer_id).first()
+
+    @action(detail=False, methods=['get'], url_path='ics/(?P<lecturer_id>[0-9]+)')
+    def ics(self, request, lecturer_id=None):
+        lecturer = self.feed_lecturer(request, lecturer_id)
+        if lecturer is None:
+            return Response({"error": "Feed not found"}, status=404)
+        return self.feed(request, 'ics', lecturer)
+
+    # Routed as /schedules/me.ics in urls.py, the router would take .ics
+    # for a format suffix of me
+    def me_ics(self, request):
+        lecturer = self.feed_lecturer(request)
+        if lecturer is None:
+            return Response({"error": "Feed not found"}, status=404)
+        return self.feed(request, 'ics', lecturer)
+
+    @action(detail=False, methods=['get', 'post'], url_path='feed')
+    def feed_link(self, request):
+        """
+        Subscription URL of the caller's calendar feed. POST replaces its
+        token, which stops the old URL from working.
+        """
+        lecturer = Lecturer.objects.only('id').filter(user_id=request.user.pk).first()
+        if lecturer is None:
+            return Response({"error": "Lecturer not found"}, status=404)
+        token = feed_token(lecturer, rotate=request.method == 'POST')
+        url = request.build_absolute_uri(reverse('schedules-ics', args=[lecturer.pk]))
+        return Response({'url': f'{url}?{urlencode({"token": token})}'})
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         try:
-            lecturer = Lecturer.objects.get(user=request.user)
+            lecturer = Lecturer.objects.get(user_id=request.user.id)
         except Lecturer.DoesNotExist:
             return Response({"error": "Lecturer not found"}, status=404)
-        schedules = self.queryset.filter(lecturer=lecturer)
-        serializer = self.get_serializer(schedules, many=True)
-        return Response(serializer.data)
+        return self.calendar(request, 'me', self.queryset.filter(lecturer=lecturer), Lecturer)
                 
-class EvaluationPagination(PageNumberPagination):
+class ScheduleSeriesViewSet(viewsets.GenericViewSet):
+    """
+    Weekly recurring schedules. Creating a series adds all its occurrences
+    at once; move and cancel act on the occurrences between two dates.
+    """
+    queryset = ScheduleSeries.objects.all()
+    serializer_class = ScheduleSeriesSerializer
+    authentication_classes = [JWTAuthentication]
+    view_permissions = {
+        'list,retrieve': {
+            'lecturer': True,
+            'potential_lecturer': True,
+            'it_faculty': True,
+            'education_department': True,
+            'supervision_department': True,
+        },
+        'create,destroy,move,cancel': {
+            'education_department': True,
+        },
+    }
+
+    def get_series(self, pk):
+        try:
+            return self.queryset.get(pk=pk)
+        except ScheduleSeries.DoesNotExist:
+            return None
+
+    @conditional_get(ScheduleSeries, Schedule)
+    def list(self, request):
+        queryset = ScheduleSeries.objects.annotate(schedule_count=Count('schedules'))
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @conditional_get(ScheduleSeries, Schedule)
+    def retrieve(self, request, pk=None):
+        series = self.get_series(pk)
+        if series is None:
+            return Response({"error": "Series not found"}, status=404)
+        return Response(self.get_serializer(series).data)
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        series = ScheduleSeries(**serializer.validated_data)
+        if sum(1 for _ in occurrence_dates(series)) > MAX_OCCURRENCES:
+            return Response({"error": f"A series has at most {MAX_OCCURRENCES} lessons"}, status=400)
+        # A conflict raises ScheduleConflict, answered with 409
+        create_series(series)
+        return Response(self.get_serializer(series).data, status=201)
+
+    def destroy(self, request, pk=None):
+        series = self.get_series(pk)
+        if series is None:
+            return Response({"error": "Series not found"}, status=404)
+        cancel_series(series)
+        return Response(status=204)
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """
+        Shift the occurrences between 'start' and 'end' by 'days' and
+        'minutes' and/or move them to 'place'.
+        """
+        series = self.get_series(pk)
+        if series is None:
+            return Response({"error": "Series not found"}, status=404)
+        serializer = ScheduleMoveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        data = serializer.validated_data
+        shift = timedelta(days=data['days'], minutes=data['minutes'])
+        moved = move_series(series, data.get('start'), data.get('end'), shift, data.get('place'))
+        return Response({"moved": moved})
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """
+        Delete the occurrences between 'start' and 'end'.
+        """
+        series = self.get_series(pk)
+        if series is None:
+            return Response({"error": "Series not found"}, status=404)
+        serializer = ScheduleMoveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        data = serializer.validated_data
+        if 'start' not in data and 'end' not in data:
+            return Response({"error": "Give start and/or end, or delete the series"}, status=400)
+        return Response({"cancelled": cancel_series(series, data.get('start'), data.get('end'))})
+
+
+class EvaluationPagination(KeysetPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -684,22 +944,24 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         }
     }
 
+    @conditional_get(Evaluation)
     def list(self, request):
         queryset = Evaluation.objects.all()
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
+    @conditional_get(Evaluation)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except Evaluation.DoesNotExist:
             return Response({"error": "Evaluation not found"}, status=404)
@@ -710,7 +972,7 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         except Evaluation.DoesNotExist:
             return Response({"error": "Evaluation not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(evaluation, data=request.data)
+        serializer = self.get_serializer(evaluation, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -720,16 +982,18 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @conditional_get(Evaluation, Lecturer)
     def me(self, request):
         try:
-            lecturer = Lecturer.objects.get(user=request.user)
+            lecturer = Lecturer.objects.get(user_id=request.user.id)
         except Lecturer.DoesNotExist:
             return Response({"error": "Lecturer not found"}, status=404)
         evaluations = self.queryset.all()
-        serializer = self.serializer_class(evaluations, many=True)
+        serializer = self.get_serializer(evaluations, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=["get"], url_path="by-lecturer/(?P<lecturer_id>[^/.]+)")
+    @conditional_get(Evaluation)
     def get_by_lecturer(self, request, lecturer_id=None):
         """
         Custom action to retrieve all lecturers for a given lecturer ID.
@@ -741,16 +1005,16 @@ class EvaluationViewSet(viewsets.ModelViewSet):
         # Add pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
         # If no pagination, return all results
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No evaluations found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
 
-class LecturerRecommendationPagination(PageNumberPagination):
+class LecturerRecommendationPagination(KeysetPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -761,7 +1025,7 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
     serializer_class = LecturerRecommendationSerializer
     authentication_classes = [JWTAuthentication]
     # permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter, SparseFieldsFilter]
     filterset_fields = ['name', 'workplace', 'recommender__name', 'status', 'date', 'course_names']
     search_fields = ['name', 'workplace', 'recommender__name', 'status', 'date', 'course_names']
     ordering_fields = ['name', 'workplace', 'recommender__name', 'status', 'date', 'course_names']
@@ -781,6 +1045,7 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
             'it_faculty': True
         }
     }
+    @conditional_get(LecturerRecommendation, Course, Lecturer)
     def list(self, request):
         queryset = LecturerRecommendation.objects.all()
         # Apply search filter and ordering
@@ -789,11 +1054,11 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
         # Add pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         
         # If no pagination, return all results
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True)
         if not serializer.data:
             return Response({"error": "No recommendations found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.data)
@@ -807,11 +1072,12 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
         count = queryset.count()
         return Response(count)
     
+    @conditional_get(LecturerRecommendation, Course, Lecturer)
     def retrieve(self, request, pk=None):
         print("Retrieve called with pk:", pk)
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = self.serializer_class(queryset)
+            serializer = self.get_serializer(queryset)
             return Response(serializer.data)
         except LecturerRecommendation.DoesNotExist:
             return Response({"error": "Recommendation not found"}, status=404)
@@ -819,7 +1085,7 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
     
     
     def create(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=201)
@@ -831,7 +1097,7 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
         except LecturerRecommendation.DoesNotExist:
             return Response({"error": "Recommendation not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.serializer_class(recommendation, data=request.data)
+        serializer = self.get_serializer(recommendation, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -849,9 +1115,10 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
             return Response({"error": "Recommendation not found"}, status=404)
     
     @action(detail=False, methods=['get', 'post', 'put', 'patch', 'delete'])
+    @conditional_get(LecturerRecommendation, Course, Lecturer)
     def me(self, request):
         try:
-            lecturer = Lecturer.objects.get(user=request.user)
+            lecturer = Lecturer.objects.get(user_id=request.user.id)
         except Lecturer.DoesNotExist:
             return Response({"error": "Lecturer not found"}, status=404)
 
@@ -864,11 +1131,11 @@ class LecturerRecommendationViewSet(viewsets.ModelViewSet):
             # Add pagination
             page = self.paginate_queryset(queryset)
             if page is not None:
-                serializer = self.serializer_class(page, many=True)
+                serializer = self.get_serializer(page, many=True)
                 return self.get_paginated_response(serializer.data)
             
             # If no pagination, return all results
-            serializer = self.serializer_class(queryset, many=True)
+            serializer = self.get_serializer(queryset, many=True)
             if not serializer.data:
                 return Response({"error": "No recommendations found"}, status=status.HTTP_404_NOT_FOUND)
             return Response(serializer.data)
@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from rest_framework import serializers
+from backend.conditional import bump_model_version
+from lecturers.models import Lecturer
+from lecturers.stats import adjust_bucket, bucket_of, is_active
+from .serializers import BulkUserSerializer
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+# Fewer passwords than this are hashed in the request's process, starting
+# the pool would take longer than hashing them
+MIN_POOL_PASSWORDS = 8
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash passwords on a process pool, in order. The processes are spawned
+    rather than forked from the web worker, which holds database
+    connections, and set Django up once each. A None password gives an
+    unusable one, which costs no hashing.
+    """
+    workers = workers or getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+    count = sum(password is not None for password in passwords)
+    if workers == 1 or count < MIN_POOL_PASSWORDS:
+        return [make_password(password) for password in passwords]
+    workers = min(workers, count)
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+
+class UserProvisioning:
+    """
+    Validate a list of users and create them with bulk_create: usernames
+    and emails are checked unique, ignoring case, with one query each, groups and lecturers
+    are resolved from one lookup each. Groups given for the whole request
+    are added to every user.
+
+    Provisioning is all or nothing: when any user has errors nothing is saved.
+    """
+
+    def __init__(self, users, groups=(), batch_size=None):
+        self.batch_size = batch_size or BATCH_SIZE
+        self.entries = users
+        self.common_groups = list(groups)
+        self.serializer = BulkUserSerializer()
+        self.valid = []
+        self.errors = []
+
+    def validate(self):
+        checked = []
+        for index, entry in enumerate(self.entries):
+            try:
+                checked.append((index, self.serializer.run_validation(entry), {}))
+            except serializers.ValidationError as error:
+                checked.append((index, None, dict(error.detail)))
+        rows = [data for _, data, _ in checked if data is not None]
+
+        # Compared lowercased, MySQL's default collation would reject the insert
+        usernames = Counter(data['username'].lower() for data in rows)
+        emails = Counter(data['email'].lower() for data in rows)
+        lecturer_ids = Counter(data['lecturer'] for data in rows if data.get('lecturer') is not None)
+        taken_usernames = set(User.objects.alias(username_lower=Lower('username')).filter(
+            username_lower__in=usernames).values_list(Lower('username'), flat=True))
+        taken_emails = set(User.objects.alias(email_lower=Lower('email')).filter(
+            email_lower__in=emails).values_list(Lower('email'), flat=True))
+        group_ids = set(Group.objects.values_list('pk', flat=True))
+        lecturers = Lecturer.objects.only('pk', 'user', 'status', 'degree', 'title').in_bulk(lecturer_ids)
+
+        unknown = set(self.common_groups) - group_ids
+        if unknown:
+            raise serializers.ValidationError(
+                {'groups': [f"Unknown group: {pk}." for pk in sorted(unknown)]})
+
+        for index, data, errors in checked:
+            if data is not None:
+                self.check(data, errors, usernames, emails, lecturer_ids,
+                           taken_usernames, taken_emails, group_ids, lecturers)
+            if errors:
+                self.errors.append({'index': index, 'errors': errors})
+            else:
+                self.valid.append(data)
+        return not self.errors
+
+    @staticmethod
+    def check(data, errors, usernames, emails, lecturer_ids,
+              taken_usernames, taken_emails, group_ids, lecturers):
+        username, email = data['username'].lower(), data['email'].lower()
+        if username in taken_usernames:
+            errors.setdefault('username', []).append("A user with that username already exists.")
+        elif usernames[username] > 1:
+            errors.setdefault('username', []).append("Duplicate username in the request.")
+        if email in taken_emails:
+            errors.setdefault('email', []).append("A user with that email already exists.")
+        elif emails[email] > 1:
+            errors.setdefault('email', []).append("Duplicate email in the request.")
+        unknown = set(data.get('groups', [])) - group_ids
+        if unknown:
+            errors['groups'] = [f"Unknown group: {pk}." for pk in sorted(unknown)]
+        lecturer_id = data.get('lecturer')
+        if lecturer_id is not None:
+            lecturer = lecturers.get(lecturer_id)
+            if lecturer is None:
+                errors['lecturer'] = [f"Unknown lecturer: {lecturer_id}."]
+            elif lecturer.user_id is not None:
+                errors['lecturer'] = ["This lecturer is already linked to a user."]
+            elif lecturer_ids[lecturer_id] > 1:
+                errors['lecturer'] = ["Lecturer given to several users."]
+            else:
+                data['lecturer'] = lecturer
+
+    def save(self, workers=None):
+        """
+        Create the valid users, their group memberships and lecturer links.
+        bulk_create sends no signals, so the lecturer statistics and cache
+        versions they keep are updated here in bulk. Return the timings.
+        """
+        started = time.perf_counter()
+        # Hashed before the transaction opens, this is the slow part
+        hashes = hash_passwords([data.get('password') or None for data in self.valid], workers)
+        hashed = time.perf_counter()
+        with transaction.atomic():
+            linked = self.insert(hashes)
+        finished = time.perf_counter()
+        return {
+            'created': len(self.valid),
+            'linked_lecturers': linked,
+            'hash_seconds': round(hashed - started, 3),
+            'seconds': round(finished - started, 3),
+            'users_per_second': round(len(self.valid) / (finished - started), 1) if self.valid else 0,
+        }
+
+    def insert(self, hashes):
+        users = [
+            User(username=data['username'], email=data['email'], password=password)
+            for data, password in zip(self.valid, hashes)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL returns no ids, read them back by the unique usernames
+            ids = dict(User.objects.filter(username__in=[user.username for user in users])
+                       .values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        group_names = dict(Group.objects.values_list('pk', 'name'))
+        Through = User.groups.through
+        memberships = {
+            user.pk: set(data.get('groups', [])) | set(self.common_groups)
+            for user, data in zip(users, self.valid)
+        }
+        Through.objects.bulk_create([
+            Through(customuser_id=user_id, group_id=group_id)
+            for user_id, group_ids in memberships.items() for group_id in group_ids
+        ], batch_size=self.batch_size)
+
+        # Linking a user moves its lecturer to the bucket of the user's groups
+        linked, moves = [], Counter()
+        for user, data in zip(users, self.valid):
+            lecturer = data.get('lecturer')
+            if lecturer is None:
+                continue
+            old = bucket_of(lecturer, group_names=set())
+            lecturer.user = user
+            new = bucket_of(lecturer, group_names={group_names[pk] for pk in memberships[user.pk]})
+            lecturer.is_active_lecturer = is_active(new)
+            moves[old] -= 1
+            moves[new] += 1
+            linked.append(lecturer)
+        Lecturer.objects.bulk_update(linked, ['user', 'is_active_lecturer'], batch_size=self.batch_size)
+        for bucket, delta in moves.items():
+            if delta:
+                adjust_bucket(bucket, delta)
+
+        for model in (User, Lecturer):
+            bump_model_version(model)
+        return len(linked)
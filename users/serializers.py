@@ -4,6 +4,7 @@ from lecturers.models import Lecturer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from backend.sparse import SparseFieldsMixin
 
 
 User = get_user_model()
@@ -16,7 +17,15 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
 
         # Add custom claims here (groups in this case)
-        token['role'] = user.groups.first().name if user.groups.exists() else None
+        group_names = list(
+            user.groups.order_by('id').values_list('name', flat=True))
+        token['role'] = group_names[0] if group_names else None
+        # All group names, used by backend.roles when ROLE_GROUPS_FROM_TOKEN is on
+        token['groups'] = group_names
+        # Claims read by backend.authentication.StatelessJWTAuthentication
+        token['username'] = user.username
+        token['lecturer_id'] = Lecturer.objects.filter(
+            user=user).values_list('id', flat=True).first()
         return token
 
 
@@ -37,7 +46,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class NewUserSerializer(serializers.ModelSerializer):
+class NewUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     groups = serializers.PrimaryKeyRelatedField(
         queryset=Group.objects.all(),
         many=True,
@@ -95,9 +104,36 @@ class NewUserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'username', 'email', 'groups', 'lecturer_str', 'lecturer', "password")
         extra_kwargs = {'password': {'write_only': True}}
+        field_sources = {'lecturer_str': ['lecturer']}
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class BulkUserSerializer(serializers.ModelSerializer):
+    """
+    Validates one user of a bulk provisioning request. Uniqueness, groups
+    and lecturers are checked per batch by users.provisioning instead of
+    one query per field.
+    """
+    password = serializers.CharField(write_only=True, required=False, allow_blank=True)
+    groups = serializers.ListField(child=serializers.IntegerField(), required=False)
+    lecturer = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = User
+        fields = ('username', 'email', 'password', 'groups', 'lecturer')
+        extra_kwargs = {
+            'username': {'validators': [User.username_validator]},
+            'email': {'validators': []},
+        }
+
+
+class BulkProvisioningSerializer(serializers.Serializer):
+    # Each user is validated by BulkUserSerializer in users.provisioning
+    users = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=5000)
+    # Added to every user
+    groups = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = "__all__"
\ No newline at end of file
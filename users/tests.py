@@ -1,3 +1,72 @@
+from unittest.mock import patch
+from django.contrib.auth.hashers import check_password, is_password_usable
+from django.contrib.auth.models import Group
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from lecturers.stats import stats_drift
+from lecturers.tests import create_lecturer, create_user
+from .models import CustomUser
+from .provisioning import hash_passwords
 
-# Create your tests here.
+
+class ProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('education', 'education_department')
+        cls.lecturer_group = Group.objects.create(name='lecturer')
+        cls.it_group = Group.objects.create(name='it_faculty')
+        cls.lecturer = create_lecturer('Nguyễn A', status='Hồ sơ hợp lệ')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_errors_save_nothing(self):
+        response = self.client.post('/users/bulk/', {'users': [
+            {'username': 'a', 'email': 'a@example.com', 'groups': [999]},
+            {'username': 'a', 'email': 'EDUCATION@example.com'},
+            {'username': 'b', 'email': 'b@example.com', 'lecturer': self.lecturer.pk},
+            {'username': 'c', 'email': 'c@example.com', 'lecturer': self.lecturer.pk},
+            {'username': 'bad name!', 'email': 'x'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: set(error['errors']) for error in response.data['errors']}
+        self.assertEqual(errors, {
+            0: {'username', 'groups'}, 1: {'username', 'email'},
+            2: {'lecturer'}, 3: {'lecturer'}, 4: {'username', 'email'},
+        })
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+    def test_provision_in_bulk(self):
+        users = [
+            {'username': f'gv{i}', 'email': f'gv{i}@example.com', 'password': f'secret{i}'}
+            for i in range(30)
+        ]
+        users[0].update(lecturer=self.lecturer.pk, groups=[self.lecturer_group.pk])
+        users.append({'username': 'nopass', 'email': 'nopass@example.com'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/users/bulk/', {'users': users, 'groups': [self.it_group.pk]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 31)
+        self.assertEqual(response.data['linked_lecturers'], 1)
+        self.assertLess(len(queries), 30)
+
+        user = CustomUser.objects.get(username='gv7')
+        self.assertTrue(user.check_password('secret7'))
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['it_faculty'])
+        self.assertFalse(CustomUser.objects.get(username='nopass').has_usable_password())
+        self.lecturer.refresh_from_db()
+        self.assertEqual(self.lecturer.user.username, 'gv0')
+        self.assertTrue(self.lecturer.is_active_lecturer)
+        self.assertEqual(stats_drift(), {})
+
+    def test_hash_passwords_on_a_process_pool(self):
+        passwords = [f'secret{i}' for i in range(4)] + [None]
+        with patch('users.provisioning.MIN_POOL_PASSWORDS', 0):
+            hashes = hash_passwords(passwords, workers=2)
+        self.assertEqual(len(hashes), 5)
+        self.assertTrue(check_password('secret3', hashes[3]))
+        self.assertFalse(is_password_usable(hashes[4]))
@@ -1,12 +1,16 @@
 from .models import *
 from .serializers import *
 
-from rest_framework import viewsets, permissions
+from rest_framework import serializers, viewsets, permissions
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from backend.caching import cache_response
+from backend.conditional import conditional_get
+from backend.sparse import sparse_queryset
+from .provisioning import UserProvisioning
 
 # Create your views here.
 User = get_user_model()
@@ -51,7 +55,7 @@ class UserViewSet(viewsets.ViewSet):
     queryset = User.objects.all()
     serializer_class = NewUserSerializer
     view_permissions = {
-        'list,retrieve,update,create,destroy,partial_update': {
+        'list,retrieve,update,create,destroy,partial_update,provision': {
             'education_department': True,
         },
         'me': {
@@ -59,9 +63,11 @@ class UserViewSet(viewsets.ViewSet):
         }
     }
 
+    @conditional_get(User, Lecturer)
     def list(self, request):
-        queryset = User.objects.all()
-        serializer = NewUserSerializer(queryset, many=True)
+        serializer = NewUserSerializer(many=True, context={'request': request})
+        queryset = sparse_queryset(User.objects.all(), serializer.child)
+        serializer.instance = queryset
         return Response(serializer.data)
    
     def create(self, request):
@@ -71,10 +77,32 @@ class UserViewSet(viewsets.ViewSet):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def provision(self, request):
+        """
+        Create many users at once: {"users": [{"username", "email",
+        "password", "groups", "lecturer"}, ...], "groups": [...]}. Top-level
+        groups are given to every user. Nothing is saved when a user has
+        errors. Users without a password get an unusable one and set it
+        through the password reset flow.
+        """
+        serializer = BulkProvisioningSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        provisioning = UserProvisioning(
+            serializer.validated_data['users'], serializer.validated_data.get('groups', []))
+        try:
+            if not provisioning.validate():
+                return Response({'errors': provisioning.errors}, status=400)
+        except serializers.ValidationError as error:
+            return Response(error.detail, status=400)
+        return Response(provisioning.save(), status=201)
+    
+    @conditional_get(User, Lecturer)
     def retrieve(self, request, pk=None):
         try:
             queryset = self.queryset.get(pk=pk)
-            serializer = NewUserSerializer(queryset)
+            serializer = NewUserSerializer(queryset, context={'request': request})
             return Response(serializer.data)
         except User.DoesNotExist:
             return Response({"error": "Evaluation not found"}, status=404)
@@ -116,12 +144,13 @@ class UserViewSet(viewsets.ViewSet):
             return Response({"error": "User not found"}, status=404)
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @conditional_get(User, Lecturer)
     def me(self, request):
         try:
             user = User.objects.get(id=request.user.id)
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=404)
-        serializer = NewUserSerializer(user)
+        serializer = NewUserSerializer(user, context={'request': request})
         return Response(serializer.data)
     
 
@@ -136,5 +165,7 @@ class GroupViewSet(viewsets.ModelViewSet):
     lookup_field = "pk"
     http_method_names = ("get", "post", "patch", "delete")
 
+    @conditional_get(Group)
+    @cache_response(Group)
     def list(self, request, *args, **kwargs):
         return super().list(request, fields=("id", "name"), *args, **kwargs)